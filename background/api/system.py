@@ -49,6 +49,19 @@ def get_machines():
     })
 
 
+@system_bp.route('/rigs')
+def get_rigs():
+    """获取本机测试台的占用情况与等待队列"""
+    from device_pool import device_pool
+
+    status = device_pool.status()
+    return jsonify({
+        'success': True,
+        'rigs': status['rigs'],
+        'queue': status['queue']
+    })
+
+
 @system_bp.route('/settings', methods=['GET'])
 def get_settings():
     """获取系统配置"""
@@ -80,7 +93,7 @@ def get_settings():
 
         # 执行器设置
         'executor_type': 'local',
-        'max_workers': Config.MAX_CONCURRENT_TESTS,
+        'max_workers': Config.MAX_CONCURRENT_TESTS,  # 等于测试台数
         'task_timeout': Config.TEST_TIMEOUT,
         'enable_cache': True,
         'cache_ttl': 3600,
@@ -157,6 +170,26 @@ def get_scheduler_status():
         })
 
 
+@system_bp.route('/scheduler/window', methods=['GET'])
+def get_scheduler_window():
+    """预览今晚（或当前）定时窗口的执行安排与预计完成时间"""
+    from run import app
+    from window_planner import WindowPlanner
+    scheduler = app.scheduler if hasattr(app, 'scheduler') else None
+
+    if not scheduler:
+        return jsonify({
+            'success': False,
+            'message': '调度器未启动'
+        }), 400
+
+    schedule = scheduler.preview_window()
+    return jsonify({
+        'success': True,
+        'data': WindowPlanner.to_dict(schedule)
+    })
+
+
 @system_bp.route('/system/info', methods=['GET'])
 def get_system_info():
     """获取系统信息"""
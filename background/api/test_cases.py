@@ -1,9 +1,9 @@
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from sqlalchemy import func, case
 from extra.extensions import db
 from models import TestCase
-import threading
+from priority import refresh_priority_scores
 
 test_cases_bp = Blueprint('test_cases', __name__, url_prefix='/api/test-cases')
 
@@ -128,6 +128,9 @@ def update_test_case(case_hash):
 
     db.session.commit()
 
+    if 'status' in data:
+        refresh_priority_scores([case.case_hash])
+
     return jsonify({'success': True})
 
 
@@ -194,32 +197,79 @@ def delete_test_case(case_hash):
     })
 
 
+@test_cases_bp.route('/result-cache', methods=['DELETE'])
+def invalidate_result_cache():
+    """清除结果缓存，请求体中的 case_hashes 为空时清除全部"""
+    from result_cache import invalidate
+
+    data = request.get_json(silent=True) or {}
+    deleted = invalidate(data.get('case_hashes') or None)
+
+    return jsonify({
+        'success': True,
+        'message': f'已清除 {deleted} 条结果缓存',
+        'deleted_count': deleted
+    })
+
+
 @test_cases_bp.route('/scan', methods=['POST'])
 def scan_cases():
-    """手动触发用例扫描"""
-    from scanner import TestCaseScanner
+    """手动触发用例扫描，返回扫描任务；同一根目录已有进行中的扫描时直接返回该任务"""
+    from scan_jobs import scan_job_manager
 
-    data = request.get_json()
-    scan_type = data.get('scan_type', 'incremental')  # 'full' or 'incremental'
-
-    def scan_async():
-        from app import app
-        with app.app_context():
-            scanner = TestCaseScanner()
-            if scan_type == 'full':
-                scanner.scan_all_cases(update_status=True)
-            else:
-                scanner.scan_new_and_changed_cases()
-
-    # 异步执行扫描
-    thread = threading.Thread(target=scan_async)
-    thread.daemon = True
-    thread.start()
+    data = request.get_json() or {}
+    scan_type = data.get('scan_type', 'incremental')  # 'full', 'incremental' or 'distributed'
+    scan_labels = {'full': '全量', 'incremental': '增量', 'distributed': '分布式全量'}
+    if scan_type not in scan_labels:
+        return jsonify({'success': False, 'message': f'Unsupported scan type: {scan_type}'}), 400
+
+    job, created = scan_job_manager.submit(current_app._get_current_object(), scan_type)
 
     return jsonify({
         'success': True,
-        'message': f'{"全量" if scan_type == "full" else "增量"}扫描已开始',
-        'scan_type': scan_type
+        'message': f'{scan_labels[job.scan_type]}扫描已开始' if created else '已有进行中的扫描任务',
+        'scan_type': job.scan_type,
+        'deduplicated': not created,
+        'job': job.to_dict()
+    })
+
+
+@test_cases_bp.route('/scan/jobs', methods=['GET'])
+def get_scan_jobs():
+    """获取扫描任务列表"""
+    from scan_jobs import scan_job_manager
+
+    return jsonify({
+        'success': True,
+        'data': [job.to_dict() for job in scan_job_manager.list()]
+    })
+
+
+@test_cases_bp.route('/scan/jobs/<string:job_id>', methods=['GET'])
+def get_scan_job(job_id):
+    """获取扫描任务进度"""
+    from scan_jobs import scan_job_manager
+
+    job = scan_job_manager.get(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Scan job not found'}), 404
+
+    return jsonify({'success': True, 'data': job.to_dict()})
+
+
+@test_cases_bp.route('/scan/jobs/<string:job_id>/cancel', methods=['POST'])
+def cancel_scan_job(job_id):
+    """取消扫描任务"""
+    from scan_jobs import scan_job_manager
+
+    job = scan_job_manager.cancel(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Scan job not found'}), 404
+
+    return jsonify({
+        'success': True,
+        'message': '已请求取消扫描任务' if job.is_active else '扫描任务已结束',
+        'data': job.to_dict()
     })
 
 
@@ -264,6 +314,9 @@ def batch_update_cases():
 
     db.session.commit()
 
+    if 'status' in updates:
+        refresh_priority_scores([case.case_hash for case in cases])
+
     return jsonify({
         'success': True,
         'message': f'已更新 {updated_count} 个用例',
@@ -1,6 +1,6 @@
 import json
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 import threading
 
 from extra.extensions import db
@@ -119,6 +119,39 @@ def get_execution_detail(execution_id):
     })
 
 
+@test_execution_bp.route('/execution-history/<int:execution_id>/log', methods=['GET'])
+def get_execution_log(execution_id):
+    """获取执行的完整输出日志（解压后以文本流返回）"""
+    from runner import open_execution_log
+
+    execution = TestExecution.query.get(execution_id)
+
+    if not execution:
+        return jsonify({
+            'success': False,
+            'message': '执行记录不存在'
+        }), 404
+
+    try:
+        log_file = json.loads(execution.details or '{}').get('log_file')
+    except (ValueError, AttributeError):
+        log_file = None
+
+    log = open_execution_log(log_file) if log_file else None
+    if log is None:
+        return jsonify({
+            'success': False,
+            'message': f'日志文件不存在（执行机器：{execution.machine_id}）' if log_file else '该执行记录没有日志文件'
+        }), 404
+
+    def generate():
+        with log:
+            for chunk in iter(lambda: log.read(65536), b''):
+                yield chunk
+
+    return Response(generate(), mimetype='text/plain; charset=utf-8')
+
+
 @test_execution_bp.route('/execution-history/<int:execution_id>', methods=['DELETE'])
 def delete_execution(execution_id):
     """删除单条执行记录"""
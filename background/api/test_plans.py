@@ -1,6 +1,6 @@
 import json
 from datetime import datetime
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from extra.extensions import db
 from models import TestPlan
 
@@ -117,12 +117,11 @@ def execute_test_plan(plan_id):
     db.session.commit()
 
     # 异步执行测试计划
-    from app import scheduler
     import threading
 
     thread = threading.Thread(
         target=execute_plan_async,
-        args=(plan.id,)
+        args=(current_app._get_current_object(), current_app.scheduler, plan.id)
     )
     thread.daemon = True
     thread.start()
@@ -134,9 +133,8 @@ def execute_test_plan(plan_id):
     })
 
 
-def execute_plan_async(plan_id):
-    """异步执行测试计划"""
-    from app import app, scheduler
+def execute_plan_async(app, scheduler, plan_id):
+    """异步执行测试计划（在独立线程中运行，app 与 scheduler 由请求处理函数传入）"""
     with app.app_context():
         try:
             plan = TestPlan.query.get(plan_id)
@@ -167,7 +165,7 @@ def execute_plan_async(plan_id):
 
 @test_plans_bp.route('/<int:plan_id>/pause', methods=['POST'])
 def pause_test_plan(plan_id):
-    """暂停测试计划"""
+    """暂停测试计划：执行中的用例结束后不再启动新的用例，进度保存在检查点中"""
     plan = TestPlan.query.get(plan_id)
 
     if not plan:
@@ -194,7 +192,7 @@ def pause_test_plan(plan_id):
 
 @test_plans_bp.route('/<int:plan_id>/resume', methods=['POST'])
 def resume_test_plan(plan_id):
-    """继续执行测试计划"""
+    """继续执行测试计划：从检查点继续执行未完成的用例"""
     plan = TestPlan.query.get(plan_id)
 
     if not plan:
@@ -209,16 +207,71 @@ def resume_test_plan(plan_id):
             'message': f'无法继续状态为 {plan.status} 的计划'
         }), 400
 
+    import plan_checkpoint
+    if plan_checkpoint.is_active(plan_id):
+        return jsonify({
+            'success': False,
+            'message': '计划正在暂停，请等待执行中的用例结束后再继续'
+        }), 409
+
     # 更新计划状态为运行中
     plan.status = 'running'
+    plan.last_execution_time = datetime.now()
     db.session.commit()
 
+    # 异步执行测试计划（从检查点继续）
+    import threading
+
+    thread = threading.Thread(
+        target=execute_plan_async,
+        args=(current_app._get_current_object(), current_app.scheduler, plan.id)
+    )
+    thread.daemon = True
+    thread.start()
+
     return jsonify({
         'success': True,
         'message': '测试计划已继续执行'
     })
 
 
+@test_plans_bp.route('/<int:plan_id>/cancel', methods=['POST'])
+def cancel_test_plan(plan_id):
+    """取消测试计划
+
+    执行中的计划不再启动新的用例；启用异步执行引擎时正在执行的用例进程也会被立即终止。
+    """
+    plan = TestPlan.query.get(plan_id)
+
+    if not plan:
+        return jsonify({
+            'success': False,
+            'message': '测试计划不存在'
+        }), 404
+
+    if plan.status not in ('running', 'paused'):
+        return jsonify({
+            'success': False,
+            'message': f'无法取消状态为 {plan.status} 的计划'
+        }), 400
+
+    # 先更新状态，执行循环结束时据此删除检查点
+    plan.status = 'cancelled'
+    db.session.commit()
+
+    import plan_checkpoint
+    from async_engine import execution_engine
+    execution_engine.cancel(plan_id)
+    if plan_checkpoint.is_orphaned(plan_id):
+        # 已暂停（或执行进程已退出）的计划没有执行循环来删除检查点，在此删除
+        plan_checkpoint.discard(plan_id)
+
+    return jsonify({
+        'success': True,
+        'message': '测试计划已取消'
+    })
+
+
 @test_plans_bp.route('/<int:plan_id>', methods=['PUT'])
 def update_test_plan(plan_id):
     """更新测试计划"""
@@ -321,15 +374,32 @@ def get_plan_tasks(plan_id):
             'case_hash': task.case_hash,
             'status': task.status,
             'machine_id': task.machine_id,
+            'predicted_duration': task.predicted_duration,
+            'predicted_finish': task.predicted_finish,
             'created_at': task.created_at.isoformat() if task.created_at else None,
             'started_at': task.started_at.isoformat() if task.started_at else None,
             'completed_at': task.completed_at.isoformat() if task.completed_at else None,
             'result': task.result
         })
 
+    # 各机器分片的用例数与预计完成时间（秒）
+    shard_rows = db.session.query(
+        ExecutionTask.machine_id,
+        db.func.count(ExecutionTask.id),
+        db.func.sum(ExecutionTask.predicted_duration),
+        db.func.max(ExecutionTask.predicted_finish)
+    ).filter_by(plan_id=plan_id).group_by(ExecutionTask.machine_id).all()
+    shards = [{
+        'machine_id': machine_id,
+        'case_count': count,
+        'total_duration': total_duration,
+        'makespan': makespan
+    } for machine_id, count, total_duration, makespan in shard_rows]
+
     return jsonify({
         'success': True,
         'tasks': tasks,
+        'shards': shards,
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
@@ -56,10 +56,15 @@ def create_app():
     scheduler = TestScheduler(app)
     scheduler.start()
 
+    # 分布式模式下接收其他机器下发的扫描分片
+    if app.config.get('ENABLE_DISTRIBUTED', False):
+        from distributed_scan import ScanShardWorker
+        ScanShardWorker(app).start()
+
     # 初始化文件监控
     if app.config.get('WATCHDOG_ENABLED', False):
         scanner = TestCaseScanner()
-        event_handler = FileChangeHandler(scanner)
+        event_handler = FileChangeHandler(scanner, app)
         observer = Observer()
         observer.schedule(event_handler, app.config['TEST_CASE_ROOT'], recursive=True)
         observer.start()
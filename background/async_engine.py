@@ -0,0 +1,300 @@
+import json
+import queue
+import asyncio
+import threading
+import subprocess
+from datetime import datetime
+from flask import current_app
+from models import TestExecution
+from config import Config
+from result_writer import result_writer
+import plan_checkpoint
+from utils.logger import logger
+
+
+class AsyncExecutionEngine:
+    """基于 asyncio 的用例执行引擎
+
+    一个事件循环线程监管所有正在执行的计划：测试台排队（DevicePool.acquire_async）、用例进程
+    （StreamingRunner.run_async）与超时都在事件循环中协作完成，执行中的计划与排队中的用例不再各占一个线程。
+    计划可以随时取消：正在执行的用例进程被终止，测试台释放，用例状态恢复。
+
+    启用 Config.ASYNC_ENGINE_ENABLED 后，TestCaseExecutor.run_cases 是对本引擎的同步封装。
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.lock = threading.Lock()
+        self.tasks = {}  # 计划ID -> 正在执行的 asyncio.Task 集合
+
+    def run_cases(self, executor, cases, plan_id=None, retry_count=0, on_result=None, deadline=None):
+        """同步接口：执行一组用例并等待完成，参数与返回值同 TestCaseExecutor.run_cases
+
+        on_result 在调用线程中按完成顺序调用；计划被取消时返回已完成用例的结果。
+        """
+        finished = queue.Queue()
+        future = self.submit(executor, cases, plan_id, retry_count, on_result=finished.put, deadline=deadline)
+        future.add_done_callback(lambda f: finished.put(None))
+
+        results = []
+        while True:
+            result = finished.get()
+            if result is None:
+                break
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+        if future.cancelled():
+            logger.info(f"计划 {plan_id} 已取消，已完成 {len(results)} 个用例")
+        else:
+            future.result()
+        return results
+
+    def submit(self, executor, cases, plan_id=None, retry_count=0, on_result=None, on_output=None, deadline=None):
+        """提交一组用例，立即返回 concurrent.futures.Future（结果为按完成顺序排列的结果列表）
+
+        Args:
+            on_result: 回调 func(result: dict)，每个用例完成时在事件循环线程中调用
+            on_output: 回调 func(case_hash: str, stream_name: str, chunk: bytes)，用例输出到达时调用
+            deadline: 截止时刻，见 TestCaseExecutor.run_cases
+        """
+        app = current_app._get_current_object()
+        result_writer.start()
+        pending, skipped = executor._plan_items(cases, plan_id)
+        estimates = executor._estimate_items(cases, deadline)
+        return asyncio.run_coroutine_threadsafe(
+            self._run_plan(app, executor, pending, skipped, plan_id, retry_count, on_result, on_output,
+                           estimates, deadline),
+            self._ensure_loop()
+        )
+
+    def cancel(self, plan_id):
+        """取消正在执行的计划
+
+        Returns:
+            是否有正在执行的计划被取消
+        """
+        with self.lock:
+            tasks = list(self.tasks.get(plan_id, ()))
+        for task in tasks:
+            self.loop.call_soon_threadsafe(task.cancel)
+        return bool(tasks)
+
+    def running_plans(self):
+        with self.lock:
+            return [plan_id for plan_id, tasks in self.tasks.items() if tasks]
+
+    def _ensure_loop(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, daemon=True, name='execution-engine').start()
+            return self.loop
+
+    async def _run_plan(self, app, executor, pending, skipped, plan_id, retry_count, on_result, on_output,
+                        estimates=None, deadline=None):
+        """在测试台资源池上执行一组用例，调度规则与 TestCaseExecutor.run_cases 相同"""
+        task = asyncio.current_task()
+        with self.lock:
+            self.tasks.setdefault(plan_id, set()).add(task)
+
+        results = []
+        running = set()
+        prepared = {}  # 用例ID -> 准备任务
+        last_run_ended = {}
+        pool = executor.device_pool
+
+        def report(result):
+            executor._track_idle_gap(result, last_run_ended)
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+        def take_prepared(case_id):
+            future = prepared.pop(case_id, None)
+            return future or asyncio.ensure_future(asyncio.to_thread(executor._prepare_case, app, case_id, plan_id))
+
+        try:
+            with app.app_context():
+                for result in skipped:
+                    report(result)
+
+                while pending or running:
+                    # 计划被暂停或取消时不再启动新的用例（未执行的用例留在检查点中）
+                    signal = await asyncio.to_thread(plan_checkpoint.plan_signal, app, plan_id) \
+                        if pending and plan_id is not None else None
+                    if signal:
+                        logger.info(f"计划 {plan_id} 已{executor._signal_name(signal)}，剩余 {len(pending)} 个用例不再启动")
+                        for case_id, _, _, _ in pending:
+                            if case_id in prepared:
+                                await self._discard_prepared(executor, prepared.pop(case_id), f'Plan {signal}', 'cancelled')
+                        pending = []
+                        continue
+
+                    # 预先准备即将执行的用例
+                    for case_id, _, _, _ in pending[:Config.PREFETCH_DEPTH]:
+                        if case_id not in prepared:
+                            prepared[case_id] = asyncio.ensure_future(
+                                asyncio.to_thread(executor._prepare_case, app, case_id, plan_id))
+
+                    dispatched = False
+                    idle = await asyncio.to_thread(pool.idle_count) if pending else 0
+                    blocked = set()  # 本轮已确认租不到测试台的能力要求
+                    for item in list(pending):
+                        if idle <= 0:
+                            break
+                        case_id, case_hash, name, requirements = item
+                        if requirements in blocked:
+                            continue
+                        late = executor._past_deadline(item, estimates, deadline)
+                        if late:
+                            pending.remove(item)
+                            if case_id in prepared:
+                                await self._discard_prepared(executor, prepared.pop(case_id), late['error'])
+                            report(late)
+                            continue
+
+                        lease = await pool.try_acquire_async(requirements, case_hash)
+                        if lease is None:
+                            blocked.add(requirements)
+                            continue
+                        pending.remove(item)
+                        running.add(asyncio.create_task(self._run_case(
+                            executor, item, lease, take_prepared(case_id), plan_id, retry_count, on_output)))
+                        idle -= 1
+                        dispatched = True
+
+                    if running:
+                        # 仍有用例排队时定期重试，其他进程释放的测试台不会闲置到本批用例执行完
+                        done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED,
+                                                     timeout=Config.HARDWARE_LEASE_POLL_SECONDS if pending else None)
+                        for finished in done:
+                            running.discard(finished)
+                            report(finished.result())
+                    elif pending and not dispatched:
+                        # 测试台被其他进程占用，排队等待队首用例可用的测试台
+                        item = pending.pop(0)
+                        case_id, case_hash, name, requirements = item
+                        late = executor._past_deadline(item, estimates, deadline)
+                        if late:
+                            if case_id in prepared:
+                                await self._discard_prepared(executor, prepared.pop(case_id), late['error'])
+                            report(late)
+                            continue
+                        lease = await pool.acquire_async(requirements, holder=case_hash, timeout=60)
+                        if lease is None:
+                            await self._discard_prepared(executor, take_prepared(case_id), '无法获取硬件资源（测试台）')
+                            report({'case_hash': case_hash, 'name': name, 'status': 'skipped',
+                                    'error': '无法获取硬件资源（测试台）'})
+                        else:
+                            running.add(asyncio.create_task(self._run_case(
+                                executor, item, lease, take_prepared(case_id), plan_id, retry_count, on_output)))
+
+            return results
+
+        finally:
+            # 计划被取消时终止正在执行的用例（各用例自行释放测试台并恢复状态）
+            for running_task in running:
+                running_task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            for future in prepared.values():
+                await self._discard_prepared(executor, future, 'Plan cancelled', 'cancelled')
+
+            with self.lock:
+                self.tasks[plan_id].discard(task)
+                if not self.tasks[plan_id]:
+                    del self.tasks[plan_id]
+
+    async def _run_case(self, executor, item, lease, prepared_future, plan_id, retry_count, on_output):
+        """在已租用的测试台上执行用例（含重试），返回结果字典"""
+        case_id, case_hash, name, _ = item
+        result = {'case_hash': case_hash, 'name': name, 'rig': lease.rig.name,
+                  'wait_seconds': round(lease.wait_seconds, 1)}
+
+        try:
+            try:
+                prepared = await asyncio.shield(prepared_future)
+            except asyncio.CancelledError:
+                await self._discard_prepared(executor, prepared_future, 'Plan cancelled', 'cancelled')
+                raise
+            logger.info(f"正在测试台 {lease.rig.name} 上执行用例: {name}")
+
+            for attempt in range(retry_count + 1):
+                try:
+                    status, duration, details = await self._execute_case(
+                        executor, prepared.test_case, prepared, lease, plan_id, on_output)
+                    result.pop('error', None)
+                    result.update(status=status, duration=duration, attempts=attempt + 1)
+                    if status == 'passed':
+                        break
+                except Exception as e:
+                    logger.error(f"执行用例 {case_hash} 时发生错误: {str(e)}")
+                    result.update(status='failed', error=str(e), attempts=attempt + 1)
+
+            result.update(run_started=prepared.run_started, run_ended=prepared.run_ended)
+        except Exception as e:
+            logger.error(f"执行用例 {case_hash} 时发生错误: {str(e)}")
+            result.update(status='failed', error=str(e))
+        finally:
+            await asyncio.to_thread(lease.release)
+
+        return result
+
+    async def _execute_case(self, executor, test_case, prepared, lease, plan_id, on_output):
+        """执行一次用例，流程与 TestCaseExecutor.execute_single_case 相同"""
+        case_hash = test_case.case_hash
+        previous_status = test_case.status
+        skipped = executor._mark_executing(test_case, prepared)
+        if skipped:
+            return skipped
+
+        start_time = datetime.now()
+        try:
+            cmd = executor._resolve_command(test_case, prepared)
+            result = await executor.runner.run_async(
+                cmd,
+                cwd=Config.TEST_CASE_ROOT,
+                timeout=executor.timeout,
+                log_name=case_hash[:16],
+                env=lease.env,
+                on_output=(lambda stream_name, chunk: on_output(case_hash, stream_name, chunk)) if on_output else None
+            )
+            status, details = executor._parse_result(result, test_case)
+            duration = (datetime.now() - start_time).total_seconds()
+
+        except subprocess.TimeoutExpired as e:
+            status = 'failed'
+            details = json.dumps({'error': 'Test execution timeout', 'log_file': getattr(e, 'log_file', None)})
+            duration = executor.timeout
+        except asyncio.CancelledError:
+            # 计划被取消：恢复用例状态，预先创建的执行记录标记为已取消
+            result_writer.update(test_case, for_plan=plan_id, status=previous_status, updated_at=datetime.now())
+            if prepared.execution_id:
+                result_writer.update_row(TestExecution, prepared.execution_id, for_plan=plan_id, status='cancelled',
+                                         details=json.dumps({'error': 'Plan cancelled'}))
+                prepared.execution_id = None
+            raise
+        except Exception as e:
+            status = 'failed'
+            details = json.dumps({'error': str(e), 'type': type(e).__name__})
+            duration = (datetime.now() - start_time).total_seconds()
+        finally:
+            executor._unmark_executing(case_hash, prepared)
+
+        # 保存执行结果（预先创建的执行记录只用于第一次执行，重试时插入新记录）
+        executor._save_execution_result(test_case, status, duration, details, plan_id,
+                                        execution_id=prepared.execution_id, lease=lease)
+        prepared.execution_id = None
+        return status, duration, details
+
+    @staticmethod
+    async def _discard_prepared(executor, future, reason, status='skipped'):
+        await asyncio.wait([future])
+        if not future.cancelled():
+            executor._discard_prepared(future, reason, status)
+
+
+# 全局执行引擎（同一进程内的所有计划共用一个事件循环）
+execution_engine = AsyncExecutionEngine()
@@ -0,0 +1,255 @@
+# benchmark/scan_benchmark.py
+"""用例扫描性能基准
+
+在临时目录下生成可配置规模的合成用例目录树，依次测量：
+全量扫描、无变化的增量扫描、N% 变动后的增量扫描、文件监控驱动的定点更新。
+结果（耗时、每秒文件数、数据库往返次数、峰值RSS）以 JSON 输出，便于不同提交之间对比。
+
+用法:
+    python benchmark/scan_benchmark.py --depth 3 --fanout 6 --files-per-dir 20 --churn 5 --output result.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import contextlib
+import tempfile
+import subprocess
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.schema import CreateTable, CreateIndex
+from watchdog.events import FileModifiedEvent, FileCreatedEvent, FileDeletedEvent
+
+from config import Config
+from extra.extensions import db
+import models  # noqa: F401  注册模型
+from scanner import TestCaseScanner, FileChangeHandler
+
+
+def generate_tree(root, depth, fanout, files_per_dir, file_size, tc_fraction, extensions, seed=0):
+    """生成合成用例目录树，返回生成的用例文件列表"""
+    rng = random.Random(seed)
+    case_files = []
+
+    def fill(dir_path, level):
+        os.makedirs(dir_path, exist_ok=True)
+        for i in range(files_per_dir):
+            ext = rng.choice(extensions)
+            prefix = 'tc_' if rng.random() < tc_fraction else 'util_'
+            file_path = os.path.join(dir_path, f'{prefix}{level}_{i}{ext}')
+            with open(file_path, 'wb') as f:
+                f.write(rng.randbytes(file_size))
+            if prefix == 'tc_':
+                case_files.append(file_path)
+        if level < depth:
+            for j in range(fanout):
+                fill(os.path.join(dir_path, f'dir_{level}_{j}'), level + 1)
+
+    fill(root, 0)
+    return case_files
+
+
+def apply_churn(case_files, percent, seed=1):
+    """修改、新增、删除约 percent% 的用例文件，返回 (modified, created, deleted) 路径列表"""
+    rng = random.Random(seed)
+    count = max(1, int(len(case_files) * percent / 100))
+    sample = rng.sample(case_files, min(count, len(case_files)))
+
+    # 三等分：修改、复制出新用例、删除；mtime 设为10秒前，避开时钟偏差窗口
+    past = time.time() - 10
+    third = max(1, len(sample) // 3)
+    modified, copied, deleted = sample[:third], sample[third:third * 2], sample[third * 2:]
+    created = []
+
+    for path in modified:
+        with open(path, 'ab') as f:
+            f.write(rng.randbytes(16))
+        os.utime(path, (past, past))
+    for path in copied:
+        new_path = os.path.join(os.path.dirname(path), 'tc_new_' + os.path.basename(path)[3:])
+        shutil.copyfile(path, new_path)
+        os.utime(new_path, (past, past))
+        created.append(new_path)
+    for path in deleted:
+        os.remove(path)
+
+    return modified, created, deleted
+
+
+def create_app(db_uri):
+    """创建只包含数据库的最小应用；SQLite 下跳过 MySQL 专用的前缀索引"""
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = db_uri
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            with db.engine.begin() as conn:
+                for table in db.metadata.sorted_tables:
+                    conn.execute(CreateTable(table, if_not_exists=True))
+                    for index in table.indexes:
+                        if all(hasattr(expr, 'table') for expr in index.expressions):
+                            conn.execute(CreateIndex(index, if_not_exists=True))
+        else:
+            db.create_all()
+
+    return app
+
+
+class RoundTripCounter:
+    """统计数据库往返次数"""
+
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+
+def peak_rss_kb():
+    """进程峰值RSS（KB），平台不支持时返回 None"""
+    try:
+        import resource
+        usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS 返回字节，Linux 返回KB
+        return usage // 1024 if sys.platform == 'darwin' else usage
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset // 1024
+        except (ImportError, AttributeError):
+            return None
+
+
+def measure(name, counter, files, func):
+    """执行一个场景并记录指标"""
+    start_trips = counter.count
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'scenario': name,
+        'wall_time_s': round(elapsed, 4),
+        'files': files,
+        'files_per_s': round(files / elapsed, 1) if elapsed > 0 else None,
+        'db_round_trips': counter.count - start_trips,
+        'peak_rss_kb': peak_rss_kb(),
+        'result': result
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix='scan_bench_')
+    try:
+        case_root = os.path.join(work_dir, 'cases')
+        Config.SCAN_MANIFEST_PATH = os.path.join(work_dir, 'scan_manifest.db')
+        db_uri = args.db_uri or f"sqlite:///{os.path.join(work_dir, 'bench.db')}"
+
+        gen_start = time.perf_counter()
+        case_files = generate_tree(case_root, args.depth, args.fanout, args.files_per_dir, args.file_size,
+                                   args.tc_fraction, args.extensions.split(','), args.seed)
+        gen_time = time.perf_counter() - gen_start
+        # 生成后回拨mtime，避开时钟偏差窗口
+        past = time.time() - 60
+        for path in case_files:
+            os.utime(path, (past, past))
+
+        app = create_app(db_uri)
+        results = []
+        with app.app_context():
+            db_label = db.engine.url.render_as_string(hide_password=True)
+            counter = RoundTripCounter(db.engine)
+            scanner = TestCaseScanner(case_root)
+            total = len(case_files)
+
+            results.append(measure('full_scan_cold', counter, total, lambda: scanner.scan_all_cases()))
+            results.append(measure('full_scan_warm_manifest', counter, total,
+                                   lambda: scanner.scan_all_cases(update_status=False)))
+            results.append(measure('incremental_noop', counter, total, scanner.scan_new_and_changed_cases))
+
+            modified, created, deleted = apply_churn(case_files, args.churn, args.seed + 1)
+            results.append(measure(f'incremental_churn_{args.churn}pct', counter, total,
+                                   scanner.scan_new_and_changed_cases))
+
+            # 文件监控：模拟事件后立即处理（防抖窗口设为很大，避免后台线程抢先处理）
+            handler = FileChangeHandler(scanner, app, debounce=3600, max_delay=3600)
+            modified, created, deleted = apply_churn(
+                [p for p in case_files if os.path.exists(p)], args.churn, args.seed + 2)
+            for path in modified:
+                handler.on_modified(FileModifiedEvent(path))
+            for path in created:
+                handler.on_created(FileCreatedEvent(path))
+            for path in deleted:
+                handler.on_deleted(FileDeletedEvent(path))
+            changed = len(modified) + len(created) + len(deleted)
+            results.append(measure('watchdog_updates', counter, changed, handler.flush))
+
+        return {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(),
+            'config': {
+                'depth': args.depth,
+                'fanout': args.fanout,
+                'files_per_dir': args.files_per_dir,
+                'file_size': args.file_size,
+                'tc_fraction': args.tc_fraction,
+                'extensions': args.extensions,
+                'churn_pct': args.churn,
+                'db': db_label,
+                'case_files': len(case_files),
+                'generate_time_s': round(gen_time, 3)
+            },
+            'results': results
+        }
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='用例扫描性能基准')
+    parser.add_argument('--depth', type=int, default=3, help='目录深度')
+    parser.add_argument('--fanout', type=int, default=5, help='每层子目录数')
+    parser.add_argument('--files-per-dir', type=int, default=20, help='每个目录的文件数')
+    parser.add_argument('--file-size', type=int, default=4096, help='文件大小（字节）')
+    parser.add_argument('--tc-fraction', type=float, default=0.8, help='tc_ 用例文件比例')
+    parser.add_argument('--extensions', default='.py,.robot,.java', help='文件扩展名，逗号分隔')
+    parser.add_argument('--churn', type=float, default=5, help='增量场景的变动比例（%%）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--db-uri', help='数据库URI，默认使用临时SQLite文件')
+    parser.add_argument('--output', help='结果输出文件，默认输出到标准输出')
+    parser.add_argument('--keep', action='store_true', help='保留生成的临时目录')
+    args = parser.parse_args()
+
+    # 扫描过程中的日志输出到标准错误，保证标准输出只有 JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run(args)
+
+    report = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
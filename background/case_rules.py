@@ -0,0 +1,119 @@
+import os
+import re
+from config import Config
+
+
+def glob_to_regex(pattern):
+    """将 glob 模式转换为匹配相对路径（'/' 分隔）的正则
+
+    不含 '/' 的模式只匹配文件名；'**/' 匹配任意层目录（含零层）；以 '/' 结尾的模式匹配该目录下的所有文件。
+    """
+    pattern = pattern.replace('\\', '/').lstrip('/')
+    parts = [] if '/' in pattern.rstrip('/') else ['(?:.*/)?']
+
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+            continue
+        if pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+            continue
+
+        char = pattern[i]
+        if char == '*':
+            parts.append('[^/]*')
+        elif char == '?':
+            parts.append('[^/]')
+        elif char == '[' and pattern.find(']', i + 2) != -1:
+            end = pattern.find(']', i + 2)
+            body = pattern[i + 1:end]
+            if body.startswith('!'):
+                body = '^' + body[1:]
+            parts.append('[' + body.replace('\\', '\\\\') + ']')
+            i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+
+    if pattern.endswith('/'):
+        parts.append('.*')
+    return ''.join(parts)
+
+
+class CaseRuleSet:
+    """用例识别规则
+
+    扩展名、包含/排除的 glob 与正则在初始化时编译为一个正则，
+    每个目录项只需对其相对路径做一次匹配。扫描器、目录遍历器与文件监控共用同一份规则。
+    """
+
+    def __init__(self, extensions=None, include_globs=None, include_regexes=None,
+                 exclude_globs=None, exclude_regexes=None, runners=None, capability_rules=None):
+        """
+        Args:
+            extensions: 用例文件扩展名，如 ['.py', '.robot']
+            include_globs / include_regexes: 包含规则，满足任一即可；都为空时包含所有该扩展名的文件
+            exclude_globs / exclude_regexes: 排除规则，满足任一即排除
+            runners: 各扩展名的执行命令 {扩展名: [参数, ...]}，参数中的 '{path}' 替换为用例完整路径
+            capability_rules: 用例所需的测试台能力 {glob: [能力, ...]}
+        """
+        self.extensions = {ext.lower() for ext in (extensions or [])}
+        self.runners = {ext.lower(): list(cmd) for ext, cmd in (runners or {}).items()}
+
+        # glob 需要完整匹配相对路径，正则在相对路径中搜索
+        includes = [glob_to_regex(p) for p in include_globs or []] + \
+                   [f'.*?(?:{p}).*' for p in include_regexes or []]
+        excludes = [glob_to_regex(p) for p in exclude_globs or []] + \
+                   [f'.*?(?:{p}).*' for p in exclude_regexes or []]
+
+        pattern = ''
+        if excludes:
+            pattern += '(?!(?:' + '|'.join(excludes) + r')\Z)'
+        if self.extensions:
+            pattern += r'(?=.*\.(?:' + '|'.join(re.escape(ext.lstrip('.')) for ext in sorted(self.extensions)) + r')\Z)'
+        pattern += '(?:' + ('|'.join(includes) if includes else '.*') + r')\Z'
+
+        self.pattern = re.compile(pattern, re.IGNORECASE | re.DOTALL)
+        self.capability_rules = [
+            (re.compile(glob_to_regex(glob) + r'\Z', re.IGNORECASE | re.DOTALL), frozenset(capabilities))
+            for glob, capabilities in (capability_rules or {}).items()
+        ]
+
+    @classmethod
+    def from_config(cls):
+        """根据 Config 中的规则配置创建"""
+        return cls(
+            extensions=Config.CASE_EXTENSIONS,
+            include_globs=Config.CASE_INCLUDE_GLOBS,
+            include_regexes=Config.CASE_INCLUDE_REGEXES,
+            exclude_globs=Config.CASE_EXCLUDE_GLOBS,
+            exclude_regexes=Config.CASE_EXCLUDE_REGEXES,
+            runners=Config.CASE_RUNNERS,
+            capability_rules=Config.CASE_CAPABILITY_RULES
+        )
+
+    def matches(self, relative_path):
+        """判断相对于用例根目录的路径是否为测试用例"""
+        if os.sep != '/':
+            relative_path = relative_path.replace(os.sep, '/')
+        return self.pattern.match(relative_path) is not None
+
+    def capabilities_for(self, relative_path):
+        """用例所需的测试台能力（所有匹配规则的并集）"""
+        if os.sep != '/':
+            relative_path = relative_path.replace(os.sep, '/')
+        required = frozenset()
+        for pattern, capabilities in self.capability_rules:
+            if pattern.match(relative_path):
+                required |= capabilities
+        return required
+
+    def runner_for(self, full_path):
+        """返回用例的执行命令，未配置该扩展名的执行命令时返回 None"""
+        command = self.runners.get(os.path.splitext(full_path)[1].lower())
+        if command is None:
+            return None
+        return [arg.replace('{path}', full_path) for arg in command]
@@ -19,14 +19,94 @@ class Config:
     # 用例目录配置
     TEST_CASE_ROOT = os.environ.get('TEST_CASE_ROOT') or r'D:\temp\ADS1_0_TEST\robotest_ver2\test_script\06_花瓣适配'
 
+    # 用例识别规则：编译为一个正则，对相对路径（统一按 '/' 分隔）匹配，不区分大小写
+    CASE_EXTENSIONS = ['.py', '.java', '.js', '.ts', '.robot']
+    CASE_INCLUDE_GLOBS = ['*tc_*']  # 不含 '/' 的模式只匹配文件名，'**/' 匹配任意层目录
+    CASE_INCLUDE_REGEXES = []  # 在相对路径中搜索
+    CASE_EXCLUDE_GLOBS = []  # 以 '/' 结尾的模式排除整个目录，如 'deprecated/'
+    CASE_EXCLUDE_REGEXES = []
+    # 各扩展名的执行命令，'{path}' 替换为用例完整路径
+    CASE_RUNNERS = {
+        '.py': ['python', '{path}'],
+        '.java': ['java', '-jar', 'test-runner.jar', '{path}']
+    }
+    # 用例所需的测试台能力：{glob: [能力, ...]}，匹配多条规则时取并集
+    CASE_CAPABILITY_RULES = {}
+
+    # 扫描配置
+    SCAN_WALK_WORKERS = 8  # 并行遍历目录的线程数
+    SCAN_MTIME_SKEW_SECONDS = 2  # mtime 距扫描时刻小于该值时仍计算内容哈希（时钟偏差窗口）
+    SCAN_DB_BATCH_SIZE = 500  # 扫描结果写库的批大小（每批一个事务）
+    # 本地扫描清单（记录文件指纹与内容哈希，重启后无需重新计算哈希）
+    SCAN_MANIFEST_PATH = os.environ.get('SCAN_MANIFEST_PATH') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'scan_manifest.db')
+    SCAN_MANIFEST_MMAP_SIZE = 64 * 1024 * 1024
+    # 目录剪枝：目录自身 mtime 与子项数未变时跳过其中文件的 stat
+    SCAN_DIR_PRUNING = True
+    SCAN_FULL_PASS_EVERY = 12  # 每 N 次增量扫描做一次不剪枝的完整遍历（5分钟一次即每小时一次）
+
+    # 内容哈希配置
+    CONTENT_HASH_ALGORITHM = os.environ.get('CONTENT_HASH_ALGORITHM') or 'md5'  # md5 / blake2b / sha256
+    CONTENT_HASH_MODE = os.environ.get('CONTENT_HASH_MODE') or 'head'  # head: 只取前100KB; full: 整个文件
+    CONTENT_HASH_WORKERS = 4
+    # thread / process；hashlib 计算时会释放GIL，线程池通常足够。
+    # Windows 下进程池会重新导入启动模块，使用 process 前需确认入口模块有 __main__ 保护
+    CONTENT_HASH_POOL = 'thread'
+    CONTENT_HASH_PARALLEL_MIN = 32  # 少于该数量的文件直接在当前线程计算
+    CONTENT_HASH_CHUNK_SIZE = 1024 * 1024
+    CONTENT_HASH_MMAP_THRESHOLD = 16 * 1024 * 1024  # 超过该大小的文件使用 mmap 读取
+    CONTENT_HASH_BATCH_SIZE = 256  # 每批计算的文件数，批之间检查扫描任务是否被取消
+
+    # 扫描任务配置
+    SCAN_JOB_HISTORY = 50  # 保留的历史扫描任务数
+
     # 定时任务配置
     SCHEDULE_START_TIME = time(23, 0)  # 晚上11点
     SCHEDULE_END_TIME = time(8, 0)  # 次日8点
+    SCHEDULE_SAFETY_MARGIN_MINUTES = 15  # 定时窗口装箱时在结束时刻前预留的余量（预计时长为历史平均值）
 
     # 执行器配置
-    # 注意：由于测试用例依赖唯一的硬件资源（测试机），必须串行执行
-    MAX_CONCURRENT_TESTS = 1  # 串行执行，一次只能执行一条用例
+    # 测试台（硬件资源）：每个测试台同一时间只执行一条用例，多个测试台之间并行
+    # capabilities 为测试台具备的能力，env 为在该测试台上执行用例时附加的环境变量
+    TEST_RIGS = [
+        {'name': 'rig-1', 'capabilities': [], 'env': {}}
+    ]
+    # 测试台租约记录在本机的 SQLite 文件中，同一主机上的所有进程共用
+    HARDWARE_LEASE_PATH = os.environ.get('HARDWARE_LEASE_PATH') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'hardware_leases.db')
+    HARDWARE_LEASE_HEARTBEAT_SECONDS = 5  # 持有者进程写心跳的间隔
+    HARDWARE_LEASE_STALE_SECONDS = 60  # 心跳超过该时间未更新的租约与等待项视为失效并回收
+    HARDWARE_LEASE_POLL_SECONDS = 0.5  # 排队等待时检查其他进程释放测试台的间隔
+    MAX_CONCURRENT_TESTS = len(TEST_RIGS)  # 最大并行数等于测试台数
     TEST_TIMEOUT = 600  # 10分钟超时
+    EXECUTION_TAIL_BYTES = 16 * 1024  # 每个输出流保留入库的尾部字节数
+    EXECUTION_LOG_ENABLED = True  # 是否将完整输出写入压缩日志文件
+    EXECUTION_LOG_DIR = os.environ.get('EXECUTION_LOG_DIR') or \
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'execution_logs')
+
+    # 预热解释器：形如 [python, 用例.py] 的用例在预先导入常用模块的解释器中 fork 执行（仅 POSIX）
+    WARM_RUNNER_ENABLED = False
+    WARM_RUNNER_PRELOAD = []  # 预先导入的模块，如 ['robot']
+    WARM_RUNNER_MAX_CASES = 100  # 每个预热解释器执行该数量的用例后回收重建
+    WARM_RUNNER_START_TIMEOUT = 60  # 等待预热解释器启动（含预导入）的时间（秒）
+
+    # 异步执行引擎：所有计划在一个 asyncio 事件循环中执行（支持取消），不再每个计划占用一组线程
+    ASYNC_ENGINE_ENABLED = False
+
+    # 结果缓存：内容未变、最近在配置相同的测试台上通过过的用例直接记为通过，不再占用测试台
+    RESULT_CACHE_ENABLED = False
+    RESULT_CACHE_TTL_HOURS = 12  # 缓存有效期（小时）
+
+    # 用例预取配置：当前用例占用测试台期间预先准备后续用例
+    PREFETCH_DEPTH = len(TEST_RIGS)  # 预先准备的用例数（每个测试台准备好下一个用例）
+    PREFETCH_WARM_BYTES = 1024 * 1024  # 准备用例时预读入文件缓存的字节数
+
+    # 执行结果后写配置：执行线程只入队，写线程按条数或时间间隔批量落库
+    RESULT_WRITE_BATCH_SIZE = 200  # 每批最多合并的写操作数
+    RESULT_WRITE_INTERVAL = 1.0  # 最长攒批时间（秒）
+    RESULT_WRITE_QUEUE_SIZE = 10000  # 队列容量，写满时执行线程阻塞
+    RESULT_WRITE_MAX_RETRIES = 3  # 写入失败的重试次数
+    RESULT_WRITE_CLOSE_TIMEOUT = 30  # 进程退出时等待剩余数据写入的时间（秒）
 
     # 执行优先级权重
     PRIORITY_WEIGHTS = {
@@ -37,6 +117,8 @@ class Config:
         'short_duration': 0.3
     }
 
+    PRIORITY_REFRESH_MINUTES = 60  # 定期刷新 priority_score（“距上次执行天数”随时间变化）
+
     # 优先目录配置
     HIGH_PRIORITY_DIRS = [
         '00_红线用例/'
@@ -56,7 +138,14 @@ class Config:
     # 分布式任务配置
     ENABLE_DISTRIBUTED = os.environ.get('ENABLE_DISTRIBUTED', 'false').lower() == 'true'
     DISTRIBUTED_LOCK_TIMEOUT = 300  # 分布式锁超时时间（秒）
+    SCAN_SHARD_STRATEGY = 'top_dir'  # 分布式扫描分片方式：'top_dir' 按顶层目录，'path_hash' 按相对路径哈希
+    SCAN_SHARD_CHUNK_SIZE = 1000  # 分片结果每条消息包含的用例数
+    SCAN_SHARD_IDLE_TIMEOUT = 600  # 超过该时间（秒）未收到任何分片消息时，未完成的分片改由本机扫描
+    SHARD_DEFAULT_CASE_DURATION = 60  # 分布式计划分片时，没有历史时长的用例的预计时长（秒）
 
     # 文件监控配置
     WATCHDOG_ENABLED = True
     WATCHDOG_INTERVAL = 30  # 监控间隔（秒）
+    WATCHDOG_DEBOUNCE_SECONDS = 5  # 事件平静多久后处理变更路径
+    WATCHDOG_MAX_DELAY_SECONDS = 30  # 持续有事件时最长等待时间
+    WATCHDOG_MAX_RETRIES = 3  # 定点更新连续失败的重试次数（按防抖间隔指数退避），超过后交给定时扫描
@@ -0,0 +1,179 @@
+import time
+import asyncio
+from datetime import datetime
+from config import Config
+from hardware_lease import HardwareLeaseStore
+
+
+class Rig:
+    """测试台（具名硬件资源）"""
+
+    def __init__(self, name, capabilities=None, env=None):
+        """
+        Args:
+            name: 测试台名称
+            capabilities: 测试台具备的能力标签，如 ['wifi', 'camera']
+            env: 在该测试台上执行用例时附加的环境变量，如测试台地址
+        """
+        self.name = name
+        self.capabilities = frozenset(capabilities or [])
+        self.env = dict(env or {})
+
+    def satisfies(self, requirements):
+        return self.capabilities.issuperset(requirements)
+
+    def to_dict(self, lease=None):
+        """转换为字典，lease 为主机级租约信息（空闲时为 None）"""
+        return {
+            'name': self.name,
+            'capabilities': sorted(self.capabilities),
+            'busy': lease is not None,
+            'holder': lease['holder'] if lease else None,
+            'pid': lease['pid'] if lease else None,
+            'acquired_at': datetime.fromtimestamp(lease['acquired_at']).isoformat() if lease else None,
+            'heartbeat_at': datetime.fromtimestamp(lease['heartbeat_at']).isoformat() if lease else None
+        }
+
+
+class RigLease:
+    """测试台租约，释放后测试台回到空闲状态"""
+
+    def __init__(self, pool, rig, holder, token, wait_seconds=0.0):
+        self.pool = pool
+        self.rig = rig
+        self.holder = holder
+        self.token = token
+        self.wait_seconds = wait_seconds  # 排队等待测试台的时间
+        self.released = False
+
+    @property
+    def env(self):
+        """执行用例时使用的环境变量（TEST_RIG 为测试台名称）"""
+        return dict(self.rig.env, TEST_RIG=self.rig.name)
+
+    def release(self):
+        if not self.released:
+            self.released = True
+            self.pool.release(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class DevicePool:
+    """测试台资源池
+
+    每个测试台同一时间只租给一个用例。用例声明所需的能力（见 CaseRuleSet.capabilities_for），
+    只会分配到具备全部能力的空闲测试台。租约记录在主机级的 HardwareLeaseStore 中，
+    同一主机上的多个进程（API 服务、调度器、命令行脚本）共用同一组测试台也不会重复占用。
+    """
+
+    def __init__(self, rigs, store=None):
+        self.rigs = list(rigs)
+        self.rigs_by_name = {rig.name: rig for rig in self.rigs}
+        self.store = store or HardwareLeaseStore()
+
+    @classmethod
+    def from_config(cls):
+        """根据 Config.TEST_RIGS 创建"""
+        return cls(Rig(rig['name'], rig.get('capabilities'), rig.get('env')) for rig in Config.TEST_RIGS)
+
+    def __len__(self):
+        return len(self.rigs)
+
+    def can_satisfy(self, requirements):
+        """池中是否存在具备全部所需能力的测试台（不论是否空闲）"""
+        return any(rig.satisfies(requirements) for rig in self.rigs)
+
+    def try_acquire(self, requirements=(), holder=None):
+        """立即租用一个满足要求的空闲测试台，没有时返回 None
+
+        不进入等待队列，也不会抢占排在队列中、同样能使用该测试台的等待者。
+        """
+        claimed = self.store.try_acquire(self._candidates(requirements), holder or 'anonymous')
+        if claimed is None:
+            return None
+        rig_name, token = claimed
+        return RigLease(self, self.rigs_by_name[rig_name], holder or 'anonymous', token)
+
+    def acquire(self, requirements=(), holder=None, timeout=None):
+        """排队等待并租用一个满足要求的空闲测试台，超时返回 None"""
+        claimed = self.store.acquire(self._candidates(requirements), holder or 'anonymous', timeout)
+        if claimed is None:
+            return None
+        rig_name, token, wait_seconds = claimed
+        return RigLease(self, self.rigs_by_name[rig_name], holder or 'anonymous', token, wait_seconds)
+
+    async def try_acquire_async(self, requirements=(), holder=None):
+        """try_acquire 的协程版本，可被取消（取消时已在线程中租到的测试台随即释放）"""
+        return await self._shielded(RigLease.release, self.try_acquire, requirements, holder)
+
+    async def acquire_async(self, requirements=(), holder=None, timeout=None):
+        """acquire 的协程版本：排队期间不占用线程，可被取消（取消时退出等待队列）"""
+        holder = holder or 'anonymous'
+        candidates = self._candidates(requirements)
+        start = time.monotonic()
+
+        def claim():
+            claimed = self.store.claim(candidates, holder, waiter_id)
+            if claimed is None:
+                return None
+            rig_name, token = claimed
+            return RigLease(self, self.rigs_by_name[rig_name], holder, token, time.monotonic() - start)
+
+        waiter_id = await self._shielded(self.store.dequeue, self.store.enqueue, candidates, holder)
+        try:
+            while True:
+                lease = await self._shielded(RigLease.release, claim)
+                if lease is not None:
+                    return lease
+
+                remaining = None if timeout is None else start + timeout - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                await asyncio.sleep(Config.HARDWARE_LEASE_POLL_SECONDS if remaining is None
+                                    else min(Config.HARDWARE_LEASE_POLL_SECONDS, remaining))
+        finally:
+            await asyncio.to_thread(self.store.dequeue, waiter_id)
+
+    def release(self, lease):
+        self.store.release(lease.rig.name, lease.token)
+
+    @staticmethod
+    async def _shielded(cleanup, func, *args):
+        """在线程中执行 func 并返回结果
+
+        线程中的租用/排队一旦提交就无法撤销。等待期间协程被取消时（如 AsyncExecutionEngine.cancel），
+        线程结束后对其返回值调用 cleanup，否则租约丢失，本进程的心跳会一直续租，测试台直到进程重启都不会空闲。
+        """
+        task = asyncio.ensure_future(asyncio.to_thread(func, *args))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            def abandon(done):
+                if not done.cancelled() and done.exception() is None and done.result() is not None:
+                    done.get_loop().run_in_executor(None, cleanup, done.result())
+            task.add_done_callback(abandon)
+            raise
+
+    def idle_count(self):
+        leases, _ = self.store.snapshot()
+        return sum(1 for rig in self.rigs if rig.name not in leases)
+
+    def status(self):
+        """各测试台的占用情况与等待队列（包括其他进程的租约与等待者）"""
+        leases, queue = self.store.snapshot()
+        return {
+            'rigs': [rig.to_dict(leases.get(rig.name)) for rig in self.rigs],
+            'queue': queue
+        }
+
+    def _candidates(self, requirements):
+        return [rig.name for rig in self.rigs if rig.satisfies(requirements)]
+
+
+# 全局测试台资源池（同一进程内的所有执行器共用，跨进程的互斥由 HardwareLeaseStore 保证）
+device_pool = DevicePool.from_config()
@@ -152,10 +152,31 @@ class DistributedManager:
 
             return machines
 
-    def assign_task_to_machine(self, task_data):
-        """分配任务到机器"""
+    def push_message(self, queue_key, data, expire=None):
+        """将消息推入Redis队列
+
+        Args:
+            expire: 队列过期时间（秒），避免无人消费的队列长期残留
+        """
+        self.redis_client.rpush(queue_key, json.dumps(data))
+        if expire:
+            self.redis_client.expire(queue_key, expire)
+
+    def pop_message(self, queue_key, timeout=5):
+        """阻塞读取Redis队列中的一条消息，超时返回 None"""
+        item = self.redis_client.blpop(queue_key, timeout=max(1, int(timeout)))
+        return json.loads(item[1]) if item else None
+
+    def assign_task_to_machine(self, task_data, machine_id=None):
+        """分配任务到机器
+
+        Args:
+            machine_id: 指定执行机器，为空时选择负载最低的机器
+        """
         machines = self.get_available_machines()
 
+        if machine_id:
+            machines = [m for m in machines if m.machine_id == machine_id]
         if not machines:
             return None
 
@@ -0,0 +1,289 @@
+import os
+import time
+import zlib
+import threading
+from datetime import datetime
+from config import Config
+from utils.logger import logger
+
+SCAN_TASK_QUEUE = 'scan_tasks:{machine_id}'
+SCAN_RESULT_QUEUE = 'scan_results:{job_id}'
+SCAN_CANCEL_KEY = 'scan_cancel:{job_id}'
+
+
+def shard_of(relative_path, shard_count):
+    """按相对路径计算分片序号（crc32，跨进程、跨机器稳定）"""
+    return zlib.crc32(relative_path.encode('utf-8')) % shard_count
+
+
+def plan_shards(root_dir, shard_count, strategy=None, weights=None):
+    """将用例目录树划分为 shard_count 个分片
+
+    Args:
+        root_dir: 用例根目录
+        shard_count: 分片数
+        strategy: 'top_dir' 按顶层目录划分，按估计文件数贪心分配到当前最轻的分片，根目录下的文件归第0个分片；
+            'path_hash' 按相对路径哈希取模划分，各分片都要遍历整棵树，但只对自己的文件做 stat 与哈希
+        weights: 顶层目录的估计文件数 {目录名: 文件数}，缺省按1计
+
+    Returns:
+        分片描述列表 [{'index', 'count', 'strategy', 'top_dirs', 'root_files'}]
+    """
+    strategy = strategy or Config.SCAN_SHARD_STRATEGY
+    shards = [{'index': i, 'count': shard_count, 'strategy': strategy, 'top_dirs': [], 'root_files': i == 0}
+              for i in range(shard_count)]
+    if strategy == 'path_hash':
+        return shards
+
+    weights = weights or {}
+    with os.scandir(root_dir) as it:
+        top_dirs = [entry.name for entry in it if entry.is_dir(follow_symlinks=False)]
+
+    loads = [0] * shard_count
+    for name in sorted(top_dirs, key=lambda name: (-weights.get(name, 1), name)):
+        index = loads.index(min(loads))
+        shards[index]['top_dirs'].append(name)
+        loads[index] += weights.get(name, 1)
+
+    return shards
+
+
+def iter_shard_files(scanner, shard):
+    """遍历分片内的用例文件，产出 (Path, stat)"""
+    if shard['strategy'] == 'path_hash':
+        for file_path, stat in scanner._create_walker().walk():
+            if shard_of(str(file_path.relative_to(scanner.root_dir)), shard['count']) == shard['index']:
+                yield file_path, stat
+        return
+
+    if shard['root_files']:
+        with os.scandir(scanner.root_dir) as it:
+            entries = [entry for entry in it if entry.is_file()]
+        for entry in entries:
+            file_path = scanner.root_dir / entry.name
+            if scanner._is_test_case(file_path):
+                yield file_path, entry.stat()
+
+    for name in shard['top_dirs']:
+        dir_path = scanner.root_dir / name
+        if dir_path.is_dir():
+            yield from scanner._create_walker(dir_path).walk()
+
+
+def to_wire(case_info):
+    """用例信息转换为分片消息中的紧凑格式"""
+    return [case_info['relative_path'], case_info['file_size'], case_info['file_mtime'].timestamp(),
+            case_info['content_hash'], case_info['content_hash_algo']]
+
+
+class DistributedScanCoordinator:
+    """分布式扫描协调者
+
+    按在线机器数划分分片，通过 DistributedManager 的 Redis 队列下发给各机器的 ScanShardWorker，
+    本机分片在当前线程中直接扫描，同时由接收线程消费远端分片回传的部分结果（结果队列不会因等待本机分片而过期）；
+    各分片的结果合并后统一做一次数据库同步。
+    没有其他在线机器时退化为本机全量扫描；超时或失败的分片由本机补扫。
+    """
+
+    def __init__(self, scanner, distributed_manager):
+        self.scanner = scanner
+        self.manager = distributed_manager
+        self.job = scanner.job
+
+    def run(self, update_status=True):
+        machine_ids = self._machine_ids()
+        if len(machine_ids) <= 1:
+            logger.info("No other online machines, running local full scan")
+            return {'updated_count': self.scanner.scan_all_cases(update_status=update_status),
+                    'shard_count': 1, 'machines': machine_ids, 'fallback_shards': []}
+
+        shards = plan_shards(self.scanner.root_dir, len(machine_ids), weights=self._estimate_weights())
+        assignments = dict(zip(machine_ids, shards))
+        reply_to = SCAN_RESULT_QUEUE.format(job_id=self.job.id)
+        expire = Config.SCAN_SHARD_IDLE_TIMEOUT * 2
+
+        pending = set()
+        failed = set()
+        for machine_id, shard in assignments.items():
+            if machine_id == Config.MACHINE_ID:
+                continue
+            try:
+                self.manager.push_message(SCAN_TASK_QUEUE.format(machine_id=machine_id), {
+                    'job_id': self.job.id,
+                    'shard': shard,
+                    'reply_to': reply_to,
+                    'coordinator': Config.MACHINE_ID
+                }, expire=expire)
+                pending.add(shard['index'])
+            except Exception as e:
+                logger.warning(f"Failed to dispatch scan shard {shard['index']} to {machine_id}: {str(e)}")
+                failed.add(shard['index'])
+
+        # 本机分片在当前线程中扫描，远端分片的结果同时在接收线程中消费
+        remote = {}
+        collected = {'failed': set(), 'error': None}
+        stop = threading.Event()
+
+        def collect():
+            try:
+                collected['failed'] = self._collect_remote(reply_to, pending, remote, stop)
+            except Exception as e:
+                collected['error'] = e
+
+        collector = threading.Thread(target=collect, daemon=True, name='scan-shard-collector')
+        collector.start()
+        try:
+            merged = {case_info['case_hash']: case_info
+                      for case_info in self.scanner.collect_case_infos(
+                          iter_shard_files(self.scanner, assignments[Config.MACHINE_ID]))}
+        except Exception:
+            stop.set()
+            collector.join()
+            self._signal_cancel()
+            raise
+
+        collector.join()
+        if collected['error'] is not None:
+            self._signal_cancel()
+            raise collected['error']
+        failed |= collected['failed']
+        merged.update(remote)
+
+        for index in sorted(failed):
+            logger.warning(f"Scan shard {index} did not complete remotely, scanning locally")
+            for case_info in self.scanner.collect_case_infos(iter_shard_files(self.scanner, shards[index])):
+                merged[case_info['case_hash']] = case_info
+
+        updated_count = self.scanner._update_database(list(merged.values()), update_status)
+        return {'updated_count': updated_count, 'shard_count': len(shards), 'machines': machine_ids,
+                'fallback_shards': sorted(failed)}
+
+    def _machine_ids(self):
+        """参与分片的机器：本机排在首位，其后为其他在线机器"""
+        others = sorted(machine.machine_id for machine in self.manager.get_available_machines()
+                        if machine.machine_id != Config.MACHINE_ID)
+        return [Config.MACHINE_ID] + others
+
+    def _estimate_weights(self):
+        """根据本地扫描清单估计各顶层目录的文件数，用于均衡分片"""
+        from manifest import ScanManifest
+
+        weights = {}
+        for relative_path in ScanManifest(self.scanner.root_dir).load().entries:
+            top, sep, _ = relative_path.partition(os.sep)
+            if sep:
+                weights[top] = weights.get(top, 0) + 1
+        return weights
+
+    def _collect_remote(self, reply_to, pending, merged, stop=None):
+        """接收远端分片结果，返回未能完成的分片序号集合（stop 被设置时提前返回）"""
+        scan_time = datetime.now()
+        failed = set()
+        last_message = time.monotonic()
+
+        while pending and not (stop and stop.is_set()):
+            self.job.check_cancelled()
+            idle = time.monotonic() - last_message
+            if idle >= Config.SCAN_SHARD_IDLE_TIMEOUT:
+                failed |= pending
+                break
+
+            message = self.manager.pop_message(reply_to, timeout=min(5, Config.SCAN_SHARD_IDLE_TIMEOUT - idle))
+            if message is None:
+                continue
+            last_message = time.monotonic()
+
+            entries = message.get('entries', [])
+            for relative_path, file_size, mtime, content_hash, algo in entries:
+                case_info = self.scanner._build_case_info(relative_path, file_size, datetime.fromtimestamp(mtime),
+                                                          content_hash, algo, scan_time)
+                merged[case_info['case_hash']] = case_info
+            self.job.add(files_seen=len(entries))
+
+            if message.get('done'):
+                pending.discard(message['shard'])
+                self.job.add(files_hashed=message.get('files_hashed', 0), bytes_read=message.get('bytes_read', 0))
+                if message.get('error'):
+                    logger.warning(f"Scan shard {message['shard']} failed on {message.get('machine_id')}: "
+                                   f"{message['error']}")
+                    failed.add(message['shard'])
+
+        return failed
+
+    def _signal_cancel(self):
+        """通知远端分片停止"""
+        try:
+            self.manager.redis_client.set(SCAN_CANCEL_KEY.format(job_id=self.job.id), 1,
+                                          ex=Config.SCAN_SHARD_IDLE_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Failed to signal scan cancellation: {str(e)}")
+
+
+class ScanShardWorker:
+    """扫描分片工作线程
+
+    监听本机的分片任务队列，遍历并计算分片内用例的内容哈希（复用本机的扫描清单），
+    每凑满 SCAN_SHARD_CHUNK_SIZE 个用例就推回协调者的结果队列，大分片在遍历期间也持续有消息到达，
+    协调者不会因 SCAN_SHARD_IDLE_TIMEOUT 误判分片失败。分片不访问数据库。
+    """
+
+    def __init__(self, app, distributed_manager=None):
+        from distributed import DistributedManager
+
+        self.app = app
+        self.manager = distributed_manager or DistributedManager(app)
+        self.queue_key = SCAN_TASK_QUEUE.format(machine_id=Config.MACHINE_ID)
+
+    def start(self):
+        thread = threading.Thread(target=self._worker, daemon=True, name='scan-shard-worker')
+        thread.start()
+
+    def _worker(self):
+        while True:
+            try:
+                task = self.manager.pop_message(self.queue_key, timeout=5)
+                if task:
+                    with self.app.app_context():
+                        self.run_task(task)
+            except Exception as e:
+                logger.error(f"Scan shard worker error: {str(e)}")
+                time.sleep(5)
+
+    def run_task(self, task):
+        """执行一个分片任务"""
+        from scanner import TestCaseScanner
+        from scan_jobs import ScanJob, ScanCancelled
+
+        shard = task['shard']
+        job = ScanJob(Config.TEST_CASE_ROOT, 'shard')
+        scanner = TestCaseScanner(job=job)
+        cancel_key = SCAN_CANCEL_KEY.format(job_id=task['job_id'])
+        expire = Config.SCAN_SHARD_IDLE_TIMEOUT * 2
+        logger.info(f"Scanning shard {shard['index']}/{shard['count']} for job {task['job_id']}")
+
+        done = {'shard': shard['index'], 'done': True, 'machine_id': Config.MACHINE_ID}
+        try:
+            files = self._watch_cancel(iter_shard_files(scanner, shard), job, cancel_key)
+            for chunk in scanner.iter_case_infos(files, Config.SCAN_SHARD_CHUNK_SIZE):
+                if chunk:
+                    self.manager.push_message(task['reply_to'], {
+                        'shard': shard['index'],
+                        'entries': [to_wire(case_info) for case_info in chunk]
+                    }, expire=expire)
+
+            done.update(files_hashed=job.files_hashed, bytes_read=job.bytes_read)
+        except ScanCancelled:
+            logger.info(f"Scan shard {shard['index']} for job {task['job_id']} cancelled")
+            return
+        except Exception as e:
+            logger.error(f"Scan shard {shard['index']} failed: {str(e)}")
+            done['error'] = str(e)
+
+        self.manager.push_message(task['reply_to'], done, expire=expire)
+
+    def _watch_cancel(self, files, job, cancel_key):
+        """遍历过程中定期检查协调者的取消信号"""
+        for count, item in enumerate(files, 1):
+            if count % Config.SCAN_SHARD_CHUNK_SIZE == 0 and self.manager.redis_client.exists(cancel_key):
+                job.cancel()
+            yield item
@@ -1,37 +1,64 @@
+import os
 import subprocess
 import json
 import time
+import queue
 import threading
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
 from models import db, TestCase, TestExecution, ExecutionTask, TestPlan
 from config import Config
 from distributed import DistributedManager
+from case_rules import CaseRuleSet
+from priority import select_top_cases
+from runner import StreamingRunner, WarmRunner
+from device_pool import device_pool
+from result_writer import result_writer
+from result_cache import ResultCache
+from plan_sharding import estimate_durations
+from plan_checkpoint import PlanProgress
+import plan_checkpoint
 from utils.logger import logger
 
 
+class PreparedCase:
+    """预先准备好的用例：执行命令、已预热的用例文件与预先创建的执行记录"""
+
+    def __init__(self, test_case, command=None, error=None, execution_id=None, plan_id=None):
+        self.test_case = test_case  # 已从会话中分离的 TestCase，由工作线程合并到自己的会话
+        self.command = command
+        self.error = error  # 准备阶段发现的错误（如用例文件不存在），执行时按失败处理
+        self.execution_id = execution_id  # 预先创建的 TestExecution 记录，执行完成后更新
+        self.plan_id = plan_id
+        self.run_started = None  # 首次启动用例进程的时刻（time.monotonic）
+        self.run_ended = None  # 最后一次用例进程结束的时刻
+
+
 class TestCaseExecutor:
     def __init__(self, max_workers=None, result_parser=None):
         """
         初始化测试用例执行器
 
         Args:
-            max_workers: 最大并发数（由于依赖唯一硬件资源，固定为1）
+            max_workers: 最大并发数（每个测试台同时只执行一条用例，固定为测试台数）
             result_parser: 自定义结果解析函数，签名为:
                          func(result: subprocess.CompletedProcess, test_case: TestCase) -> tuple[str, str]
                          返回 (status, details_json)
                          其中 status 为 'passed'/'failed'/'skipped'等
         """
-        # 强制串行执行，因为依赖唯一的硬件资源（测试机）
-        self.max_workers = 1
+        # 测试台资源池：每个测试台同时只执行一条用例，并发数等于测试台数
+        self.device_pool = device_pool
+        self.max_workers = max(1, len(self.device_pool))
         self.timeout = Config.TEST_TIMEOUT
         self.executing_cases = set()  # 正在执行的用例哈希集合
         self.lock = threading.Lock()
         self.distributed_manager = DistributedManager()
         self.result_parser = result_parser  # 自定义结果解析器
-
-        # 硬件资源锁：确保同一时间只有一个用例在执行
-        self.hardware_lock = threading.Lock()
-        self.current_hardware_owner = None
+        self.rules = CaseRuleSet.from_config()  # 按扩展名选择执行命令
+        # 流式读取输出，完整日志写入压缩文件；启用预热解释器时 Python 用例在预热解释器中 fork 执行
+        self.runner = WarmRunner() if Config.WARM_RUNNER_ENABLED else StreamingRunner()
+        self.result_cache = ResultCache(self.rules, self.device_pool)  # Config.RESULT_CACHE_ENABLED 时使用
 
     def calculate_priority_score(self, test_case):
         """计算用例执行优先级分数"""
@@ -90,194 +117,491 @@ class TestCaseExecutor:
             for path in exclude_list:
                 query = query.filter(~TestCase.relative_path.like(f"{path}%"))
 
-        # 获取所有符合条件的用例并计算优先级
-        all_cases = query.all()
-        prioritized_cases = []
+        # 按预计算的 priority_score 排序取前limit个用例（排除正在执行的用例）
+        return select_top_cases(query, limit)
 
-        for case in all_cases:
-            score = self.calculate_priority_score(case)
-            if score >= 0:  # 排除正在执行的用例
-                prioritized_cases.append((score, case))
+    def execute_single_case(self, test_case, plan_id=None, lease=None, prepared=None):
+        """执行单个测试用例（独占一个测试台）
 
-        # 按优先级排序
-        prioritized_cases.sort(key=lambda x: x[0], reverse=True)
-
-        # 返回前limit个用例
-        return [case for _, case in prioritized_cases[:limit]]
-
-    def execute_single_case(self, test_case, plan_id=None):
-        """执行单个测试用例（串行执行，独占硬件资源）"""
+        Args:
+            lease: 已租用的测试台（RigLease），为空时按用例所需能力租用一个，执行完成后释放
+            prepared: 预先准备好的用例（PreparedCase），为空时在执行时解析命令
+        """
         case_hash = test_case.case_hash
 
-        # 获取硬件资源锁（测试机）
-        acquired = self.hardware_lock.acquire(blocking=True, timeout=60)
-        if not acquired:
-            return 'skipped', 0, '无法获取硬件资源（测试机）'
+        # 获取测试台（硬件资源）
+        own_lease = lease is None
+        if own_lease:
+            lease = self.device_pool.acquire(self.rules.capabilities_for(test_case.relative_path),
+                                             holder=case_hash, timeout=60)
+            if lease is None:
+                return 'skipped', 0, '无法获取硬件资源（测试台）'
+            if lease.wait_seconds >= 1:
+                logger.info(f"用例 {case_hash} 排队等待测试台 {lease.rig.name} {lease.wait_seconds:.1f} 秒")
 
         try:
-            self.current_hardware_owner = case_hash
-
             # 检查用例是否正在执行
-            with self.lock:
-                if case_hash in self.executing_cases:
-                    return 'skipped', 0, 'Case is already executing'
-
-                # 标记为执行中
-                self.executing_cases.add(case_hash)
-
-                # 更新数据库状态
-                test_case.status = 'executing'
-                test_case.updated_at = datetime.now()
-                db.session.commit()
+            skipped = self._mark_executing(test_case, prepared)
+            if skipped:
+                return skipped
 
             start_time = datetime.now()
 
             try:
-                # 根据文件类型选择执行命令
-                if test_case.full_path.endswith('.py'):
-                    # 执行Python测试用例（直接执行文件）
-                    cmd = ['python', test_case.full_path]
-                elif test_case.full_path.endswith('.java'):
-                    # 执行Java测试用例
-                    cmd = ['java', '-jar', 'test-runner.jar', test_case.full_path]
-                else:
-                    # 其他语言可以根据需要扩展
-                    raise NotImplementedError(f"Unsupported file type: {test_case.full_path}")
+                cmd = self._resolve_command(test_case, prepared)
 
-                # 执行测试
-                result = subprocess.run(
+                # 执行测试（result.stdout/stderr 只包含尾部输出，完整输出见 result.log_file）
+                result = self.runner.run(
                     cmd,
-                    capture_output=True,
-                    text=True,
+                    cwd=Config.TEST_CASE_ROOT,
                     timeout=self.timeout,
-                    cwd=Config.TEST_CASE_ROOT
+                    log_name=case_hash[:16],
+                    env=lease.env
                 )
 
-                # 解析执行结果 - 支持自定义解析器
-                if self.result_parser:
-                    # 使用自定义结果解析器
-                    status, details = self.result_parser(result, test_case)
-                else:
-                    # 使用默认结果解析器
-                    status, details = self._parse_execution_result(result)
+                status, details = self._parse_result(result, test_case)
                 duration = (datetime.now() - start_time).total_seconds()
 
-            except subprocess.TimeoutExpired:
+            except subprocess.TimeoutExpired as e:
                 status = 'failed'
-                details = json.dumps({'error': 'Test execution timeout'})
+                details = json.dumps({'error': 'Test execution timeout', 'log_file': getattr(e, 'log_file', None)})
                 duration = self.timeout
             except Exception as e:
                 status = 'failed'
                 details = json.dumps({'error': str(e), 'type': type(e).__name__})
                 duration = (datetime.now() - start_time).total_seconds()
             finally:
-                # 移除执行中标记
-                with self.lock:
-                    self.executing_cases.discard(case_hash)
-                    self.current_hardware_owner = None
+                self._unmark_executing(case_hash, prepared)
 
-            # 保存执行结果
-            self._save_execution_result(test_case, status, duration, details, plan_id)
+            # 保存执行结果（预先创建的执行记录只用于第一次执行，重试时插入新记录）
+            self._save_execution_result(test_case, status, duration, details, plan_id,
+                                        execution_id=prepared.execution_id if prepared else None, lease=lease)
+            if prepared:
+                prepared.execution_id = None
 
             return status, duration, details
 
         finally:
-            # 释放硬件资源锁
-            self.hardware_lock.release()
+            # 释放测试台
+            if own_lease:
+                lease.release()
 
-    def execute_test_plan(self, plan_id):
-        """执行测试计划（串行执行，因为依赖唯一硬件资源）"""
-        plan = TestPlan.query.get(plan_id)
-        if not plan or plan.status == 'running':
-            return {'error': 'Plan not found or already running'}
+    def _mark_executing(self, test_case, prepared=None):
+        """标记用例为执行中；用例已在执行时返回跳过结果 (status, duration, details)，否则返回 None"""
+        case_hash = test_case.case_hash
+        with self.lock:
+            if case_hash in self.executing_cases:
+                if prepared and prepared.execution_id:
+                    result_writer.update_row(TestExecution, prepared.execution_id, for_plan=prepared.plan_id,
+                                             status='skipped',
+                                             details=json.dumps({'error': 'Case is already executing'}))
+                    prepared.execution_id = None
+                return 'skipped', 0, 'Case is already executing'
+
+            # 标记为执行中
+            self.executing_cases.add(case_hash)
+
+            # 更新数据库状态（由写线程异步落库）
+            result_writer.update(test_case, for_plan=prepared.plan_id if prepared else None, status='executing',
+                                 updated_at=datetime.now())
+        return None
+
+    def _unmark_executing(self, case_hash, prepared=None):
+        if prepared:
+            prepared.run_ended = time.monotonic()
+        # 移除执行中标记
+        with self.lock:
+            self.executing_cases.discard(case_hash)
+
+    def _resolve_command(self, test_case, prepared=None):
+        """根据文件类型选择执行命令（Config.CASE_RUNNERS），已预先准备的用例直接使用准备结果"""
+        if prepared:
+            if prepared.error:
+                raise prepared.error
+            cmd = prepared.command
+        else:
+            cmd = self.rules.runner_for(test_case.full_path)
+            if cmd is None:
+                raise NotImplementedError(f"Unsupported file type: {test_case.full_path}")
+
+        if prepared and prepared.run_started is None:
+            prepared.run_started = time.monotonic()
+        return cmd
+
+    def _parse_result(self, result, test_case):
+        # 解析执行结果 - 支持自定义解析器
+        if self.result_parser:
+            # 使用自定义结果解析器
+            return self.result_parser(result, test_case)
+        # 使用默认结果解析器
+        return self._parse_execution_result(result)
+
+    def run_cases(self, cases, plan_id=None, retry_count=0, on_result=None, deadline=None):
+        """在测试台资源池上执行一组用例（执行计划与调度器共用）
+
+        按传入顺序（即优先级顺序）为用例租用具备所需能力的空闲测试台，不同测试台上的用例并行执行，
+        每个用例在独立线程与应用上下文中执行并写库。排在前面的用例在其他用例占用测试台期间预先准备
+        （见 _prepare_case），测试台释放后可以立即启动下一个用例。
+        启动每批用例前检查计划是否被暂停或取消，是则不再启动新的用例，等待执行中的用例结束后返回。
+        启用 Config.ASYNC_ENGINE_ENABLED 时交给异步执行引擎（async_engine），本方法只等待其完成。
+
+        Args:
+            cases: 要执行的用例列表
+            plan_id: 所属计划ID
+            retry_count: 未通过时的重试次数（在同一测试台上重试）
+            on_result: 回调 func(result: dict)，在调用线程中按完成顺序调用，用于更新计划统计
+            deadline: 截止时刻（datetime），按历史平均时长预计无法在此之前完成的用例不再启动，记为跳过
+
+        Returns:
+            按完成顺序排列的结果列表；idle_gap 为同一测试台上前一个用例结束到该用例启动的间隔（秒）
+        """
+        if Config.ASYNC_ENGINE_ENABLED:
+            from async_engine import execution_engine
+            return execution_engine.run_cases(self, cases, plan_id, retry_count, on_result, deadline)
 
-        # 获取计划配置
-        include_paths = plan.include_paths
-        exclude_paths = plan.exclude_paths
+        app = current_app._get_current_object()
+        finished = queue.Queue()
+        results = []
+        running = 0
+        prepared = {}  # 用例ID -> 准备任务（Future）
+        last_run_ended = {}  # 测试台名称 -> 上一个用例进程结束的时刻
 
-        # 选择用例
-        cases = self.select_cases_for_execution(
-            limit=plan.total_cases if plan.total_cases else 1000,
-            include_paths=include_paths,
-            exclude_paths=exclude_paths
-        )
+        def report(result):
+            self._track_idle_gap(result, last_run_ended)
+            results.append(result)
+            if on_result:
+                on_result(result)
 
-        # 更新计划状态
-        plan.status = 'running'
-        plan.last_execution_time = datetime.now()
-        plan.total_cases = len(cases)
-        plan.executed_cases = 0
-        plan.passed_cases = 0
-        plan.failed_cases = 0
-        db.session.commit()
+        pending, skipped = self._plan_items(cases, plan_id)
+        for result in skipped:
+            report(result)
+        estimates = self._estimate_items(cases, deadline)
 
-        # 串行执行（因为依赖唯一硬件资源：测试机）
-        results = []
-        completed_count = 0
-        failed_cases = []
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='case-runner') as pool, \
+                ThreadPoolExecutor(max_workers=1, thread_name_prefix='case-prefetch') as prefetcher:
 
-        logger.info(f"开始执行测试计划 {plan_id}，共 {len(cases)} 个用例，将串行执行")
+            def take_prepared(case_id):
+                future = prepared.pop(case_id, None)
+                return future or prefetcher.submit(self._prepare_case, app, case_id, plan_id)
 
-        for index, case in enumerate(cases, 1):
             try:
-                logger.info(f"正在执行第 {index}/{len(cases)} 个用例: {case.name}")
-
-                # 执行单个用例
-                status, duration, details = self.execute_single_case(case, plan.id)
-
-                # 更新计划统计
-                completed_count += 1
-                if status == 'passed':
-                    plan.passed_cases += 1
-                    logger.info(f"用例 {case.name} 执行成功")
-                elif status == 'failed':
-                    plan.failed_cases += 1
-                    failed_cases.append(case.name)
-                    logger.warning(f"用例 {case.name} 执行失败")
+                while pending or running:
+                    # 计划被暂停或取消时不再启动新的用例（未执行的用例留在检查点中）
+                    signal = plan_checkpoint.plan_signal(app, plan_id) if pending and plan_id is not None else None
+                    if signal:
+                        logger.info(f"计划 {plan_id} 已{self._signal_name(signal)}，剩余 {len(pending)} 个用例不再启动")
+                        for case_id, _, _, _ in pending:
+                            if case_id in prepared:
+                                self._discard_prepared(prepared.pop(case_id), f'Plan {signal}', 'cancelled')
+                        pending = []
+                        continue
+
+                    # 预先准备即将执行的用例
+                    for case_id, _, _, _ in pending[:Config.PREFETCH_DEPTH]:
+                        if case_id not in prepared:
+                            prepared[case_id] = prefetcher.submit(self._prepare_case, app, case_id, plan_id)
+
+                    dispatched = False
+                    idle = self.device_pool.idle_count() if pending else 0
+                    blocked = set()  # 本轮已确认租不到测试台的能力要求
+                    for item in list(pending):
+                        if idle <= 0:
+                            break
+                        case_id, case_hash, name, requirements = item
+                        if requirements in blocked:
+                            continue
+                        late = self._past_deadline(item, estimates, deadline)
+                        if late:
+                            pending.remove(item)
+                            if case_id in prepared:
+                                self._discard_prepared(prepared.pop(case_id), late['error'])
+                            report(late)
+                            continue
+
+                        lease = self.device_pool.try_acquire(requirements, holder=case_hash)
+                        if lease is None:
+                            blocked.add(requirements)
+                            continue
+                        pending.remove(item)
+                        pool.submit(self._run_case_task, app, item, lease, take_prepared(case_id),
+                                    plan_id, retry_count, finished)
+                        running += 1
+                        idle -= 1
+                        dispatched = True
+
+                    if running:
+                        try:
+                            # 仍有用例排队时定期重试，其他进程释放的测试台不会闲置到本批用例执行完
+                            report(finished.get(timeout=Config.HARDWARE_LEASE_POLL_SECONDS if pending else None))
+                            running -= 1
+                        except queue.Empty:
+                            pass
+                    elif pending and not dispatched:
+                        # 测试台被其他进程占用，排队等待队首用例可用的测试台
+                        item = pending.pop(0)
+                        case_id, case_hash, name, requirements = item
+                        late = self._past_deadline(item, estimates, deadline)
+                        if late:
+                            if case_id in prepared:
+                                self._discard_prepared(prepared.pop(case_id), late['error'])
+                            report(late)
+                            continue
+                        lease = self.device_pool.acquire(requirements, holder=case_hash, timeout=60)
+                        if lease is None:
+                            self._discard_prepared(take_prepared(case_id), '无法获取硬件资源（测试台）')
+                            report({'case_hash': case_hash, 'name': name, 'status': 'skipped',
+                                    'error': '无法获取硬件资源（测试台）'})
+                        else:
+                            pool.submit(self._run_case_task, app, item, lease, take_prepared(case_id),
+                                        plan_id, retry_count, finished)
+                            running += 1
+            finally:
+                # 异常退出时，已预先准备但未执行的用例的执行记录标记为已取消
+                for future in prepared.values():
+                    self._discard_prepared(future, 'Execution aborted', 'cancelled')
+
+        return results
+
+    def _plan_items(self, cases, plan_id=None):
+        """整理待执行的用例：没有任何测试台具备所需能力的用例直接跳过，命中结果缓存的用例直接记为通过
+
+        Returns:
+            (pending, finished)：pending 为 (用例ID, 用例哈希, 名称, 所需能力) 列表，finished 为无需执行的用例结果列表
+        """
+        hits = self.result_cache.lookup(cases) if Config.RESULT_CACHE_ENABLED else {}
+        pending, finished = [], []
+        for case in cases:
+            requirements = self.rules.capabilities_for(case.relative_path)
+            if case.case_hash in hits:
+                finished.append(self._cached_result(case, hits[case.case_hash], plan_id))
+            elif self.device_pool.can_satisfy(requirements):
+                pending.append((case.id, case.case_hash, case.name, requirements))
+            else:
+                finished.append({'case_hash': case.case_hash, 'name': case.name, 'status': 'skipped',
+                                 'error': f"没有具备所需能力的测试台: {', '.join(sorted(requirements))}"})
+        return pending, finished
+
+    def _cached_result(self, test_case, entry, plan_id=None):
+        """命中结果缓存的用例：记录一条通过的执行记录，不占用测试台"""
+        result_writer.insert(
+            TestExecution,
+            case_hash=test_case.case_hash,
+            execution_time=datetime.now(),
+            status='passed',
+            duration=0,
+            details=json.dumps({'cached': True, 'execution_id': entry.execution_id,
+                                'passed_at': entry.passed_at.isoformat()}),
+            executed_by='cache',
+            machine_id=Config.MACHINE_ID,
+            plan_id=plan_id
+        )
+        return {'case_hash': test_case.case_hash, 'name': test_case.name, 'status': 'passed', 'cached': True}
+
+    @staticmethod
+    def _signal_name(signal):
+        return {'paused': '暂停', 'cancelled': '取消'}.get(signal, signal)
+
+    @staticmethod
+    def _estimate_items(cases, deadline):
+        """有截止时刻时按历史平均时长估算各用例的执行时长 {用例ID: 秒}"""
+        if deadline is None:
+            return {}
+        return dict(zip((case.id for case in cases), estimate_durations(cases)))
+
+    @staticmethod
+    def _past_deadline(item, estimates, deadline):
+        """预计无法在截止时刻前完成的用例返回跳过结果，否则返回 None"""
+        if deadline is None or datetime.now() + timedelta(seconds=estimates.get(item[0], 0)) <= deadline:
+            return None
+        return {'case_hash': item[1], 'name': item[2], 'status': 'skipped',
+                'error': f"预计无法在截止时刻 {deadline.strftime('%H:%M')} 前完成"}
+
+    @staticmethod
+    def _track_idle_gap(result, last_run_ended):
+        """根据同一测试台上一个用例的结束时刻计算 idle_gap（移除结果中的 run_started/run_ended）"""
+        rig_name = result.get('rig')
+        run_started, run_ended = result.pop('run_started', None), result.pop('run_ended', None)
+        if run_started is not None and rig_name in last_run_ended:
+            result['idle_gap'] = round(run_started - last_run_ended[rig_name], 4)
+        if run_ended is not None:
+            last_run_ended[rig_name] = run_ended
+
+    def _prepare_case(self, app, case_id, plan_id):
+        """准备用例（在预取线程中执行）：解析执行命令、检查用例文件、预热文件缓存、预先创建执行记录"""
+        with app.app_context():
+            test_case = TestCase.query.get(case_id)
+            command, error = None, None
+            if not os.path.isfile(test_case.full_path):
+                error = FileNotFoundError(f"Test case file not found: {test_case.full_path}")
+            else:
+                command = self.rules.runner_for(test_case.full_path)
+                if command is None:
+                    error = NotImplementedError(f"Unsupported file type: {test_case.full_path}")
                 else:
-                    logger.info(f"用例 {case.name} 执行状态: {status}")
+                    # 读取用例文件，使其进入操作系统文件缓存
+                    with open(test_case.full_path, 'rb') as f:
+                        f.read(Config.PREFETCH_WARM_BYTES)
+
+            execution = TestExecution(
+                case_hash=test_case.case_hash,
+                status='pending',
+                executed_by='scheduler',
+                machine_id=Config.MACHINE_ID,
+                plan_id=plan_id
+            )
+            db.session.add(execution)
+            db.session.flush()
+            execution_id = execution.id
+            # 从会话中分离用例，提交后不会过期，工作线程无需再次查询
+            db.session.expunge(test_case)
+            db.session.commit()
+
+            return PreparedCase(test_case, command, error, execution_id, plan_id)
+
+    def _discard_prepared(self, future, reason, status='skipped'):
+        """用例未能执行时，将预先创建的执行记录标记为跳过（或已取消）"""
+        try:
+            prepared = future.result()
+        except Exception:
+            return
+        result_writer.update_row(TestExecution, prepared.execution_id, for_plan=prepared.plan_id, status=status,
+                                 details=json.dumps({'error': reason}, ensure_ascii=False))
+
+    def _run_case_task(self, app, item, lease, prepared_future, plan_id, retry_count, finished):
+        """工作线程：在已租用的测试台上执行用例（含重试），结果放入 finished 队列"""
+        case_id, case_hash, name, _ = item
+        result = {'case_hash': case_hash, 'name': name, 'rig': lease.rig.name,
+                  'wait_seconds': round(lease.wait_seconds, 1)}
 
-                plan.executed_cases = completed_count
+        try:
+            with app.app_context():
+                try:
+                    prepared = prepared_future.result()
+                    test_case = db.session.merge(prepared.test_case, load=False)
+                except Exception as e:
+                    logger.warning(f"预先准备用例 {case_hash} 失败，执行时重新准备: {str(e)}")
+                    prepared = None
+                    test_case = TestCase.query.get(case_id)
+                logger.info(f"正在测试台 {lease.rig.name} 上执行用例: {name}")
+
+                for attempt in range(retry_count + 1):
+                    try:
+                        status, duration, details = self.execute_single_case(test_case, plan_id, lease=lease,
+                                                                             prepared=prepared)
+                        result.pop('error', None)
+                        result.update(status=status, duration=duration, attempts=attempt + 1)
+                        if status == 'passed':
+                            break
+                    except Exception as e:
+                        logger.error(f"执行用例 {case_hash} 时发生错误: {str(e)}")
+                        result.update(status='failed', error=str(e), attempts=attempt + 1)
+
+                if prepared:
+                    result.update(run_started=prepared.run_started, run_ended=prepared.run_ended)
+        except Exception as e:
+            logger.error(f"执行用例 {case_hash} 时发生错误: {str(e)}")
+            result.update(status='failed', error=str(e))
+        finally:
+            lease.release()
+            finished.put(result)
+
+    @staticmethod
+    def idle_gap_stats(results):
+        """统计测试台交接的空闲间隔（同一测试台上前一个用例结束到下一个用例启动）"""
+        gaps = [result['idle_gap'] for result in results if result.get('idle_gap') is not None]
+        if not gaps:
+            return {'count': 0, 'avg_ms': None, 'max_ms': None}
+        return {
+            'count': len(gaps),
+            'avg_ms': round(sum(gaps) / len(gaps) * 1000, 1),
+            'max_ms': round(max(gaps) * 1000, 1)
+        }
 
-                # 每执行完一个用例就提交数据库更新
-                db.session.commit()
+    def execute_test_plan(self, plan_id, cases=None, deadline=None):
+        """执行测试计划（各测试台并行执行）
 
-                results.append({
-                    'case_hash': case.case_hash,
-                    'name': case.name,
-                    'status': status,
-                    'duration': duration
-                })
+        执行进度保存在检查点中（见 plan_checkpoint），暂停后继续或执行进程崩溃后再次执行时只执行未完成的用例。
 
-            except Exception as e:
-                logger.error(f"执行用例 {case.case_hash} 时发生错误: {str(e)}")
-                completed_count += 1
-                plan.failed_cases += 1
-                plan.executed_cases = completed_count
-                failed_cases.append(case.name)
-                db.session.commit()
-
-                results.append({
-                    'case_hash': case.case_hash,
-                    'name': case.name,
-                    'status': 'failed',
-                    'error': str(e)
-                })
-
-        # 更新计划状态
-        plan.status = 'completed'
-        db.session.commit()
-
-        logger.info(f"测试计划 {plan_id} 执行完成！总计: {len(cases)}, 成功: {plan.passed_cases}, 失败: {plan.failed_cases}")
+        Args:
+            cases: 按执行顺序排列的用例（如定时窗口的装箱结果，见 window_planner），为空时按计划配置选择
+            deadline: 截止时刻，见 run_cases
+        """
+        plan = TestPlan.query.get(plan_id)
+        # 执行进程崩溃后计划仍为 running，此时从检查点继续执行
+        if not plan or (plan.status == 'running' and not plan_checkpoint.is_orphaned(plan.id)):
+            return {'error': 'Plan not found or already running'}
+
+        with plan_checkpoint.running(plan.id) as claimed:
+            if not claimed:
+                return {'error': 'Plan not found or already running'}
+
+            def select_cases():
+                if cases is not None:
+                    return cases
+                # 按计划配置选择用例
+                return self.select_cases_for_execution(
+                    limit=plan.total_cases if plan.total_cases else 1000,
+                    include_paths=plan.include_paths,
+                    exclude_paths=plan.exclude_paths
+                )
+
+            progress, remaining = PlanProgress.open(plan, select_cases)
+
+            # 更新计划状态（从检查点继续时统计继续累计）
+            plan.status = 'running'
+            plan.last_execution_time = datetime.now()
+            plan.total_cases = progress.total
+            for key, value in progress.counters().items():
+                setattr(plan, key, value)
+            db.session.commit()
+
+            failed_cases = []
+            write_mark = result_writer.mark(plan.id)
+
+            logger.info(f"开始执行测试计划 {plan_id}，共 {progress.total} 个用例（待执行 {len(remaining)} 个），"
+                        f"使用 {len(self.device_pool)} 个测试台并行执行")
+
+            def on_result(result):
+                # 记录检查点并更新计划统计（由写线程异步落库）
+                progress.record(result)
+                if result['status'] == 'passed':
+                    logger.info(f"用例 {result['name']} 执行成功")
+                elif result['status'] == 'failed':
+                    failed_cases.append(result['name'])
+                    logger.warning(f"用例 {result['name']} 执行失败")
+                else:
+                    logger.info(f"用例 {result['name']} 执行状态: {result['status']}")
+
+            results = self.run_cases(remaining, plan.id, on_result=on_result, deadline=deadline)
+
+            # 计划结束前确保执行结果全部落库；有结果写入失败时计划记为失败（保留检查点，下次执行时补跑）
+            written = result_writer.flush(since=write_mark, plan_id=plan.id)
+            # 执行期间计划可能已被暂停或取消（/api/test-plans/<id>/pause、/cancel），暂停的计划保留检查点
+            db.session.refresh(plan)
+            if not written:
+                logger.error(f"计划 {plan.id} 的执行结果写入失败: {result_writer.last_error}")
+                plan.status = 'failed'
+            elif plan.status == 'running':
+                plan.status = 'completed'
+            db.session.commit()
+            progress.close()
+
+        idle_gap = self.idle_gap_stats(results)
+        logger.info(f"测试计划 {plan_id} 执行结束（{plan.status}）！总计: {plan.total_cases}, "
+                    f"成功: {plan.passed_cases}, 失败: {plan.failed_cases}")
+        if idle_gap['count']:
+            logger.info(f"测试台交接空闲: 平均 {idle_gap['avg_ms']} ms, 最大 {idle_gap['max_ms']} ms")
         if failed_cases:
             logger.warning(f"失败的用例: {', '.join(failed_cases)}")
 
         return {
             'plan_id': plan.id,
-            'total_cases': len(cases),
-            'executed_cases': completed_count,
+            'status': plan.status,
+            'total_cases': plan.total_cases,
+            'executed_cases': plan.executed_cases,
             'passed_cases': plan.passed_cases,
             'failed_cases': plan.failed_cases,
+            'idle_gap': idle_gap,
             'results': results
         }
 
@@ -292,40 +616,60 @@ class TestCaseExecutor:
             'stdout': result.stdout[-5000:],  # 限制输出大小
             'stderr': result.stderr[-5000:],
             'return_code': result.returncode,
-            'command': ' '.join(result.args)
+            'command': ' '.join(result.args),
+            'log_file': getattr(result, 'log_file', None)  # 完整输出日志，可通过 /api/execution-history/<id>/log 获取
         }
 
         return status, json.dumps(details, ensure_ascii=False)
 
-    def _save_execution_result(self, test_case, status, duration, details, plan_id=None):
-        """保存执行结果到数据库"""
-        # 更新用例状态
-        test_case.status = status
-        test_case.last_execution_time = datetime.now()
+    def _save_execution_result(self, test_case, status, duration, details, plan_id=None, execution_id=None,
+                               lease=None):
+        """保存执行结果（放入后写队列，由写线程批量落库）
+
+        Args:
+            execution_id: 预先创建的执行记录ID，为空时插入新的执行记录
+            lease: 执行用例的测试台租约，启用结果缓存时用于记录通过结果
+        """
+        now = datetime.now()
 
         # 更新执行时长统计
-        test_case.total_executions += 1
+        total_executions = test_case.total_executions + 1
         if test_case.avg_duration == 0:
-            test_case.avg_duration = duration
+            avg_duration = duration
         else:
             # 加权平均
-            test_case.avg_duration = (test_case.avg_duration * (
-                        test_case.total_executions - 1) + duration) / test_case.total_executions
-
-        test_case.execution_duration = duration
-        test_case.result_details = details
-        test_case.updated_at = datetime.now()
+            avg_duration = (test_case.avg_duration * (total_executions - 1) + duration) / total_executions
 
-        # 记录执行历史
-        execution = TestExecution(
-            case_hash=test_case.case_hash,
+        # 更新用例状态
+        result_writer.update(
+            test_case,
+            for_plan=plan_id,
             status=status,
-            duration=duration,
-            details=details,
-            executed_by='scheduler',
-            machine_id=Config.MACHINE_ID,
-            plan_id=plan_id
+            last_execution_time=now,
+            total_executions=total_executions,
+            avg_duration=avg_duration,
+            execution_duration=duration,
+            result_details=details,
+            updated_at=now
         )
+        result_writer.update(test_case, for_plan=plan_id, priority_score=self.calculate_priority_score(test_case))
 
-        db.session.add(execution)
-        db.session.commit()
+        # 记录执行历史
+        if execution_id:
+            result_writer.update_row(TestExecution, execution_id, for_plan=plan_id, execution_time=now, status=status,
+                                     duration=duration, details=details)
+        else:
+            result_writer.insert(
+                TestExecution,
+                case_hash=test_case.case_hash,
+                execution_time=now,
+                status=status,
+                duration=duration,
+                details=details,
+                executed_by='scheduler',
+                machine_id=Config.MACHINE_ID,
+                plan_id=plan_id
+            )
+
+        if Config.RESULT_CACHE_ENABLED and status == 'passed' and lease is not None:
+            self.result_cache.record(test_case, lease.rig, execution_id)
@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from config import Config
+
+
+class HardwareLeaseStore:
+    """主机级测试台租约
+
+    租约与等待队列保存在本机的 SQLite 文件中，同一主机上的所有进程与线程（调度器、API 线程、批量执行）
+    通过它互斥使用测试台。持有者所在进程定期写心跳，心跳超时或进程已退出的租约与等待项会被回收。
+
+    等待队列按入队顺序排列：空闲测试台只在没有更早的、同样能使用它的等待者时才会被租出，
+    因此同一测试台按先来先得分配，而排在前面的等待者用不上的测试台不会因排队而闲置。
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, path=None):
+        self.path = path or Config.HARDWARE_LEASE_PATH
+        self.pid = os.getpid()
+        self.released = threading.Condition()
+        self.heartbeat_thread = None
+        self.lock = threading.Lock()
+
+    def try_acquire(self, rig_names, holder):
+        """立即租用一个候选测试台，没有可用的测试台时返回 None（不进入等待队列）
+
+        Returns:
+            (测试台名称, 租约令牌) 或 None
+        """
+        conn = self._connect()
+        try:
+            return self._claim(conn, rig_names, holder)
+        finally:
+            conn.close()
+
+    def acquire(self, rig_names, holder, timeout=None):
+        """进入等待队列，直到租到一个候选测试台或超时
+
+        Returns:
+            (测试台名称, 租约令牌, 等待秒数) 或 None
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        waiter_id = self.enqueue(rig_names, holder)
+        try:
+            while True:
+                claimed = self.claim(rig_names, holder, waiter_id)
+                if claimed:
+                    return claimed + (time.monotonic() - start,)
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                # 本进程内的释放会立即唤醒，其他进程的释放靠轮询发现
+                with self.released:
+                    self.released.wait(Config.HARDWARE_LEASE_POLL_SECONDS if remaining is None
+                                       else min(Config.HARDWARE_LEASE_POLL_SECONDS, remaining))
+        finally:
+            self.dequeue(waiter_id)
+
+    def enqueue(self, rig_names, holder):
+        """加入等待队列，返回等待项ID（之后用 claim 轮询、dequeue 退出队列）"""
+        conn = self._connect()
+        try:
+            waiter_id = conn.execute(
+                'INSERT INTO waiters (holder, rigs, pid, enqueued_at, heartbeat_at) VALUES (?, ?, ?, ?, ?)',
+                (holder, json.dumps(sorted(rig_names)), self.pid, time.time(), time.time())
+            ).lastrowid
+        finally:
+            conn.close()
+        self._ensure_heartbeat()
+        return waiter_id
+
+    def claim(self, rig_names, holder, waiter_id):
+        """以等待项的排队位置尝试租用测试台，租不到时返回 None
+
+        Returns:
+            (测试台名称, 租约令牌) 或 None
+        """
+        conn = self._connect()
+        try:
+            return self._claim(conn, rig_names, holder, waiter_id)
+        finally:
+            conn.close()
+
+    def dequeue(self, waiter_id):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM waiters WHERE id = ?', (waiter_id,))
+        finally:
+            conn.close()
+
+    def release(self, rig_name, token):
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute('DELETE FROM leases WHERE rig = ? AND token = ?', (rig_name, token))
+        finally:
+            conn.close()
+
+        with self.released:
+            self.released.notify_all()
+
+    def snapshot(self):
+        """当前租约与等待队列
+
+        只读：执行引擎每次轮询空闲测试台都会调用，不在这里开写事务（否则与各进程的 BEGIN IMMEDIATE 租用争锁）。
+        心跳超时或所属进程已退出的租约与等待项不计入，由 _claim 与心跳线程回收。
+
+        Returns:
+            (leases, queue)：leases 为 {测试台名称: 租约信息}，queue 按排队顺序排列并带 position 与已等待秒数
+        """
+        now = time.time()
+        cutoff = now - Config.HARDWARE_LEASE_STALE_SECONDS
+        alive = {}
+
+        def live(pid, heartbeat_at):
+            if heartbeat_at < cutoff:
+                return False
+            # 只在 POSIX 上探测进程是否存活（Windows 上 os.kill(pid, 0) 会发送 CTRL_C_EVENT）
+            if os.name != 'posix' or pid == self.pid:
+                return True
+            if pid not in alive:
+                alive[pid] = self._pid_alive(pid)
+            return alive[pid]
+
+        conn = self._connect()
+        try:
+            leases = {
+                row[0]: {'holder': row[1], 'pid': row[2], 'acquired_at': row[3], 'heartbeat_at': row[4]}
+                for row in conn.execute('SELECT rig, holder, pid, acquired_at, heartbeat_at FROM leases')
+                if live(row[2], row[4])
+            }
+            waiters = [row for row in conn.execute(
+                'SELECT holder, rigs, pid, enqueued_at, heartbeat_at FROM waiters ORDER BY id') if live(row[2], row[4])]
+            queue = [
+                {'position': position, 'holder': row[0], 'rigs': json.loads(row[1]), 'pid': row[2],
+                 'wait_seconds': round(now - row[3], 1)}
+                for position, row in enumerate(waiters, 1)
+            ]
+            return leases, queue
+        finally:
+            conn.close()
+
+    def _claim(self, conn, rig_names, holder, waiter_id=None):
+        """在一个写事务中尝试租用测试台"""
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._recover_stale(conn)
+            if waiter_id is not None:
+                conn.execute('UPDATE waiters SET heartbeat_at = ? WHERE id = ?', (now, waiter_id))
+
+            busy = {row[0] for row in conn.execute('SELECT rig FROM leases')}
+            earlier = [json.loads(row[0]) for row in conn.execute(
+                'SELECT rigs FROM waiters WHERE id < ? ORDER BY id',
+                (waiter_id if waiter_id is not None else 2 ** 62,)
+            )]
+            # 更早的等待者能使用的测试台留给它们
+            reserved = {name for rigs in earlier for name in rigs}
+
+            for rig_name in rig_names:
+                if rig_name in busy or rig_name in reserved:
+                    continue
+                token = uuid.uuid4().hex
+                conn.execute(
+                    'INSERT INTO leases (rig, holder, token, pid, acquired_at, heartbeat_at) VALUES (?, ?, ?, ?, ?, ?)',
+                    (rig_name, holder, token, self.pid, now, now)
+                )
+                conn.execute('COMMIT')
+                self._ensure_heartbeat()
+                return rig_name, token
+
+            conn.execute('COMMIT')
+            return None
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _recover_stale(self, conn):
+        """回收心跳超时或所属进程已退出的租约与等待项"""
+        cutoff = time.time() - Config.HARDWARE_LEASE_STALE_SECONDS
+        for table in ('leases', 'waiters'):
+            conn.execute(f'DELETE FROM {table} WHERE heartbeat_at < ?', (cutoff,))
+
+            # 只在 POSIX 上探测进程是否存活（Windows 上 os.kill(pid, 0) 会发送 CTRL_C_EVENT）
+            if os.name == 'posix':
+                pids = {row[0] for row in conn.execute(f'SELECT DISTINCT pid FROM {table}')}
+                for pid in pids - {self.pid}:
+                    if not self._pid_alive(pid):
+                        conn.execute(f'DELETE FROM {table} WHERE pid = ?', (pid,))
+
+    @staticmethod
+    def _pid_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
+
+    def _ensure_heartbeat(self):
+        """启动本进程的心跳线程（每个进程一个）"""
+        with self.lock:
+            if self.heartbeat_thread is None or self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.heartbeat_thread = threading.Thread(target=self._heartbeat_worker, daemon=True,
+                                                         name='hardware-lease-heartbeat')
+                self.heartbeat_thread.start()
+
+    def _heartbeat_worker(self):
+        while True:
+            time.sleep(Config.HARDWARE_LEASE_HEARTBEAT_SECONDS)
+            try:
+                conn = self._connect()
+                try:
+                    with conn:
+                        now = time.time()
+                        conn.execute('UPDATE leases SET heartbeat_at = ? WHERE pid = ?', (now, self.pid))
+                        conn.execute('UPDATE waiters SET heartbeat_at = ? WHERE pid = ?', (now, self.pid))
+                        self._recover_stale(conn)
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"Hardware lease heartbeat error: {e}")
+
+    def _connect(self):
+        """打开租约文件，必要时创建表结构"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # 手动管理事务（BEGIN IMMEDIATE 保证检查与写入之间不会被其他进程插入）
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            conn.execute('BEGIN IMMEDIATE')
+            if conn.execute('PRAGMA user_version').fetchone()[0] != self.SCHEMA_VERSION:
+                for table in ('leases', 'waiters'):
+                    conn.execute(f'DROP TABLE IF EXISTS {table}')
+                conn.execute(
+                    'CREATE TABLE leases (rig TEXT PRIMARY KEY, holder TEXT, token TEXT NOT NULL, pid INTEGER, '
+                    'acquired_at REAL, heartbeat_at REAL)'
+                )
+                conn.execute(
+                    'CREATE TABLE waiters (id INTEGER PRIMARY KEY AUTOINCREMENT, holder TEXT, rigs TEXT, '
+                    'pid INTEGER, enqueued_at REAL, heartbeat_at REAL)'
+                )
+                conn.execute(f'PRAGMA user_version={self.SCHEMA_VERSION}')
+            conn.execute('COMMIT')
+        return conn
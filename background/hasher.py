@@ -0,0 +1,93 @@
+import os
+import mmap
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from config import Config
+
+# 旧版本只用MD5计算文件前100KB，未记录算法的哈希按此处理
+LEGACY_ALGO_TAG = 'md5-head'
+HEAD_BYTES = 102400
+
+
+def new_digest(algorithm):
+    """创建摘要对象，算法不受支持时抛出 ValueError"""
+    # blake2b 摘要截为32字节，保证十六进制长度不超过 content_hash 列宽
+    return hashlib.blake2b(digest_size=32) if algorithm == 'blake2b' else hashlib.new(algorithm)
+
+
+def hash_file(path, algorithm='md5', mode='head'):
+    """计算文件内容哈希（模块级函数，便于在进程池中执行）
+
+    Args:
+        path: 文件路径
+        algorithm: 摘要算法，如 'md5'、'blake2b'、'sha256'
+        mode: 'head' 只计算前100KB；'full' 分块流式读取整个文件，大文件使用 mmap
+
+    Returns:
+        十六进制摘要，读取失败时返回空字符串
+    """
+    digest = new_digest(algorithm)
+    try:
+        with open(path, 'rb') as f:
+            if mode != 'full':
+                digest.update(f.read(HEAD_BYTES))
+                return digest.hexdigest()
+
+            size = os.fstat(f.fileno()).st_size
+            if size >= Config.CONTENT_HASH_MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest.update(mapped)
+            else:
+                for chunk in iter(lambda: f.read(Config.CONTENT_HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+
+        return digest.hexdigest()
+    except OSError:
+        return ''
+
+
+class ContentHasher:
+    """用例文件内容哈希计算器
+
+    批量计算时使用可配置的线程池或进程池并行读取与计算。
+    算法与模式组合成标签（如 'blake2b-full'）与 content_hash 一起保存。
+    """
+
+    def __init__(self, algorithm=None, mode=None, workers=None, pool_type=None):
+        self.algorithm = algorithm or Config.CONTENT_HASH_ALGORITHM
+        self.mode = mode or Config.CONTENT_HASH_MODE
+        self.workers = workers or Config.CONTENT_HASH_WORKERS
+        self.pool_type = pool_type or Config.CONTENT_HASH_POOL
+        # 算法配置错误时立即失败，否则每个文件的哈希都为空，每次扫描都把所有用例当作已变更
+        new_digest(self.algorithm)
+
+    @classmethod
+    def from_tag(cls, tag):
+        """根据算法标签创建哈希计算器"""
+        algorithm, _, mode = (tag or LEGACY_ALGO_TAG).partition('-')
+        return cls(algorithm=algorithm, mode=mode or 'head')
+
+    @property
+    def tag(self):
+        """算法标签"""
+        return f"{self.algorithm}-{self.mode}"
+
+    def read_size(self, file_size):
+        """计算哈希需要读取的字节数"""
+        return file_size if self.mode == 'full' else min(file_size, HEAD_BYTES)
+
+    def hash_file(self, path):
+        """计算单个文件的哈希"""
+        return hash_file(str(path), self.algorithm, self.mode)
+
+    def hash_many(self, paths):
+        """并行计算多个文件的哈希，结果顺序与输入一致"""
+        paths = [str(path) for path in paths]
+        if len(paths) < Config.CONTENT_HASH_PARALLEL_MIN or self.workers <= 1:
+            return [self.hash_file(path) for path in paths]
+
+        pool_class = ProcessPoolExecutor if self.pool_type == 'process' else ThreadPoolExecutor
+        with pool_class(max_workers=self.workers) as pool:
+            chunksize = max(1, len(paths) // (self.workers * 4))
+            return list(pool.map(hash_file, paths, [self.algorithm] * len(paths),
+                                 [self.mode] * len(paths), chunksize=chunksize))
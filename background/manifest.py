@@ -0,0 +1,214 @@
+import os
+import sqlite3
+import threading
+from config import Config
+
+
+# Windows 上遍历用的 DirEntry.stat() 返回 st_ino == 0，而文件监控路径用的 Path.stat() 返回真实的文件索引，
+# 两条路径写入的记录互不匹配，因此 Windows 上不记录 inode（记为 0）
+RECORD_INODE = os.name != 'nt'
+
+
+def _inode(stat):
+    """文件指纹中的 inode，不记录时为 0"""
+    return stat.st_ino if RECORD_INODE else 0
+
+
+class ScanManifest:
+    """本地扫描清单
+
+    记录 relative_path -> (size, mtime_ns, inode, content_hash, algo)，保存在本地 SQLite 文件中，
+    进程重启后可直接复用已计算的内容哈希，冷启动只需一次 stat 遍历而不必重新读取所有文件。
+    同时记录各目录的 mtime 与子项数，以及距上次完整遍历以来的增量扫描次数，用于目录剪枝。
+    SQLite 的事务（WAL 模式）保证写入中断时清单不会损坏；清单文件损坏时会重建。
+    """
+
+    SCHEMA_VERSION = 3
+
+    def __init__(self, root_dir, path=None):
+        self.root = os.path.normcase(os.path.abspath(str(root_dir)))
+        self.path = path or Config.SCAN_MANIFEST_PATH
+        self.entries = {}
+        self.dirty = {}
+        self.seen = set()
+        self.dir_states = {}
+        self.passes_since_full = 0
+        self.dirs_dirty = False
+        self.lock = threading.Lock()
+
+    def load(self):
+        """从清单文件加载当前根目录的全部记录"""
+        try:
+            conn = self._connect()
+            try:
+                rows = conn.execute(
+                    'SELECT relative_path, size, mtime_ns, inode, content_hash, algo FROM files WHERE root = ?',
+                    (self.root,)
+                )
+                self.entries = {row[0]: tuple(row[1:]) for row in rows}
+
+                rows = conn.execute(
+                    'SELECT relative_dir, mtime_ns, child_count FROM dirs WHERE root = ?', (self.root,)
+                )
+                self.dir_states = {row[0]: (row[1], row[2]) for row in rows}
+
+                row = conn.execute(
+                    "SELECT value FROM meta WHERE root = ? AND key = 'passes_since_full'", (self.root,)
+                ).fetchone()
+                self.passes_since_full = int(row[0]) if row else 0
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError as e:
+            # 清单只是缓存，损坏时丢弃重建
+            print(f"Scan manifest is corrupted, rebuilding: {e}")
+            self._remove_files()
+            self.entries = {}
+            self.dir_states = {}
+            self.passes_since_full = 0
+
+        self.dirty = {}
+        self.seen = set()
+        self.dirs_dirty = False
+        return self
+
+    def lookup(self, relative_path, stat, scan_time_ns, algo):
+        """stat 指纹与哈希算法一致时返回已记录的内容哈希，否则返回 None
+
+        mtime 落在扫描时刻的时钟偏差窗口内时，文件可能在同一时间粒度内再次被修改，不复用。
+        """
+        entry = self.entries.get(relative_path)
+        if entry is None:
+            return None
+
+        size, mtime_ns, inode, content_hash, entry_algo = entry
+        current_inode = _inode(stat)
+        # inode 为 0 表示未知（Windows 上 DirEntry.stat() 不提供），只有两边都已知时才比较
+        if size != stat.st_size or mtime_ns != stat.st_mtime_ns or entry_algo != algo or \
+                (inode and current_inode and inode != current_inode):
+            return None
+        if scan_time_ns - stat.st_mtime_ns < Config.SCAN_MTIME_SKEW_SECONDS * 1_000_000_000:
+            return None
+
+        return content_hash
+
+    def record(self, relative_path, stat, content_hash, algo):
+        """记录文件指纹与内容哈希"""
+        entry = (stat.st_size, stat.st_mtime_ns, _inode(stat), content_hash, algo)
+        with self.lock:
+            self.seen.add(relative_path)
+            if self.entries.get(relative_path) != entry:
+                self.entries[relative_path] = entry
+                self.dirty[relative_path] = entry
+
+    def mark_seen(self, relative_path):
+        """标记文件在本次遍历中仍然存在"""
+        with self.lock:
+            self.seen.add(relative_path)
+
+    def remove_tree(self, relative_path):
+        """移除文件或整个目录下的记录"""
+        prefix = relative_path + os.sep
+        with self.lock:
+            for path in [p for p in self.entries if p == relative_path or p.startswith(prefix)]:
+                self.seen.discard(path)
+                del self.entries[path]
+                self.dirty[path] = None
+
+    def update_dir_states(self, dir_states, full_pass):
+        """记录本次遍历观察到的目录状态
+
+        Args:
+            dir_states: {相对目录: (mtime_ns, 子项数)}
+            full_pass: 本次是否为不做剪枝的完整遍历
+        """
+        with self.lock:
+            self.dir_states = dict(dir_states)
+            self.passes_since_full = 0 if full_pass else self.passes_since_full + 1
+            self.dirs_dirty = True
+
+    def save(self, prune=True):
+        """在一个事务中写回变更的记录
+
+        Args:
+            prune: 是否删除本次遍历未见到的记录（仅完整遍历后使用）
+        """
+        with self.lock:
+            if prune:
+                for relative_path in set(self.entries) - self.seen:
+                    del self.entries[relative_path]
+                    self.dirty[relative_path] = None
+
+            upserts = [(self.root, path) + entry for path, entry in self.dirty.items() if entry is not None]
+            deletes = [(self.root, path) for path, entry in self.dirty.items() if entry is None]
+            self.dirty = {}
+
+            dir_rows = None
+            if self.dirs_dirty:
+                dir_rows = [(self.root, path) + state for path, state in self.dir_states.items()]
+                self.dirs_dirty = False
+
+        if not upserts and not deletes and dir_rows is None:
+            return
+
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        'INSERT OR REPLACE INTO files (root, relative_path, size, mtime_ns, inode, content_hash, algo) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)', upserts
+                    )
+                    conn.executemany('DELETE FROM files WHERE root = ? AND relative_path = ?', deletes)
+                    if dir_rows is not None:
+                        conn.execute('DELETE FROM dirs WHERE root = ?', (self.root,))
+                        conn.executemany(
+                            'INSERT INTO dirs (root, relative_dir, mtime_ns, child_count) VALUES (?, ?, ?, ?)',
+                            dir_rows
+                        )
+                        conn.execute(
+                            "INSERT OR REPLACE INTO meta (root, key, value) VALUES (?, 'passes_since_full', ?)",
+                            (self.root, str(self.passes_since_full))
+                        )
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError as e:
+            print(f"Error saving scan manifest: {e}")
+
+    def _connect(self):
+        """打开清单文件，必要时创建表结构"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA mmap_size={Config.SCAN_MANIFEST_MMAP_SIZE}')
+
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version != self.SCHEMA_VERSION:
+            # 清单只是缓存，结构变化时直接重建
+            with conn:
+                for table in ('files', 'dirs', 'meta'):
+                    conn.execute(f'DROP TABLE IF EXISTS {table}')
+                conn.execute(
+                    'CREATE TABLE files ('
+                    'root TEXT NOT NULL, relative_path TEXT NOT NULL, size INTEGER, mtime_ns INTEGER, '
+                    'inode INTEGER, content_hash TEXT, algo TEXT, PRIMARY KEY (root, relative_path)) WITHOUT ROWID'
+                )
+                conn.execute(
+                    'CREATE TABLE dirs ('
+                    'root TEXT NOT NULL, relative_dir TEXT NOT NULL, mtime_ns INTEGER, child_count INTEGER, '
+                    'PRIMARY KEY (root, relative_dir)) WITHOUT ROWID'
+                )
+                conn.execute(
+                    'CREATE TABLE meta ('
+                    'root TEXT NOT NULL, key TEXT NOT NULL, value TEXT, PRIMARY KEY (root, key)) WITHOUT ROWID'
+                )
+                conn.execute(f'PRAGMA user_version={self.SCHEMA_VERSION}')
+        return conn
+
+    def _remove_files(self):
+        """删除损坏的清单文件（含WAL日志）"""
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(self.path + suffix)
+            except FileNotFoundError:
+                pass
@@ -35,6 +35,7 @@ class TestCase(db.Model):
     file_size = db.Column(db.Integer)
     file_mtime = db.Column(db.DateTime)
     content_hash = db.Column(db.String(64))
+    content_hash_algo = db.Column(db.String(32))  # 内容哈希算法，如 md5-head、blake2b-full
 
     # 执行状态
     STATUS_CHOICES = ['not_executed', 'passed', 'failed', 'blocked', 'skipped', 'executing']
@@ -45,6 +46,7 @@ class TestCase(db.Model):
     execution_duration = db.Column(db.Float, default=0.0)  # 执行时长（秒）
     total_executions = db.Column(db.Integer, default=0)
     avg_duration = db.Column(db.Float, default=0.0)
+    priority_score = db.Column(db.Float, default=0.0)  # 预计算的执行优先级分数，见 priority.py
 
     # 结果详情
     result_details = db.Column(db.Text)
@@ -67,6 +69,7 @@ class TestCase(db.Model):
         db.Index('idx_relative_path', db.text('relative_path(128)')),
         db.Index('idx_status_execution', 'status', 'last_execution_time'),
         db.Index('idx_path_status', db.text('relative_path(128)'), 'status'),
+        db.Index('idx_active_priority', 'is_active', 'priority_score'),
     )
 
     @staticmethod
@@ -99,6 +102,20 @@ class TestExecution(db.Model):
     test_case = db.relationship('TestCase', backref='executions', foreign_keys=[case_hash])
 
 
+class ResultCacheEntry(db.Model):
+    __tablename__ = 'result_cache'
+
+    id = db.Column(db.Integer, primary_key=True)
+    # 缓存键：(用例哈希, 内容哈希, 执行命令, 测试台配置指纹) 的哈希，见 result_cache.py
+    cache_key = db.Column(db.String(64), nullable=False, index=True)
+    case_hash = db.Column(db.String(64), nullable=False, index=True)
+    content_hash = db.Column(db.String(64))
+    runner = db.Column(db.Text)  # 执行命令
+    env_fingerprint = db.Column(db.String(64))  # 测试台配置指纹
+    execution_id = db.Column(db.Integer)  # 产生该缓存的执行记录
+    passed_at = db.Column(db.DateTime, default=datetime.now, index=True)
+
+
 class TestPlan(db.Model):
     __tablename__ = 'test_plans'
 
@@ -126,11 +143,12 @@ class TestPlan(db.Model):
     # 新增：超时时间（分钟）
     timeout_minutes = db.Column(db.Integer, default=0)
 
-    # 执行状态
-    STATUS_CHOICES = ['pending', 'running', 'completed', 'failed', 'paused']
+    # 执行状态（cancelled 由 POST /api/test-plans/<id>/cancel 写入）
+    STATUS_CHOICES = ['pending', 'running', 'completed', 'failed', 'paused', 'cancelled']
     status = db.Column(db.Enum(*STATUS_CHOICES), default='pending', index=True)
     last_execution_time = db.Column(db.DateTime)
     next_execution_time = db.Column(db.DateTime)
+    predicted_finish = db.Column(db.DateTime)  # 定时窗口装箱预计的完成时刻，见 window_planner.py
     total_cases = db.Column(db.Integer, default=0)
     executed_cases = db.Column(db.Integer, default=0)
     passed_cases = db.Column(db.Integer, default=0)
@@ -161,12 +179,26 @@ class TestPlan(db.Model):
             'failed_cases': self.failed_cases,
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'created_by': self.created_by,
+            'predicted_finish': self.predicted_finish.isoformat() if self.predicted_finish else None,
             'include_paths': json.loads(self.include_paths) if self.include_paths else [],
             'exclude_paths': json.loads(self.exclude_paths) if self.exclude_paths else [],
             'assigned_machines': json.loads(self.assigned_machines) if self.assigned_machines else []
         }
 
 
+class PlanCheckpoint(db.Model):
+    __tablename__ = 'plan_checkpoints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    plan_id = db.Column(db.Integer, db.ForeignKey('test_plans.id'), unique=True, index=True)
+    case_hashes = db.Column(db.Text)  # JSON字符串，本次执行的用例哈希列表（按执行顺序）
+    completed = db.Column(db.Text)  # JSON字符串，已完成用例的结果 {用例哈希: 状态}
+    machine_id = db.Column(db.String(64))  # 执行该计划的机器与进程，见 plan_checkpoint.py
+    pid = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.now)
+    updated_at = db.Column(db.DateTime, default=datetime.now)
+
+
 class ExecutionTask(db.Model):
     __tablename__ = 'execution_tasks'
 
@@ -176,6 +208,8 @@ class ExecutionTask(db.Model):
     plan_id = db.Column(db.Integer, db.ForeignKey('test_plans.id'), index=True)
     machine_id = db.Column(db.String(64))  # 执行机器
     status = db.Column(db.String(32), default='pending')  # pending, running, completed, failed
+    predicted_duration = db.Column(db.Float)  # 预计执行时长（秒）
+    predicted_finish = db.Column(db.Float)  # 预计完成时刻（相对计划开始的秒数），见 plan_sharding.py
     created_at = db.Column(db.DateTime, default=datetime.now)
     started_at = db.Column(db.DateTime)
     completed_at = db.Column(db.DateTime)
@@ -0,0 +1,153 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from models import db, TestCase, TestPlan, TestExecution, PlanCheckpoint
+from config import Config
+from result_writer import result_writer
+from utils.logger import logger
+
+# 本进程中正在执行的计划ID
+_active_plans = set()
+_active_lock = threading.Lock()
+
+
+@contextmanager
+def running(plan_id):
+    """登记本进程正在执行计划，返回是否登记成功（计划已在本进程中执行时为 False）"""
+    with _active_lock:
+        claimed = plan_id not in _active_plans
+        _active_plans.add(plan_id)
+    try:
+        yield claimed
+    finally:
+        if claimed:
+            with _active_lock:
+                _active_plans.discard(plan_id)
+
+
+def is_active(plan_id):
+    """计划是否正在本进程中执行（暂停或取消后，等待执行中的用例结束期间仍为 True）"""
+    with _active_lock:
+        return plan_id in _active_plans
+
+
+def is_orphaned(plan_id):
+    """计划的检查点是否已无人执行（本机执行该计划的进程已崩溃或重启，或本进程中的执行已结束）
+
+    只能判断本机的进程；其他机器上的计划由该机器自行恢复。
+    """
+    checkpoint = PlanCheckpoint.query.filter_by(plan_id=plan_id).first()
+    if checkpoint is None or checkpoint.machine_id != Config.MACHINE_ID or is_active(plan_id):
+        return False
+    return checkpoint.pid == os.getpid() or not _pid_alive(checkpoint.pid)
+
+
+def plan_signal(app, plan_id):
+    """计划的控制信号：暂停时返回 'paused'，取消时返回 'cancelled'，否则返回 None
+
+    在独立的应用上下文中查询，可在执行线程与事件循环的工作线程中调用。
+    """
+    with app.app_context():
+        status = db.session.query(TestPlan.status).filter_by(id=plan_id).scalar()
+    return status if status in ('paused', 'cancelled') else None
+
+
+def discard(plan_id):
+    """删除计划的检查点（如取消已暂停的计划）"""
+    PlanCheckpoint.query.filter_by(plan_id=plan_id).delete()
+    db.session.commit()
+
+
+def _pid_alive(pid):
+    # 只在 POSIX 上探测进程是否存活（Windows 上 os.kill(pid, 0) 会发送 CTRL_C_EVENT）
+    if os.name != 'posix' or not pid:
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PlanProgress:
+    """计划一次执行的进度
+
+    开始执行时把用例列表写入检查点（PlanCheckpoint），每个用例完成后把结果写入检查点并更新计划统计
+    （经 result_writer 合并写入）。计划暂停后继续、或执行进程崩溃后再次执行同一计划时，只执行检查点中
+    尚未完成的用例，统计从检查点继续累计。计划完成或取消后删除检查点；执行失败时保留，下次执行时继续。
+    """
+
+    def __init__(self, plan, checkpoint):
+        self.plan = plan
+        self.checkpoint = checkpoint
+        self.case_hashes = json.loads(checkpoint.case_hashes) if checkpoint.case_hashes else []
+        self.completed = json.loads(checkpoint.completed) if checkpoint.completed else {}
+
+    @classmethod
+    def open(cls, plan, select_cases):
+        """接管计划的检查点，没有检查点时按 select_cases() 选择用例并创建检查点
+
+        Returns:
+            (progress, cases)：cases 为尚未完成的用例，按原执行顺序排列
+        """
+        checkpoint = PlanCheckpoint.query.filter_by(plan_id=plan.id).first()
+        if checkpoint is None:
+            cases = select_cases()
+            checkpoint = PlanCheckpoint(plan_id=plan.id, case_hashes=json.dumps([case.case_hash for case in cases]),
+                                        completed='{}')
+            db.session.add(checkpoint)
+            progress = cls(plan, checkpoint)
+        else:
+            progress = cls(plan, checkpoint)
+            remaining = [case_hash for case_hash in progress.case_hashes if case_hash not in progress.completed]
+            cases_by_hash = {case.case_hash: case for case in TestCase.query.filter(
+                TestCase.case_hash.in_(remaining), TestCase.is_active == True).all()}
+            cases = [cases_by_hash[case_hash] for case_hash in remaining if case_hash in cases_by_hash]
+            # 两次执行之间被停用（或删除）的用例记为跳过，计划统计仍能累计到 total_cases
+            for case_hash in remaining:
+                if case_hash not in cases_by_hash:
+                    progress.completed[case_hash] = 'skipped'
+            checkpoint.completed = json.dumps(progress.completed)
+            # 执行进程崩溃时预先创建、尚未完成的执行记录标记为已取消
+            TestExecution.query.filter_by(plan_id=plan.id, status='pending').update(
+                {'status': 'cancelled', 'details': json.dumps({'error': 'Plan interrupted'})},
+                synchronize_session=False)
+            logger.info(f"计划 {plan.id} 从检查点继续执行：已完成 {len(progress.completed)} 个用例，剩余 {len(cases)} 个")
+
+        checkpoint.machine_id = Config.MACHINE_ID
+        checkpoint.pid = os.getpid()
+        checkpoint.updated_at = datetime.now()
+        db.session.commit()
+        return progress, cases
+
+    @property
+    def total(self):
+        return len(self.case_hashes)
+
+    def counters(self):
+        """按检查点中的结果汇总的计划统计"""
+        statuses = list(self.completed.values())
+        return {
+            'executed_cases': len(statuses),
+            'passed_cases': statuses.count('passed'),
+            'failed_cases': statuses.count('failed')
+        }
+
+    def record(self, result):
+        """记录一个用例的结果（由写线程异步落库）"""
+        self.completed[result['case_hash']] = result['status']
+        result_writer.update(self.checkpoint, for_plan=self.plan.id, completed=json.dumps(self.completed),
+                             updated_at=datetime.now())
+        result_writer.update(self.plan, for_plan=self.plan.id, **self.counters())
+
+    def close(self):
+        """执行结束：计划已完成或已取消时删除检查点
+
+        调用前需等待写入完成（result_writer.flush）并刷新计划状态。
+        """
+        if self.plan.status in ('completed', 'cancelled'):
+            discard(self.plan.id)
@@ -0,0 +1,48 @@
+import heapq
+import statistics
+from config import Config
+
+
+def estimate_durations(cases):
+    """按历史平均时长估算每个用例的执行时长（秒）
+
+    没有历史记录的用例使用同批用例已知时长的中位数，都没有时使用 Config.SHARD_DEFAULT_CASE_DURATION。
+    """
+    known = [case.avg_duration for case in cases if case.avg_duration and case.avg_duration > 0]
+    default = statistics.median(known) if known else Config.SHARD_DEFAULT_CASE_DURATION
+    return [case.avg_duration if case.avg_duration and case.avg_duration > 0 else default for case in cases]
+
+
+def lpt_shards(cases, machines):
+    """按最长处理时间优先（LPT）将用例分配到各机器
+
+    每台机器视为 max_tasks 个并行执行槽，用例按预计时长从长到短依次放到最早空闲的执行槽上，
+    能力越大的机器分到的用例越多，长用例不会集中到同一台机器。
+
+    Args:
+        cases: 用例列表
+        machines: MachineStatus 列表
+
+    Returns:
+        每台机器一个分片 {'machine_id', 'capacity', 'cases': [(用例, 预计时长, 预计完成时刻)], 'total_duration', 'makespan'}，
+        预计完成时刻为相对计划开始的秒数，makespan 为该机器预计的完成时间
+    """
+    shards = [{'machine_id': machine.machine_id, 'capacity': max(1, machine.max_tasks or 1), 'cases': [],
+               'total_duration': 0.0, 'makespan': 0.0} for machine in machines]
+
+    # 执行槽：(空闲时刻, 机器序号, 槽序号)
+    slots = [(0.0, index, slot) for index, shard in enumerate(shards) for slot in range(shard['capacity'])]
+    heapq.heapify(slots)
+
+    durations = estimate_durations(cases)
+    order = sorted(range(len(cases)), key=lambda i: durations[i], reverse=True)
+    for i in order:
+        free_at, index, slot = heapq.heappop(slots)
+        finish = free_at + durations[i]
+        shard = shards[index]
+        shard['cases'].append((cases[i], durations[i], finish))
+        shard['total_duration'] += durations[i]
+        shard['makespan'] = max(shard['makespan'], finish)
+        heapq.heappush(slots, (finish, index, slot))
+
+    return shards
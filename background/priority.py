@@ -0,0 +1,104 @@
+from datetime import datetime
+import numpy as np
+from sqlalchemy import case, or_
+from models import db, TestCase
+from config import Config
+
+
+def high_priority_dir_flag():
+    """优先目录标记的 SQL 表达式（在数据库中判断，避免逐条遍历 HIGH_PRIORITY_DIRS）"""
+    if not Config.HIGH_PRIORITY_DIRS:
+        return db.literal(0)
+    return case(
+        (or_(*[TestCase.relative_path.startswith(d, autoescape=True) for d in Config.HIGH_PRIORITY_DIRS]), 1),
+        else_=0
+    )
+
+
+def score_arrays(status, last_execution_time, avg_duration, high_priority, now=None):
+    """向量化计算优先级分数，规则与 TestCaseExecutor.calculate_priority_score 一致
+
+    Args:
+        status: 用例状态数组
+        last_execution_time: 上次执行时间数组（datetime64，未执行过为 NaT）
+        avg_duration: 平均执行时长数组（秒，缺失为 NaN）
+        high_priority: 是否位于优先目录（0/1）
+        now: 计算时刻，默认当前时间
+
+    Returns:
+        分数数组，正在执行的用例为 -1
+    """
+    weights = Config.PRIORITY_WEIGHTS
+    now = np.datetime64(now or datetime.now(), 's')
+
+    # 1. 新增用例 3. 上次执行失败的用例
+    scores = np.where(status == 'not_executed', weights['new_case'], 0.0)
+    scores += np.where(status == 'failed', weights['failed_case'], 0.0)
+
+    # 4. 长时间未执行的用例（按整天计，最大30天）
+    days = np.floor((now - last_execution_time) / np.timedelta64(1, 'D'))
+    scores += np.nan_to_num(np.minimum(days / 30, 1.0)) * weights['long_interval']
+
+    # 5. 优先目录中的用例
+    scores += high_priority * weights['high_priority_dir']
+
+    # 6. 执行时间短的用例优先
+    duration = np.nan_to_num(avg_duration)
+    scores += np.where(duration > 0, 1.0 / (1.0 + duration / 60), 0.0) * weights['short_duration']
+
+    # 2. 正在执行的用例不重复执行
+    return np.where(status == 'executing', -1.0, scores)
+
+
+def refresh_priority_scores(case_hashes=None, now=None):
+    """重新计算并写回 priority_score，只写入分数发生变化的用例
+
+    Args:
+        case_hashes: 只刷新指定的用例，为 None 时刷新全部活跃用例（定期任务使用）
+        now: 计算时刻，默认当前时间
+
+    Returns:
+        写回的用例数
+    """
+    columns = (TestCase.id, TestCase.status, TestCase.last_execution_time, TestCase.avg_duration,
+               high_priority_dir_flag(), TestCase.priority_score)
+    batch_size = Config.SCAN_DB_BATCH_SIZE
+
+    if case_hashes is None:
+        rows = db.session.query(*columns).filter(TestCase.is_active == True).all()
+    else:
+        rows = []
+        for start in range(0, len(case_hashes), batch_size):
+            rows.extend(db.session.query(*columns).filter(
+                TestCase.case_hash.in_(case_hashes[start:start + batch_size])).all())
+    if not rows:
+        return 0
+
+    ids, status, last_execution_time, avg_duration, high_priority, current = zip(*rows)
+    scores = score_arrays(
+        np.array(status, dtype=object),
+        np.array(last_execution_time, dtype='datetime64[s]'),
+        np.array(avg_duration, dtype=float),
+        np.array(high_priority, dtype=float),
+        now
+    )
+    current = np.array(current, dtype=float)
+    changed = np.flatnonzero(np.isnan(current) | ~np.isclose(current, scores))
+
+    mappings = [{'id': ids[i], 'priority_score': float(scores[i])} for i in changed]
+    for start in range(0, len(mappings), batch_size):
+        db.session.bulk_update_mappings(TestCase, mappings[start:start + batch_size])
+        db.session.commit()
+
+    return len(mappings)
+
+
+def select_top_cases(query, limit):
+    """从过滤后的用例查询中选出优先级最高的 limit 个用例
+
+    直接按预计算的 priority_score 排序（索引 idx_active_priority），排除正在执行的用例。
+    """
+    return query.filter(
+        TestCase.status != 'executing',
+        TestCase.priority_score >= 0
+    ).order_by(TestCase.priority_score.desc(), TestCase.id.desc()).limit(limit).all()
@@ -0,0 +1,102 @@
+import json
+import hashlib
+from datetime import datetime, timedelta
+from models import db, ResultCacheEntry
+from config import Config
+from result_writer import result_writer
+
+
+def env_fingerprint(rig):
+    """测试台配置指纹（能力与环境变量，不含测试台名称：配置相同的测试台共用缓存）"""
+    data = json.dumps({'capabilities': sorted(rig.capabilities), 'env': rig.env}, sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def cache_key(case_hash, content_hash, runner, fingerprint):
+    return hashlib.sha256('\0'.join([case_hash, content_hash, runner, fingerprint]).encode()).hexdigest()
+
+
+class ResultCache:
+    """用例通过结果缓存
+
+    用例通过后按 (用例哈希, 内容哈希, 执行命令, 测试台配置指纹) 记录一条缓存。再次执行时，
+    若用例文件内容未变、最近一次结果仍为通过、且在 Config.RESULT_CACHE_TTL_HOURS 内在配置相同的测试台上通过过，
+    直接记为通过而不占用测试台。用例文件修改（内容哈希变化）或之后执行失败时缓存自然失效，也可用 invalidate 手动清除。
+    """
+
+    def __init__(self, rules, device_pool):
+        self.rules = rules
+        self.device_pool = device_pool
+
+    def lookup(self, cases):
+        """查找命中缓存的用例
+
+        Returns:
+            {用例哈希: ResultCacheEntry}
+        """
+        keys = {}
+        for case in cases:
+            runner = self._runner(case)
+            if case.status != 'passed' or not case.content_hash or runner is None:
+                continue
+            requirements = self.rules.capabilities_for(case.relative_path)
+            for rig in self.device_pool.rigs:
+                if rig.satisfies(requirements):
+                    keys[cache_key(case.case_hash, case.content_hash, runner, env_fingerprint(rig))] = case.case_hash
+
+        hits = {}
+        cutoff = datetime.now() - timedelta(hours=Config.RESULT_CACHE_TTL_HOURS)
+        key_list = list(keys)
+        for start in range(0, len(key_list), Config.SCAN_DB_BATCH_SIZE):
+            entries = ResultCacheEntry.query.filter(
+                ResultCacheEntry.cache_key.in_(key_list[start:start + Config.SCAN_DB_BATCH_SIZE]),
+                ResultCacheEntry.passed_at >= cutoff
+            ).all()
+            for entry in entries:
+                current = hits.get(entry.case_hash)
+                if current is None or entry.passed_at > current.passed_at:
+                    hits[entry.case_hash] = entry
+        return hits
+
+    def record(self, test_case, rig, execution_id=None):
+        """记录一次通过（由写线程异步落库）"""
+        runner = self._runner(test_case)
+        if not test_case.content_hash or runner is None:
+            return
+        fingerprint = env_fingerprint(rig)
+        result_writer.insert(
+            ResultCacheEntry,
+            cache_key=cache_key(test_case.case_hash, test_case.content_hash, runner, fingerprint),
+            case_hash=test_case.case_hash,
+            content_hash=test_case.content_hash,
+            runner=runner,
+            env_fingerprint=fingerprint,
+            execution_id=execution_id,
+            passed_at=datetime.now()
+        )
+
+    def _runner(self, test_case):
+        cmd = self.rules.runner_for(test_case.full_path)
+        return ' '.join(cmd) if cmd else None
+
+
+def invalidate(case_hashes=None):
+    """清除缓存，case_hashes 为空时清除全部
+
+    Returns:
+        删除的缓存条数
+    """
+    query = ResultCacheEntry.query
+    if case_hashes is not None:
+        query = query.filter(ResultCacheEntry.case_hash.in_(case_hashes))
+    deleted = query.delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def purge_expired():
+    """删除超过有效期的缓存"""
+    cutoff = datetime.now() - timedelta(hours=Config.RESULT_CACHE_TTL_HOURS)
+    deleted = ResultCacheEntry.query.filter(ResultCacheEntry.passed_at < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
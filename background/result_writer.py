@@ -0,0 +1,222 @@
+import time
+import queue
+import atexit
+import threading
+from flask import current_app
+from sqlalchemy.orm.attributes import set_committed_value
+from models import db
+from config import Config
+from utils.logger import logger
+
+
+class ResultWriter:
+    """执行结果的后写（write-behind）持久化
+
+    执行线程只把写操作放入有界队列，由专用写线程按条数或时间间隔合并为批量插入/更新后提交，
+    测试台之间不再等待数据库往返。队列写满时执行线程才会阻塞（数据库长时间跟不上时的背压）。
+
+    更新通过 set_committed_value 同步到内存中的 ORM 对象，对象不会变脏，
+    执行线程的会话不会在自动 flush 时再次写库。进程退出时会写入队列中剩余的数据。
+
+    整批写入失败时改为逐条写入，只有出错的记录留下重试（不再混入新的写操作），
+    重试 RESULT_WRITE_MAX_RETRIES 次仍失败的记录被丢弃并计入 dropped。写操作可用 for_plan 标明所属计划，
+    丢弃时按计划分别计数：调用方用 mark(plan_id) 记下开始时的计数，flush(since=..., plan_id=...)
+    在期间该计划有数据丢失时返回 False，其他计划的写入失败不影响本计划。
+    """
+
+    def __init__(self, batch_size=None, interval=None, max_queue_size=None):
+        self.batch_size = batch_size or Config.RESULT_WRITE_BATCH_SIZE
+        self.interval = interval or Config.RESULT_WRITE_INTERVAL
+        self.queue = queue.Queue(maxsize=max_queue_size or Config.RESULT_WRITE_QUEUE_SIZE)
+        self.thread = None
+        self.lock = threading.Lock()
+        self.dropped = 0  # 重试后仍写入失败而被丢弃的记录数
+        self.dropped_by_plan = {}  # 计划ID -> 被丢弃的该计划的记录数
+        self.last_error = None
+
+    def update(self, obj, for_plan=None, **values):
+        """更新 ORM 对象的字段：立即修改内存中的对象，数据库写入由写线程完成
+
+        Args:
+            for_plan: 写操作所属的计划ID，写入失败时计入该计划
+        """
+        for key, value in values.items():
+            set_committed_value(obj, key, value)
+        self.update_row(type(obj), obj.id, for_plan=for_plan, **values)
+
+    def update_row(self, model, row_id, for_plan=None, **values):
+        """按主键更新一条记录（内存中没有对应的 ORM 对象时使用）"""
+        self._put(('update', model, (dict(values, id=row_id), for_plan)))
+
+    def insert(self, model, for_plan=None, **values):
+        """插入一条记录（不需要回读主键的场景，如执行历史），for_plan 默认取记录的 plan_id"""
+        self._put(('insert', model, (values, values.get('plan_id') if for_plan is None else for_plan)))
+
+    def mark(self, plan_id=None):
+        """当前已丢弃的记录数（指定 plan_id 时只计该计划的记录），作为 flush(since=...) 的起点"""
+        with self.lock:
+            return self.dropped if plan_id is None else self.dropped_by_plan.get(plan_id, 0)
+
+    def flush(self, timeout=None, since=None, plan_id=None):
+        """等待此前提交的写操作全部落库
+
+        Args:
+            since: mark(plan_id) 的返回值，自该时刻起有写操作被丢弃时视为失败；为空时只检查本次等待期间
+            plan_id: 只检查该计划的写操作，为空时检查全部
+
+        Returns:
+            是否在超时前完成且没有写操作被丢弃
+        """
+        if since is None:
+            since = self.mark(plan_id)
+        if self.thread is not None:
+            done = threading.Event()
+            self.queue.put(('flush', done, None))
+            if not done.wait(timeout):
+                return False
+        return self.mark(plan_id) == since
+
+    def close(self):
+        """写入剩余数据并停止写线程（进程退出时调用）"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(('stop', None, None))
+            thread.join(timeout=Config.RESULT_WRITE_CLOSE_TIMEOUT)
+
+    def _put(self, item):
+        self.start()
+        self.queue.put(item)
+
+    def start(self):
+        """启动写线程（需在应用上下文中调用，首次写入时自动启动）"""
+        with self.lock:
+            if self.thread is None:
+                app = current_app._get_current_object()
+                self.thread = threading.Thread(target=self._worker, args=(app,), daemon=True,
+                                               name='result-writer')
+                self.thread.start()
+                atexit.register(self.close)
+
+    def _worker(self, app):
+        with app.app_context():
+            inserts, updates, waiters = {}, {}, []
+            stop = False
+
+            while True:
+                # 收集一批写操作：达到批量大小、间隔到期或收到 flush/stop 时写入
+                deadline = time.monotonic() + self.interval
+                count = 0
+                while not stop and count < self.batch_size:
+                    try:
+                        timeout = deadline - time.monotonic() if count or waiters or inserts or updates else None
+                        if timeout is not None and timeout <= 0:
+                            break
+                        kind, target, values = self.queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+
+                    if kind == 'insert':
+                        inserts.setdefault(target, []).append(values)
+                    elif kind == 'update':
+                        # 同一对象的多次更新合并为一次（记录涉及的所有计划）
+                        row, plan_id = values
+                        merged, plans = updates.setdefault(target, {}).setdefault(row['id'], ({}, set()))
+                        merged.update(row)
+                        if plan_id is not None:
+                            plans.add(plan_id)
+                    elif kind == 'flush':
+                        waiters.append(target)
+                        break
+                    else:
+                        stop = True
+                        break
+                    count += 1
+
+                try:
+                    self._write(inserts, updates)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f"批量写入执行结果失败，改为逐条写入: {str(e)}")
+                    self._write_isolated(inserts, updates)
+                inserts, updates = {}, {}
+
+                for done in waiters:
+                    done.set()
+                waiters = []
+                if stop:
+                    break
+
+            db.session.remove()
+
+    def _write_isolated(self, inserts, updates):
+        """逐条写入一批写操作，出错的记录单独重试，仍失败时丢弃并按计划计数"""
+        retries = 0
+        while True:
+            inserts, updates, error = self._write_each(inserts, updates)
+            if not inserts and not updates:
+                return
+            retries += 1
+            if retries > Config.RESULT_WRITE_MAX_RETRIES:
+                break
+            logger.warning(f"写入执行结果失败，稍后重试: {error}")
+            time.sleep(self.interval)
+
+        dropped = 0
+        plans = {}
+        for rows in inserts.values():
+            for _, plan_id in rows:
+                dropped += 1
+                plans[plan_id] = plans.get(plan_id, 0) + 1
+        for rows in updates.values():
+            for _, row_plans in rows.values():
+                dropped += 1
+                for plan_id in row_plans:
+                    plans[plan_id] = plans.get(plan_id, 0) + 1
+        plans.pop(None, None)
+        logger.error(f"写入执行结果失败，放弃 {dropped} 条记录（涉及计划 {sorted(plans) or '无'}）: {error}")
+        with self.lock:
+            self.dropped += dropped
+            for plan_id, count in plans.items():
+                self.dropped_by_plan[plan_id] = self.dropped_by_plan.get(plan_id, 0) + count
+            self.last_error = error
+
+    def _write_each(self, inserts, updates):
+        """每条记录一个事务写入
+
+        Returns:
+            (写入失败的 inserts, 写入失败的 updates, 最后一个错误)
+        """
+        failed_inserts, failed_updates, error = {}, {}, None
+        for model, rows in inserts.items():
+            for row in rows:
+                try:
+                    self._write({model: [row]}, {})
+                except Exception as e:
+                    db.session.rollback()
+                    failed_inserts.setdefault(model, []).append(row)
+                    error = str(e)
+        for model, rows in updates.items():
+            for row_id, row in rows.items():
+                try:
+                    self._write({}, {model: {row_id: row}})
+                except Exception as e:
+                    db.session.rollback()
+                    failed_updates.setdefault(model, {})[row_id] = row
+                    error = str(e)
+        return failed_inserts, failed_updates, error
+
+    @staticmethod
+    def _write(inserts, updates):
+        """inserts: {模型: [(字段, 计划ID)]}，updates: {模型: {主键: (字段, {计划ID})}}"""
+        if not inserts and not updates:
+            return
+        for model, rows in inserts.items():
+            db.session.bulk_insert_mappings(model, [values for values, _ in rows])
+        for model, rows in updates.items():
+            db.session.bulk_update_mappings(model, [values for values, _ in rows.values()])
+        db.session.commit()
+
+
+# 全局结果写入器（同一进程内的所有执行器共用）
+result_writer = ResultWriter()
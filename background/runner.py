@@ -0,0 +1,361 @@
+import os
+import gzip
+import json
+import uuid
+import asyncio
+import time
+import signal
+import select
+import socket
+import threading
+import subprocess
+from collections import deque
+from datetime import datetime
+from config import Config
+from utils.logger import logger
+
+
+class TailBuffer:
+    """只保留最后 max_bytes 字节输出的环形缓冲区"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.chunks = deque()
+        self.size = 0
+
+    def append(self, data):
+        self.chunks.append(data)
+        self.size += len(data)
+        # 丢弃超出容量的旧数据，最早的块可能只保留一部分
+        while self.size - len(self.chunks[0]) >= self.max_bytes:
+            self.size -= len(self.chunks.popleft())
+
+    def getvalue(self):
+        return b''.join(self.chunks)[-self.max_bytes:]
+
+
+class StreamingRunner:
+    """流式执行子进程
+
+    增量读取 stdout/stderr：每个流只保留有界的尾部缓冲用于入库，
+    完整输出（两个流按到达顺序合并）写入按执行划分的 gzip 日志文件。
+    每个用例占用的内存与输出量无关。
+    """
+
+    def __init__(self, tail_bytes=None, log_dir=None, chunk_size=65536):
+        self.tail_bytes = tail_bytes or Config.EXECUTION_TAIL_BYTES
+        self.log_dir = log_dir or Config.EXECUTION_LOG_DIR
+        self.chunk_size = chunk_size
+
+    def run(self, cmd, cwd=None, timeout=None, log_name=None, env=None):
+        """执行命令，返回与 subprocess.run(capture_output=True, text=True) 兼容的 CompletedProcess
+
+        stdout/stderr 只包含尾部输出；完整日志路径（相对 EXECUTION_LOG_DIR）保存在返回对象的 log_file 属性中。
+        超时时终止进程并抛出 subprocess.TimeoutExpired。env 为附加的环境变量（在当前环境基础上覆盖）。
+        """
+        log_file = self._log_file(log_name) if Config.EXECUTION_LOG_ENABLED else None
+        # 压缩级别取1：输出量大时压缩速度优先，文本日志的压缩率依然可观
+        log = gzip.open(os.path.join(self.log_dir, log_file), 'wb', compresslevel=1) if log_file else None
+        log_lock = threading.Lock()
+        stdout_tail = TailBuffer(self.tail_bytes)
+        stderr_tail = TailBuffer(self.tail_bytes)
+
+        def pump(stream, tail):
+            for chunk in iter(lambda: stream.read1(self.chunk_size), b''):
+                tail.append(chunk)
+                if log:
+                    with log_lock:
+                        if not log.closed:
+                            log.write(chunk)
+            stream.close()
+
+        try:
+            process = self._spawn(cmd, cwd, env)
+            readers = [threading.Thread(target=pump, args=(process.stdout, stdout_tail), daemon=True),
+                       threading.Thread(target=pump, args=(process.stderr, stderr_tail), daemon=True)]
+            for reader in readers:
+                reader.start()
+
+            try:
+                returncode = process.wait(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                # 子进程派生的进程可能仍持有管道，不无限等待读取线程
+                for reader in readers:
+                    reader.join(timeout=5)
+                error = subprocess.TimeoutExpired(cmd, timeout, output=self._decode(stdout_tail),
+                                                  stderr=self._decode(stderr_tail))
+                error.log_file = log_file
+                raise error
+
+            for reader in readers:
+                reader.join()
+        finally:
+            if log:
+                with log_lock:
+                    log.close()
+
+        result = subprocess.CompletedProcess(cmd, returncode, self._decode(stdout_tail), self._decode(stderr_tail))
+        result.log_file = log_file
+        return result
+
+    async def run_async(self, cmd, cwd=None, timeout=None, log_name=None, env=None, on_output=None):
+        """run 的协程版本（asyncio.create_subprocess_exec），返回值、超时与日志处理与 run 一致
+
+        Args:
+            on_output: 输出回调 func(stream_name: str, chunk: bytes)，stream_name 为 'stdout' 或 'stderr'
+
+        协程被取消时终止子进程后重新抛出 CancelledError。总是启动新的子进程（不使用预热解释器）。
+        """
+        log_file = self._log_file(log_name) if Config.EXECUTION_LOG_ENABLED else None
+        log = gzip.open(os.path.join(self.log_dir, log_file), 'wb', compresslevel=1) if log_file else None
+        stdout_tail = TailBuffer(self.tail_bytes)
+        stderr_tail = TailBuffer(self.tail_bytes)
+
+        async def pump(stream, tail, stream_name):
+            while True:
+                chunk = await stream.read(self.chunk_size)
+                if not chunk:
+                    break
+                tail.append(chunk)
+                if log:
+                    log.write(chunk)
+                if on_output:
+                    on_output(stream_name, chunk)
+
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd, cwd=cwd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE, env=dict(os.environ, **env) if env else None
+            )
+            readers = asyncio.gather(pump(process.stdout, stdout_tail, 'stdout'),
+                                     pump(process.stderr, stderr_tail, 'stderr'))
+            try:
+                returncode = await asyncio.wait_for(process.wait(), timeout)
+                await readers
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                if process.returncode is None:
+                    process.kill()
+                await asyncio.shield(process.wait())
+                # 子进程派生的进程可能仍持有管道，不无限等待读取
+                try:
+                    await asyncio.wait_for(asyncio.shield(readers), 5)
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    readers.cancel()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                error = subprocess.TimeoutExpired(cmd, timeout, output=self._decode(stdout_tail),
+                                                  stderr=self._decode(stderr_tail))
+                error.log_file = log_file
+                raise error
+        finally:
+            if log:
+                log.close()
+
+        result = subprocess.CompletedProcess(cmd, returncode, self._decode(stdout_tail), self._decode(stderr_tail))
+        result.log_file = log_file
+        return result
+
+    def _spawn(self, cmd, cwd, env):
+        """启动子进程，返回的对象需提供 stdout/stderr（二进制流）与 wait/kill"""
+        return subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                env=dict(os.environ, **env) if env else None)
+
+    def _log_file(self, log_name=None):
+        """生成按日期分目录的日志文件相对路径"""
+        now = datetime.now()
+        day_dir = now.strftime('%Y%m%d')
+        os.makedirs(os.path.join(self.log_dir, day_dir), exist_ok=True)
+        name = f"{log_name or 'case'}_{now.strftime('%H%M%S')}_{uuid.uuid4().hex[:8]}.log.gz"
+        return os.path.join(day_dir, name)
+
+    @staticmethod
+    def _decode(tail):
+        # 尾部可能从多字节字符中间截断
+        return tail.getvalue().decode('utf-8', errors='replace')
+
+
+class WarmProcess:
+    """预热解释器 fork 出的用例进程（提供与 subprocess.Popen 兼容的 stdout/stderr、wait 与 kill）"""
+
+    def __init__(self, interpreter, pid, stdout, stderr, on_exit):
+        self.interpreter = interpreter
+        self.pid = pid
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.on_exit = on_exit
+
+    def wait(self, timeout=None):
+        if self.returncode is None:
+            try:
+                message = self.interpreter.read_message(timeout)
+            except socket.timeout:
+                raise subprocess.TimeoutExpired(self.pid, timeout)
+            except Exception:
+                # 预热解释器异常退出，无法得知用例的退出码
+                self.returncode = -signal.SIGKILL
+                self.interpreter.close()
+            else:
+                self.returncode = message['returncode']
+            self.on_exit(self.interpreter)
+        return self.returncode
+
+    def kill(self):
+        if self.returncode is None:
+            try:
+                os.kill(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+
+class WarmInterpreter:
+    """一个预热解释器进程（见 warm_zygote.py），同一时间只执行一个用例"""
+
+    ZYGOTE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'warm_zygote.py')
+
+    def __init__(self, executable, preload=()):
+        parent_sock, child_sock = socket.socketpair()
+        try:
+            self.process = subprocess.Popen(
+                [executable, self.ZYGOTE, str(child_sock.fileno()), *preload],
+                stdin=subprocess.DEVNULL, pass_fds=[child_sock.fileno()]
+            )
+        finally:
+            child_sock.close()
+        self.sock = parent_sock
+        self.buffer = b''
+        self.cases = 0
+        self.closed = False
+        self.modules = self.read_message(Config.WARM_RUNNER_START_TIMEOUT)['modules']
+
+    def spawn(self, path, cwd, env, on_exit):
+        """在预热解释器中执行用例文件，返回 WarmProcess"""
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        try:
+            data = json.dumps({'path': path, 'cwd': cwd, 'env': env}).encode() + b'\n'
+            sent = socket.send_fds(self.sock, [data], [stdout_w, stderr_w])
+            self.sock.sendall(data[sent:])
+        except Exception:
+            os.close(stdout_r)
+            os.close(stderr_r)
+            raise
+        finally:
+            os.close(stdout_w)
+            os.close(stderr_w)
+
+        self.cases += 1
+        pid = self.read_message(Config.WARM_RUNNER_START_TIMEOUT)['pid']
+        return WarmProcess(self, pid, os.fdopen(stdout_r, 'rb'), os.fdopen(stderr_r, 'rb'), on_exit)
+
+    def read_message(self, timeout=None):
+        """读取一条消息（一行 JSON），超时抛出 socket.timeout"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while b'\n' not in self.buffer:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise socket.timeout()
+            if not select.select([self.sock], [], [], remaining)[0]:
+                continue
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise RuntimeError('Warm interpreter exited unexpectedly')
+            self.buffer += chunk
+        line, self.buffer = self.buffer.split(b'\n', 1)
+        return json.loads(line)
+
+    def is_stale(self):
+        """是否需要回收：执行用例数达到上限、进程已退出，或预导入的模块文件已被修改"""
+        if self.closed or self.cases >= Config.WARM_RUNNER_MAX_CASES or self.process.poll() is not None:
+            return True
+        for path, mtime in self.modules.items():
+            try:
+                if os.path.getmtime(path) != mtime:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # 关闭连接后预热解释器自行退出
+        self.sock.close()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+class WarmRunner(StreamingRunner):
+    """使用预热解释器执行 Python 用例的 StreamingRunner
+
+    形如 [python, 用例.py] 的命令在预热解释器中 fork 执行，省去解释器启动与常用模块（Config.WARM_RUNNER_PRELOAD）
+    的导入时间；其他命令以及不支持 fork 的平台仍按原方式启动子进程。退出码、超时与输出的处理与 StreamingRunner 一致。
+    预热解释器执行 WARM_RUNNER_MAX_CASES 个用例后，或预导入的模块文件被修改后回收重建。
+    """
+
+    def __init__(self, tail_bytes=None, log_dir=None, chunk_size=65536, preload=None):
+        super().__init__(tail_bytes, log_dir, chunk_size)
+        self.preload = list(Config.WARM_RUNNER_PRELOAD if preload is None else preload)
+        self.idle = {}  # 解释器路径 -> 空闲的 WarmInterpreter 列表
+        self.lock = threading.Lock()
+
+    def _spawn(self, cmd, cwd, env):
+        if not self._warmable(cmd):
+            return super()._spawn(cmd, cwd, env)
+
+        interpreter = None
+        try:
+            interpreter = self._checkout(cmd[0])
+            return interpreter.spawn(os.path.abspath(cmd[1]), os.path.abspath(cwd or os.getcwd()),
+                                     dict(os.environ, **env) if env else dict(os.environ), self._checkin)
+        except Exception as e:
+            # 预热解释器不可用时退回普通子进程
+            logger.warning(f"Warm interpreter unavailable, falling back to subprocess: {e}")
+            if interpreter is not None:
+                interpreter.close()
+            return super()._spawn(cmd, cwd, env)
+
+    @staticmethod
+    def _warmable(cmd):
+        return (hasattr(os, 'fork') and hasattr(socket, 'send_fds') and len(cmd) == 2
+                and os.path.basename(cmd[0]).lower().startswith('python') and cmd[1].lower().endswith('.py'))
+
+    def _checkout(self, executable):
+        with self.lock:
+            idle = self.idle.setdefault(executable, [])
+            while idle:
+                interpreter = idle.pop()
+                if not interpreter.is_stale():
+                    return interpreter
+                interpreter.close()
+        return WarmInterpreter(executable, self.preload)
+
+    def _checkin(self, interpreter):
+        if interpreter.is_stale():
+            interpreter.close()
+            return
+        with self.lock:
+            self.idle.setdefault(interpreter.process.args[0], []).append(interpreter)
+
+    def close(self):
+        """关闭所有空闲的预热解释器"""
+        with self.lock:
+            interpreters = [interpreter for idle in self.idle.values() for interpreter in idle]
+            self.idle.clear()
+        for interpreter in interpreters:
+            interpreter.close()
+
+
+def open_execution_log(log_file):
+    """打开执行日志（解压后的二进制流），文件不存在或路径越界时返回 None"""
+    log_dir = os.path.abspath(Config.EXECUTION_LOG_DIR)
+    path = os.path.abspath(os.path.join(log_dir, log_file))
+    if not path.startswith(log_dir + os.sep) or not os.path.isfile(path):
+        return None
+    return gzip.open(path, 'rb')
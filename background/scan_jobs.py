@@ -0,0 +1,195 @@
+import os
+import uuid
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from config import Config
+from utils.logger import logger
+
+
+class ScanCancelled(Exception):
+    """扫描任务被取消"""
+
+
+class ScanJob:
+    """扫描任务：记录阶段（walk、hash、db-sync）、进度计数与耗时，并提供取消信号"""
+
+    def __init__(self, root_dir, scan_type):
+        self.id = uuid.uuid4().hex
+        self.root_dir = str(root_dir)
+        self.root_key = os.path.normcase(os.path.abspath(self.root_dir))
+        self.scan_type = scan_type
+        self.status = 'pending'  # pending, running, completed, failed, cancelled
+        self.phase = 'pending'
+        self.files_seen = 0
+        self.files_hashed = 0
+        self.bytes_read = 0
+        self.rows_written = 0
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+        self.cancel_event = threading.Event()
+        self.done_event = threading.Event()
+
+    @property
+    def is_active(self):
+        return self.status in ('pending', 'running')
+
+    def start(self):
+        self.status = 'running'
+        self.started_at = datetime.now()
+
+    def set_phase(self, phase):
+        self.phase = phase
+
+    def add(self, files_seen=0, files_hashed=0, bytes_read=0, rows_written=0):
+        """累加进度计数（线程安全）"""
+        with self.lock:
+            self.files_seen += files_seen
+            self.files_hashed += files_hashed
+            self.bytes_read += bytes_read
+            self.rows_written += rows_written
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        """收到取消信号时抛出 ScanCancelled"""
+        if self.cancel_event.is_set():
+            raise ScanCancelled(f"Scan job {self.id} cancelled")
+
+    def finish(self, status, result=None, error=None):
+        self.status = status
+        self.phase = 'done'
+        self.result = result
+        self.error = error
+        self.finished_at = datetime.now()
+        self.done_event.set()
+
+    def wait(self, timeout=None):
+        return self.done_event.wait(timeout)
+
+    def to_dict(self):
+        """转换为字典"""
+        end = self.finished_at or datetime.now()
+        elapsed = (end - self.started_at).total_seconds() if self.started_at else 0
+
+        return {
+            'job_id': self.id,
+            'root_dir': self.root_dir,
+            'scan_type': self.scan_type,
+            'status': self.status,
+            'phase': self.phase,
+            'files_seen': self.files_seen,
+            'files_hashed': self.files_hashed,
+            'bytes_read': self.bytes_read,
+            'rows_written': self.rows_written,
+            'elapsed_seconds': round(elapsed, 3),
+            'files_per_second': round(self.files_seen / elapsed, 1) if elapsed > 0 else None,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class ScanJobManager:
+    """扫描任务管理器
+
+    每个扫描在独立线程中执行；同一根目录已有进行中的同类型任务时直接返回该任务，
+    避免重复请求堆积在 TestCaseScanner.lock 后面。类型不同的任务（如增量扫描进行中时请求全量扫描）
+    排在该根目录上已有的任务之后执行，不会被合并掉。
+    """
+
+    def __init__(self, max_history=None):
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+        self.max_history = max_history or Config.SCAN_JOB_HISTORY
+
+    def submit(self, app, scan_type='incremental', root_dir=None):
+        """提交扫描任务
+
+        Returns:
+            (job, created)：created 为 False 表示复用了同一根目录上进行中的同类型任务
+        """
+        job = ScanJob(root_dir or Config.TEST_CASE_ROOT, scan_type)
+
+        with self.lock:
+            ahead = []  # 同一根目录上进行中的其他类型任务，本任务在它们结束后执行
+            for existing in self.jobs.values():
+                if existing.root_key == job.root_key and existing.is_active:
+                    if existing.scan_type == job.scan_type:
+                        return existing, False
+                    ahead.append(existing)
+
+            self.jobs[job.id] = job
+            self._trim_history()
+
+        thread = threading.Thread(target=self._run, args=(app, job, ahead), daemon=True,
+                                  name=f'scan-{job.id[:8]}')
+        thread.start()
+        return job, True
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return list(reversed(self.jobs.values()))
+
+    def cancel(self, job_id):
+        """请求取消任务，任务在下一个检查点停止"""
+        job = self.jobs.get(job_id)
+        if job and job.is_active:
+            job.cancel()
+        return job
+
+    def _trim_history(self):
+        """只保留最近的已结束任务"""
+        finished = [job_id for job_id, job in self.jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_history)]:
+            del self.jobs[job_id]
+
+    def _run(self, app, job, ahead=()):
+        from extra.extensions import db
+        from scanner import TestCaseScanner
+
+        # 等待排在前面的任务结束（等待期间可以取消）
+        job.set_phase('queued' if ahead else 'pending')
+        for previous in ahead:
+            while not previous.wait(timeout=1):
+                if job.cancel_event.is_set():
+                    job.finish('cancelled')
+                    logger.warning(f"Scan job {job.id} cancelled while queued")
+                    return
+
+        with app.app_context():
+            scanner = TestCaseScanner(job.root_dir, job=job)
+            job.start()
+            try:
+                if job.scan_type == 'full':
+                    result = {'updated_count': scanner.scan_all_cases(update_status=True)}
+                elif job.scan_type == 'distributed':
+                    from distributed import DistributedManager
+                    from distributed_scan import DistributedScanCoordinator
+                    result = DistributedScanCoordinator(scanner, DistributedManager(app)).run()
+                else:
+                    result = scanner.scan_new_and_changed_cases()
+                job.finish('completed', result=result)
+                logger.info(f"Scan job {job.id} completed: {result}")
+            except ScanCancelled:
+                db.session.rollback()
+                job.finish('cancelled')
+                logger.warning(f"Scan job {job.id} cancelled")
+            except Exception as e:
+                db.session.rollback()
+                job.finish('failed', error=str(e))
+                logger.error(f"Scan job {job.id} failed: {str(e)}")
+
+
+# 全局扫描任务管理器
+scan_job_manager = ScanJobManager()
@@ -1,199 +1,580 @@
 import os
-import hashlib
 import json
 from pathlib import Path
 from datetime import datetime, timedelta
+import time
 import threading
+from collections import namedtuple
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from models import db, TestCase
 from config import Config
+from walker import CaseTreeWalker
+from manifest import ScanManifest
+from hasher import ContentHasher, LEGACY_ALGO_TAG
+from scan_jobs import ScanJob
+from case_rules import CaseRuleSet
+from priority import refresh_priority_scores
+
+# 增量扫描使用的用例快照，只包含变更检测所需的列
+CaseSnapshot = namedtuple('CaseSnapshot', ['id', 'case_hash', 'file_mtime', 'file_size',
+                                           'content_hash', 'content_hash_algo', 'is_active'])
 
 
 class TestCaseScanner:
-    def __init__(self, root_dir=None):
+    def __init__(self, root_dir=None, job=None):
+        """
+        Args:
+            root_dir: 用例根目录，默认 Config.TEST_CASE_ROOT
+            job: 扫描任务（ScanJob），用于上报进度与响应取消；为空时创建一个仅本地使用的任务
+        """
         self.root_dir = Path(root_dir or Config.TEST_CASE_ROOT)
-        self.case_extensions = {'.py', '.java', '.js', '.ts', '.robot'}  # 根据实际情况扩展
+        self.rules = CaseRuleSet.from_config()
+        self.hasher = ContentHasher()
+        self.job = job or ScanJob(self.root_dir, 'direct')
         self.lock = threading.Lock()
 
     def scan_all_cases(self, update_status=True):
         """扫描所有用例，初始化或更新数据库"""
         with self.lock:
-            all_cases = []
             scan_time = datetime.now()
-
-            for ext in self.case_extensions:
-                for file_path in self.root_dir.rglob(f'*{ext}'):
-                    if self._is_test_case(file_path):
-                        try:
-                            case_info = self._extract_case_info(file_path, scan_time)
-                            all_cases.append(case_info)
-                        except Exception as e:
-                            print(f"Error processing {file_path}: {e}")
+            manifest = ScanManifest(self.root_dir).load()
+            all_cases = self._collect_case_infos(self._iter_case_files(), manifest, scan_time)
 
             # 批量更新数据库
             updated_count = self._update_database(all_cases, update_status)
+            manifest.save()
             return updated_count
 
+    def collect_case_infos(self, files):
+        """为给定的 (path, stat) 序列提取用例信息并计算内容哈希，不写数据库（供分布式扫描使用）"""
+        return [case_info for chunk in self.iter_case_infos(files) for case_info in chunk]
+
+    def iter_case_infos(self, files, chunk_size=None):
+        """同 collect_case_infos，但每凑满 chunk_size 个用例就产出一批（已计算内容哈希），
+        调用方可以边遍历边发送结果；chunk_size 为空时全部遍历完后一次产出
+        """
+        with self.lock:
+            scan_time = datetime.now()
+            manifest = ScanManifest(self.root_dir).load()
+            yield from self._iter_case_info_chunks(files, manifest, scan_time, chunk_size)
+            # 分片只覆盖目录树的一部分，不能清理清单中未见到的记录
+            manifest.save(prune=False)
+
     def scan_new_and_changed_cases(self):
         """扫描新增和修改的用例"""
         with self.lock:
-            existing_cases = {}
-            for case in TestCase.query.all():
-                existing_cases[case.case_hash] = case
-
-            new_or_changed = []
-            deleted_cases = []
+            existing_cases = self._load_case_snapshot()
+            manifest = ScanManifest(self.root_dir).load()
             scan_time = datetime.now()
 
-            # 扫描文件系统
-            for ext in self.case_extensions:
-                for file_path in self.root_dir.rglob(f'*{ext}'):
-                    if self._is_test_case(file_path):
-                        try:
-                            case_info = self._extract_case_info(file_path, scan_time)
-                            case_hash = case_info['case_hash']
-
-                            if case_hash in existing_cases:
-                                existing = existing_cases[case_hash]
-                                # 检查文件是否变更
-                                if (existing.file_mtime is None or
-                                        case_info['file_mtime'] > existing.file_mtime or
-                                        case_info['content_hash'] != existing.content_hash):
-                                    # 文件已变更
-                                    case_info['id'] = existing.id
-                                    case_info['status'] = 'not_executed'  # 变更后标记为未执行
-                                    new_or_changed.append(case_info)
-                                del existing_cases[case_hash]
-                            else:
-                                # 新增用例
-                                case_info['status'] = 'not_executed'
-                                new_or_changed.append(case_info)
-                        except Exception as e:
-                            print(f"Error processing {file_path}: {e}")
+            # 目录剪枝：按配置的间隔穿插一次完整遍历，兜底发现原地修改的文件
+            full_pass = (not Config.SCAN_DIR_PRUNING or not manifest.dir_states or
+                         manifest.passes_since_full + 1 >= Config.SCAN_FULL_PASS_EVERY)
+            walker = self._create_walker()
+            files = walker.walk(dir_states=None if full_pass else manifest.dir_states)
+
+            new_or_changed, refreshed = self._diff_against_snapshot(files, existing_cases, manifest, scan_time)
+            manifest.update_dir_states(walker.dir_states, full_pass)
 
             # 标记已删除的用例
-            for case_hash, case in existing_cases.items():
-                if case.is_active:
-                    case.is_active = False
-                    db.session.add(case)
-                    deleted_cases.append(case.relative_path)
+            deleted_hashes = [case.case_hash for case in existing_cases.values() if case.is_active]
+            existing_cases.clear()
+
+            result = self._apply_changes(new_or_changed, refreshed, deleted_hashes)
+            manifest.save()
+            return result
+
+    def apply_path_changes(self, paths):
+        """只针对发生变化的路径做定点更新（供文件监控使用）
+
+        已存在的文件只做一次 stat 和一次哈希；已存在的目录只遍历该子树；
+        已不存在的路径按文件和目录前缀两种方式标记删除。
+        """
+        with self.lock:
+            manifest = ScanManifest(self.root_dir).load()
+            scan_time = datetime.now()
+
+            # 按路径去重：同一批中既有目录又有其中的文件时（如新建目录后复制文件、移动目录），文件只处理一次
+            files = {}
+            removed = []
+            for path in sorted(set(paths)):
+                path = Path(path)
+                try:
+                    relative_path = path.relative_to(self.root_dir)
+                except ValueError:
+                    continue
+
+                if path.is_dir():
+                    files.update(self._create_walker(path).walk())
+                elif path.is_file():
+                    if self._is_test_case(path):
+                        files[path] = path.stat()
+                elif str(relative_path) != '.':
+                    removed.append(str(relative_path))
+            files = list(files.items())
+
+            existing_cases = self._load_case_snapshot(
+                [TestCase.generate_case_hash(str(file_path.relative_to(self.root_dir))) for file_path, _ in files])
+            new_or_changed, refreshed = self._diff_against_snapshot(files, existing_cases, manifest, scan_time)
+
+            deleted_hashes = self._find_removed_cases(removed)
+            for relative_path in removed:
+                manifest.remove_tree(relative_path)
+
+            result = self._apply_changes(new_or_changed, refreshed, deleted_hashes)
+            manifest.save(prune=False)
+            return result
+
+    def _collect_case_infos(self, files, manifest, scan_time):
+        """提取遍历到的全部用例信息，内容哈希优先从本地清单复用"""
+        return [case_info for chunk in self._iter_case_info_chunks(files, manifest, scan_time)
+                for case_info in chunk]
+
+    def _iter_case_info_chunks(self, files, manifest, scan_time, chunk_size=None):
+        """按 chunk_size 分批提取用例信息并填充内容哈希，chunk_size 为空时只产出一批"""
+        self.job.set_phase('walk')
+        items = []
+        for file_path, stat in files:
+            self.job.add(files_seen=1)
+            self.job.check_cancelled()
+            try:
+                case_info = self._extract_case_info(file_path, scan_time, stat, with_content_hash=False)
+                items.append((case_info, stat))
+            except Exception as e:
+                print(f"Error processing {file_path}: {e}")
+
+            if chunk_size and len(items) >= chunk_size:
+                self._resolve_content_hashes(manifest, items, scan_time)
+                yield [case_info for case_info, _ in items]
+                items = []
+                self.job.set_phase('walk')
+
+        if items or not chunk_size:
+            self._resolve_content_hashes(manifest, items, scan_time)
+            yield [case_info for case_info, _ in items]
+
+    def _diff_against_snapshot(self, files, existing_cases, manifest, scan_time):
+        """将遍历到的文件与数据库快照对比，返回 (new_or_changed, refreshed)
+
+        已匹配的快照项会从 existing_cases 中移除，剩余项即为文件系统中已不存在的用例。
+        """
+        new_or_changed = []
+        refreshed = []
+
+        # 第一阶段：只比较遍历得到的 (file_size, file_mtime)，筛出可能变更的文件
+        self.job.set_phase('walk')
+        candidates = []
+        for file_path, stat in files:
+            self.job.add(files_seen=1)
+            self.job.check_cancelled()
+            try:
+                if stat is None:
+                    # 目录未变化，已入库的活跃用例视为未变更，不做 stat
+                    relative_path = str(file_path.relative_to(self.root_dir))
+                    existing = existing_cases.get(TestCase.generate_case_hash(relative_path))
+                    if existing is not None and existing.is_active:
+                        del existing_cases[existing.case_hash]
+                        manifest.mark_seen(relative_path)
+                        continue
+                    stat = file_path.stat()
+
+                case_info = self._extract_case_info(file_path, scan_time, stat, with_content_hash=False)
+                existing = existing_cases.pop(case_info['case_hash'], None)
+                if existing is not None and self._is_stat_unchanged(existing, case_info, scan_time):
+                    # 与数据库一致，顺带补齐本地清单
+                    if existing.content_hash:
+                        manifest.record(case_info['relative_path'], stat, existing.content_hash,
+                                        existing.content_hash_algo or LEGACY_ALGO_TAG)
+                    else:
+                        manifest.mark_seen(case_info['relative_path'])
+                    continue
+                candidates.append((case_info, existing, stat))
+            except Exception as e:
+                print(f"Error processing {file_path}: {e}")
+
+        # 第二阶段：仅对可能变更的文件取内容哈希（本地清单指纹一致时无需读取文件）
+        self._resolve_content_hashes(manifest, [(case_info, stat) for case_info, _, stat in candidates], scan_time)
+        for case_info, existing, stat in candidates:
+            if existing is None:
+                # 新增用例
+                case_info['status'] = 'not_executed'
+                new_or_changed.append(case_info)
+            elif not existing.is_active or existing.file_mtime is None or self._content_differs(existing, case_info):
+                # 文件已变更（或已删除的用例重新出现）
+                case_info['id'] = existing.id
+                case_info['status'] = 'not_executed'  # 变更后标记为未执行
+                new_or_changed.append(case_info)
+            else:
+                # 内容未变（仅mtime/size变化），只刷新文件信息，保留执行状态
+                refreshed.append(case_info)
+
+        return new_or_changed, refreshed
+
+    def _apply_changes(self, new_or_changed, refreshed, deleted_hashes):
+        """将对比结果写入数据库"""
+        self._deactivate_cases(deleted_hashes)
+
+        if new_or_changed:
+            self._update_database(new_or_changed, update_status=True)
+        if refreshed:
+            self._update_database(refreshed, update_status=False)
+
+        return {
+            'new_count': len([c for c in new_or_changed if 'id' not in c]),
+            'changed_count': len([c for c in new_or_changed if 'id' in c]),
+            'deleted_count': len(deleted_hashes)
+        }
+
+    def _find_removed_cases(self, relative_paths):
+        """查找已删除路径对应的活跃用例（路径可能是文件，也可能是目录）"""
+        if not relative_paths:
+            return []
+
+        snapshot = self._load_case_snapshot([TestCase.generate_case_hash(path) for path in relative_paths])
+        case_hashes = {case_hash for case_hash, case in snapshot.items() if case.is_active}
+
+        batch_size = Config.SCAN_DB_BATCH_SIZE
+        for start in range(0, len(relative_paths), batch_size):
+            batch = relative_paths[start:start + batch_size]
+            rows = db.session.query(TestCase.case_hash).filter(
+                TestCase.is_active == True,
+                db.or_(*[TestCase.relative_path.startswith(path + os.sep, autoescape=True) for path in batch])
+            ).all()
+            case_hashes.update(row.case_hash for row in rows)
+
+        return list(case_hashes)
+
+    def _resolve_content_hashes(self, manifest, items, scan_time):
+        """为 (case_info, stat) 列表填充内容哈希
+
+        本地清单中指纹与算法一致的直接复用，其余文件交给哈希计算器并行计算。
+        """
+        scan_time_ns = int(scan_time.timestamp() * 1_000_000_000)
+        algo = self.hasher.tag
+
+        missing = []
+        for case_info, stat in items:
+            case_info['content_hash_algo'] = algo
+            content_hash = manifest.lookup(case_info['relative_path'], stat, scan_time_ns, algo)
+            if content_hash is None:
+                missing.append((case_info, stat))
+            else:
+                case_info['content_hash'] = content_hash
+                manifest.mark_seen(case_info['relative_path'])
+
+        # 分批计算，每批之间响应取消并上报进度
+        self.job.set_phase('hash')
+        batch_size = Config.CONTENT_HASH_BATCH_SIZE
+        for start in range(0, len(missing), batch_size):
+            self.job.check_cancelled()
+            batch = missing[start:start + batch_size]
+            digests = self.hasher.hash_many([case_info['full_path'] for case_info, _ in batch])
+            for (case_info, stat), content_hash in zip(batch, digests):
+                case_info['content_hash'] = content_hash
+                if content_hash:
+                    manifest.record(case_info['relative_path'], stat, content_hash, algo)
+                else:
+                    manifest.mark_seen(case_info['relative_path'])
+
+            self.job.add(files_hashed=len(batch),
+                         bytes_read=sum(self.hasher.read_size(stat.st_size) for _, stat in batch))
+
+    def _content_differs(self, existing, case_info):
+        """比较内容哈希；数据库中的哈希使用其他算法时，用原算法重新计算后再比较"""
+        existing_algo = existing.content_hash_algo or LEGACY_ALGO_TAG
+        if existing_algo == case_info['content_hash_algo']:
+            return case_info['content_hash'] != existing.content_hash
 
-            # 更新数据库
-            if new_or_changed:
-                self._update_database(new_or_changed, update_status=True)
+        try:
+            legacy_hash = ContentHasher.from_tag(existing_algo).hash_file(case_info['full_path'])
+        except ValueError:
+            # 原算法已不可用，无法比较，按已变更处理（之后以当前算法保存）
+            return True
+        return legacy_hash != existing.content_hash
+
+    def _load_case_snapshot(self, case_hashes=None):
+        """加载用例快照（按 case_hash 索引），不加载结果详情等大字段
+
+        Args:
+            case_hashes: 只加载指定的用例，为 None 时加载全部
+        """
+        columns = (TestCase.id, TestCase.case_hash, TestCase.file_mtime, TestCase.file_size,
+                   TestCase.content_hash, TestCase.content_hash_algo, TestCase.is_active)
+
+        if case_hashes is None:
+            query = db.session.query(*columns).execution_options(yield_per=Config.SCAN_DB_BATCH_SIZE)
+            return {row.case_hash: CaseSnapshot._make(row) for row in query}
+
+        snapshot = {}
+        batch_size = Config.SCAN_DB_BATCH_SIZE
+        for start in range(0, len(case_hashes), batch_size):
+            batch = case_hashes[start:start + batch_size]
+            for row in db.session.query(*columns).filter(TestCase.case_hash.in_(batch)):
+                snapshot[row.case_hash] = CaseSnapshot._make(row)
+        return snapshot
+
+    def _deactivate_cases(self, case_hashes):
+        """批量将用例标记为不活跃（软删除）"""
+        batch_size = Config.SCAN_DB_BATCH_SIZE
+        now = datetime.now()
 
+        self.job.set_phase('db-sync')
+        for start in range(0, len(case_hashes), batch_size):
+            self.job.check_cancelled()
+            batch = case_hashes[start:start + batch_size]
+            rows = TestCase.query.filter(TestCase.case_hash.in_(batch)).update(
+                {'is_active': False, 'updated_at': now}, synchronize_session=False
+            )
             db.session.commit()
+            self.job.add(rows_written=rows)
+
+    def _is_stat_unchanged(self, existing, case_info, scan_time):
+        """比较文件大小和修改时间判断文件是否未变更
+
+        数据库DATETIME精度为秒，mtime 相差不足1秒视为相同；
+        mtime 落在扫描时刻的时钟偏差窗口内时无法确认，需要计算内容哈希。
+        """
+        if not existing.is_active or existing.file_mtime is None or existing.file_size != case_info['file_size']:
+            return False
+
+        file_mtime = case_info['file_mtime']
+        if abs((file_mtime - existing.file_mtime).total_seconds()) >= 1:
+            return False
+
+        return (scan_time - file_mtime).total_seconds() >= Config.SCAN_MTIME_SKEW_SECONDS
 
-            return {
-                'new_count': len([c for c in new_or_changed if 'id' not in c]),
-                'changed_count': len([c for c in new_or_changed if 'id' in c]),
-                'deleted_count': len(deleted_cases)
-            }
+    def _create_walker(self, root_dir=None):
+        """创建目录遍历器，只遍历子树时传入子树相对于根目录的路径，保证规则按完整相对路径匹配"""
+        root_dir = Path(root_dir or self.root_dir)
+        return CaseTreeWalker(root_dir, self.rules.matches, relative_root=str(root_dir.relative_to(self.root_dir)))
+
+    def _iter_case_files(self):
+        """单次遍历目录树，流式产出用例文件的 (path, stat)"""
+        return self._create_walker().walk()
 
     def _is_test_case(self, file_path):
-        """判断是否为测试用例文件"""
-        # 这里根据实际项目规则实现
-        filename = file_path.name.lower()
-        return 'tc_' in filename
+        """判断是否为测试用例文件（根目录之外的文件不是用例）"""
+        try:
+            relative_path = Path(file_path).relative_to(self.root_dir)
+        except ValueError:
+            return False
+        return self.rules.matches(str(relative_path))
 
-    def _extract_case_info(self, file_path, scan_time):
+    def _extract_case_info(self, file_path, scan_time, stat=None, with_content_hash=True):
         """提取用例信息"""
         relative_path = file_path.relative_to(self.root_dir)
 
-        # 获取文件信息
-        stat = file_path.stat()
+        # 获取文件信息（遍历时已取得的stat可直接复用）
+        if stat is None:
+            stat = file_path.stat()
         file_mtime = datetime.fromtimestamp(stat.st_mtime)
 
-        # 生成机器无关的哈希
-        case_hash = TestCase.generate_case_hash(str(relative_path))
+        # 计算文件内容哈希（用于检测变更），增量扫描时延后到第二阶段计算
+        content_hash = self._calculate_content_hash(file_path) if with_content_hash else None
+
+        return self._build_case_info(str(relative_path), stat.st_size, file_mtime, content_hash,
+                                     self.hasher.tag, scan_time)
 
-        # 计算文件内容哈希（用于检测变更）
-        content_hash = self._calculate_content_hash(file_path)
+    def _build_case_info(self, relative_path, file_size, file_mtime, content_hash, content_hash_algo, scan_time):
+        """根据相对路径与文件信息组装用例信息（分布式扫描合并分片结果时也使用）"""
+        file_path = self.root_dir / relative_path
 
         return {
-            'case_hash': case_hash,
+            # 生成机器无关的哈希
+            'case_hash': TestCase.generate_case_hash(relative_path),
             'name': file_path.stem,
             'full_path': str(file_path),
-            'relative_path': str(relative_path),
-            'file_size': stat.st_size,
+            'relative_path': relative_path,
+            'file_size': file_size,
             'file_mtime': file_mtime,
             'content_hash': content_hash,
+            'content_hash_algo': content_hash_algo,
+            'is_active': True,
             'updated_at': scan_time
         }
 
     def _calculate_content_hash(self, file_path):
         """计算文件内容哈希"""
-        try:
-            with open(file_path, 'rb') as f:
-                content = f.read()
-                # 只取前100KB计算哈希，避免大文件性能问题
-                if len(content) > 102400:
-                    content = content[:102400]
-                return hashlib.md5(content).hexdigest()
-        except:
-            return ''
+        return self.hasher.hash_file(file_path)
 
     def _update_database(self, cases, update_status=False):
-        """批量更新数据库"""
+        """批量更新数据库
+
+        按 SCAN_DB_BATCH_SIZE 分批处理：每批用一次 case_hash IN (...) 查询加载已有记录，
+        再通过批量插入/批量更新写入，每批单独提交一个事务。
+        """
         updated_count = 0
+        batch_size = Config.SCAN_DB_BATCH_SIZE
+
+        self.job.set_phase('db-sync')
+        for start in range(0, len(cases), batch_size):
+            self.job.check_cancelled()
+            batch = cases[start:start + batch_size]
+            try:
+                written = self._upsert_batch(batch, update_status)
+                db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+            updated_count += written
+            self.job.add(rows_written=written)
+
+            # 新增或状态被重置的用例需要重新计算优先级分数
+            refresh_priority_scores([case_info['case_hash'] for case_info in batch])
+
+        return updated_count
+
+    def _upsert_batch(self, cases, update_status):
+        """写入一批用例，保持人工修改标记与状态重置的既有语义"""
+        now = datetime.now()
+        existing_rows = db.session.query(
+            TestCase.id, TestCase.case_hash, TestCase.is_manually_modified
+        ).filter(TestCase.case_hash.in_([c['case_hash'] for c in cases])).all()
+        existing = {row.case_hash: row for row in existing_rows}
 
+        inserts = []
+        updates = []
         for case_info in cases:
-            existing = TestCase.query.filter_by(case_hash=case_info['case_hash']).first()
+            row = existing.get(case_info['case_hash'])
 
-            if existing:
+            if row:
                 # 更新已有用例
-                for key, value in case_info.items():
-                    if key != 'case_hash' and hasattr(existing, key):
-                        setattr(existing, key, value)
+                mapping = {key: value for key, value in case_info.items()
+                           if key != 'case_hash' and hasattr(TestCase, key)}
+                mapping['id'] = row.id
 
-                if update_status and not existing.is_manually_modified:
-                    existing.status = 'not_executed'
+                if update_status and not row.is_manually_modified:
+                    mapping['status'] = 'not_executed'
 
-                existing.updated_at = datetime.now()
-                updated_count += 1
+                mapping['updated_at'] = now
+                updates.append(mapping)
             else:
                 # 新增用例
-                case = TestCase(**case_info)
+                mapping = dict(case_info)
                 if update_status:
-                    case.status = 'not_executed'
+                    mapping['status'] = 'not_executed'
                     # 初始化执行时间为前一天凌晨
-                    yesterday = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
-                    case.last_execution_time = yesterday
-                db.session.add(case)
-                updated_count += 1
+                    yesterday = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=1)
+                    mapping['last_execution_time'] = yesterday
+                inserts.append(mapping)
 
-        db.session.commit()
-        return updated_count
+        if updates:
+            db.session.bulk_update_mappings(TestCase, updates)
+        if inserts:
+            db.session.bulk_insert_mappings(TestCase, inserts)
+
+        return len(updates) + len(inserts)
 
 
 class FileChangeHandler(FileSystemEventHandler):
-    """文件变更监控处理器"""
+    """文件变更监控处理器
+
+    将事件涉及的路径（含移动/重命名的源和目标）合并到待处理集合中，
+    在防抖窗口内没有新事件后，只对这些路径做定点更新；处理期间到达的事件留到下一轮，不会丢失。
+    """
 
-    def __init__(self, scanner):
+    def __init__(self, scanner, app=None, debounce=None, max_delay=None):
         self.scanner = scanner
-        self.changes = []
-        self.last_scan = datetime.now()
+        self.app = app
+        self.debounce = Config.WATCHDOG_DEBOUNCE_SECONDS if debounce is None else debounce
+        self.max_delay = Config.WATCHDOG_MAX_DELAY_SECONDS if max_delay is None else max_delay
+        self.pending_paths = set()
+        self.first_event = None
+        self.last_event = None
+        self.failures = 0  # 连续处理失败的次数
+        self.retry_after = 0.0  # 处理失败后，在此时刻之前不再处理
+        self.condition = threading.Condition()
+        self.worker = threading.Thread(target=self._process_events, daemon=True)
+        self.worker.start()
 
     def on_modified(self, event):
         if not event.is_directory and self._is_test_file(event.src_path):
-            self._schedule_rescan()
+            self._enqueue(event.src_path)
 
     def on_created(self, event):
-        if not event.is_directory and self._is_test_file(event.src_path):
-            self._schedule_rescan()
+        if event.is_directory or self._is_test_file(event.src_path):
+            self._enqueue(event.src_path)
 
     def on_deleted(self, event):
-        if not event.is_directory and self._is_test_file(event.src_path):
-            self._schedule_rescan()
+        if event.is_directory or self._is_test_file(event.src_path):
+            self._enqueue(event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory or self._is_test_file(event.src_path):
+            self._enqueue(event.src_path)
+        if event.is_directory or self._is_test_file(event.dest_path):
+            self._enqueue(event.dest_path)
 
     def _is_test_file(self, path):
-        return any(path.endswith(ext) for ext in self.scanner.case_extensions)
+        # 与扫描器使用同一份用例识别规则
+        return self.scanner._is_test_case(path)
+
+    def _enqueue(self, path):
+        """记录变更路径并重置防抖计时"""
+        with self.condition:
+            self._add_pending(path)
+            self.condition.notify()
+
+    def _add_pending(self, path):
+        now = time.monotonic()
+        if not self.pending_paths:
+            self.first_event = now
+        self.pending_paths.add(path)
+        self.last_event = now
+
+    def _process_events(self):
+        """后台线程：等待事件平静后批量处理"""
+        while True:
+            with self.condition:
+                while not self.pending_paths:
+                    self.condition.wait()
+
+                # 防抖：直到 debounce 秒内没有新事件，或累计等待超过 max_delay
+                while True:
+                    now = time.monotonic()
+                    remaining = max(min(self.last_event + self.debounce, self.first_event + self.max_delay),
+                                    self.retry_after) - now
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+            self.flush()
+
+    def flush(self):
+        """立即处理所有待处理路径
+
+        处理失败时路径放回队列，按失败次数退避后重试；连续失败超过 Config.WATCHDOG_MAX_RETRIES 次后放弃这些路径，
+        由定时扫描（scan_cases_job）兜底。
+        """
+        with self.condition:
+            paths = self.pending_paths
+            self.pending_paths = set()
+
+        if not paths:
+            return None
 
-    def _schedule_rescan(self):
-        """安排重新扫描"""
-        now = datetime.now()
-        # 避免频繁扫描，至少间隔10秒
-        if (now - self.last_scan).seconds > 10:
-            threading.Timer(5, self.scanner.scan_new_and_changed_cases).start()
-            self.last_scan = now
+        try:
+            if self.app is not None:
+                with self.app.app_context():
+                    result = self.scanner.apply_path_changes(paths)
+            else:
+                result = self.scanner.apply_path_changes(paths)
+        except Exception as e:
+            print(f"Error applying file changes: {e}")
+            self.failures += 1
+            if self.failures > Config.WATCHDOG_MAX_RETRIES:
+                print(f"Dropping {len(paths)} changed paths after {self.failures} failed attempts, "
+                      f"left to the periodic scan")
+                self.failures = 0
+                return None
+            with self.condition:
+                for path in paths:
+                    self._add_pending(path)
+                self.retry_after = time.monotonic() + self.debounce * 2 ** self.failures
+            return None
+
+        self.failures = 0
+        if result['new_count'] or result['changed_count'] or result['deleted_count']:
+            print(f"Applied file changes: {result}")
+        return result
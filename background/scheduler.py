@@ -3,18 +3,23 @@ from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime, time, timedelta
 import atexit
 import json
-from models import db, TestPlan, DistributedLock
+import uuid
+import threading
+from models import db, TestPlan, DistributedLock, ExecutionTask
 from config import Config
 from executor import TestCaseExecutor
+from result_writer import result_writer
 from distributed import DistributedManager
+from window_planner import WindowPlanner
+from plan_checkpoint import PlanProgress
+import plan_checkpoint
 from utils.logger import logger
 
 
 class TestScheduler:
     def __init__(self, app):
         self.app = app
-        self.scheduler = BackgroundScheduler()
-        self.scheduler.start()
+        self.scheduler = BackgroundScheduler()  # 在 start() 中注册任务后启动
         self.executor = TestCaseExecutor()
         self.distributed_manager = DistributedManager(app)
         self.is_running = False
@@ -39,11 +44,31 @@ class TestScheduler:
                 id='scan_cases_job'
             )
 
-            # 每10分钟检查一次运行中的计划
+            # 定期刷新优先级分数（启动时先执行一次，补齐升级后仍为默认值 0 的 priority_score）
+            self.scheduler.add_job(
+                func=self._refresh_priority_scores,
+                trigger='interval',
+                minutes=Config.PRIORITY_REFRESH_MINUTES,
+                next_run_time=datetime.now(),
+                id='refresh_priority_job'
+            )
+
+            # 定期清除过期的结果缓存（启动时先执行一次，进程频繁重启时间隔可能一直未到）
+            if Config.RESULT_CACHE_ENABLED:
+                self.scheduler.add_job(
+                    func=self._purge_result_cache,
+                    trigger='interval',
+                    hours=Config.RESULT_CACHE_TTL_HOURS,
+                    next_run_time=datetime.now(),
+                    id='purge_result_cache_job'
+                )
+
+            # 每10分钟检查一次运行中的计划（启动时先执行一次，恢复上次进程退出时中断的计划）
             self.scheduler.add_job(
                 func=self._check_running_plans,
                 trigger='interval',
                 minutes=10,
+                next_run_time=datetime.now(),
                 id='check_plans_job'
             )
 
@@ -85,39 +110,53 @@ class TestScheduler:
                     logger.info("当前时间不在允许的执行时间范围内")
                     return
 
-            # 查询所有待执行的定时计划
-            pending_scheduled_plans = TestPlan.query.filter_by(
-                plan_type='scheduled',
-                status='pending'
-            ).all()
+            schedule = self.preview_window()
+            if not schedule['plans']:
+                logger.info("执行窗口内没有可执行的用例，跳过本次定时任务")
+                return
 
-            # 如果有待执行的定时计划，选择最优先的一个执行
-            if pending_scheduled_plans:
-                selected_plan = self._select_plan_to_execute(pending_scheduled_plans)
-                logger.info(f"从 {len(pending_scheduled_plans)} 个待执行计划中选择执行计划: {selected_plan.name} (ID: {selected_plan.id})")
+            logger.info(f"定时窗口装箱完成：{len(schedule['plans'])} 个计划，"
+                        f"预计完成时间 {schedule['predicted_finish'].strftime('%Y-%m-%d %H:%M')}"
+                        f"（截止 {schedule['deadline'].strftime('%H:%M')}），"
+                        f"测试台利用率 {schedule['utilization']:.0%}，{schedule['excluded_cases']} 个用例未装入窗口")
+
+            # 执行前记录各计划的预计完成时间
+            for item in schedule['plans']:
+                if item['plan'] is None:
+                    # 没有待执行的定时计划，创建默认的每日定时计划
+                    logger.info("没有待执行的定时计划，创建默认每日计划")
+                    item['plan'] = TestPlan(
+                        name=f"Daily Schedule - {datetime.now().strftime('%Y-%m-%d')}",
+                        description="Automated daily test execution",
+                        plan_type='scheduled',
+                        status='pending',
+                        created_by='system',
+                        created_at=datetime.now()
+                    )
+                    db.session.add(item['plan'])
+                item['plan'].predicted_finish = item['predicted_finish']
+            db.session.commit()
 
-                # 执行选中的计划
-                self._execute_plan_and_handle_result(selected_plan)
-            else:
-                # 没有待执行的定时计划，创建默认的每日定时计划
-                logger.info("没有待执行的定时计划，创建默认每日计划")
-                daily_plan = TestPlan(
-                    name=f"Daily Schedule - {datetime.now().strftime('%Y-%m-%d')}",
-                    description="Automated daily test execution",
-                    plan_type='scheduled',
-                    status='pending',
-                    created_by='system',
-                    created_at=datetime.now()
-                )
+            # 按装箱顺序依次执行各计划
+            for item in schedule['plans']:
+                plan = item['plan']
+                logger.info(f"执行计划: {plan.name} (ID: {plan.id})，{len(item['cases'])} 个用例，"
+                            f"预计完成时间 {item['predicted_finish'].strftime('%H:%M')}")
+                self._execute_plan_and_handle_result(plan, item['cases'], schedule['deadline'])
 
-                db.session.add(daily_plan)
-                db.session.commit()
+    def preview_window(self, now=None):
+        """把所有待执行的定时计划装入当前（或下一个）执行窗口，返回执行安排（不修改数据库）
 
-                # 执行默认计划
-                self._execute_plan_and_handle_result(daily_plan)
+        见 window_planner.WindowPlanner.plan；没有待执行的定时计划时按默认每日计划选择用例。
+        """
+        pending_scheduled_plans = TestPlan.query.filter_by(
+            plan_type='scheduled',
+            status='pending'
+        ).all()
+        return WindowPlanner(self.executor).plan(self._order_plans(pending_scheduled_plans), now)
 
-    def _select_plan_to_execute(self, plans):
-        """从多个计划中选择一个执行
+    def _order_plans(self, plans):
+        """确定多个计划的执行顺序
 
         规则：
         1. 计划时长更短的优先
@@ -127,58 +166,37 @@ class TestScheduler:
             plans: 待执行的测试计划列表
 
         Returns:
-            选中的测试计划
+            按执行顺序排列的测试计划列表
         """
-        if len(plans) == 1:
-            return plans[0]
-
-        # 计算每个计划的优先级分数
-        # 规则：计划时长越短分数越高，创建时间越新分数越高
-        scored_plans = []
         current_time = datetime.now()
 
-        for plan in plans:
+        def score(plan):
             # 估算计划时长（timeout_minutes，默认为60分钟）
             estimated_duration = plan.timeout_minutes if plan.timeout_minutes and plan.timeout_minutes > 0 else 60
-
             # 计算创建时间差（秒数）
             created_age = (current_time - plan.created_at).total_seconds() if plan.created_at else 0
+            # 时长越短越优先（主要），创建时间越新越优先（次要）
+            return estimated_duration * 1000 + created_age * 0.001
 
-            # 计算分数：时长越短分数越高，创建时间越新分数越高
-            # 使用负数是因为我们要排序，分数越高越优先
-            score = (
-                -estimated_duration * 1000  # 时长权重（主要）
-                -created_age * 0.001  # 创建时间权重（次要）
-            )
-
-            scored_plans.append((score, plan))
-
-        # 按分数排序，选择最高分的计划
-        scored_plans.sort(key=lambda x: x[0])
-        selected_score, selected_plan = scored_plans[0]
-
-        logger.info(f"计划选择详情 - 选中的计划: {selected_plan.name}, "
-                   f"时长: {selected_plan.timeout_minutes or 60}分钟, "
-                   f"创建时间: {selected_plan.created_at}")
-
-        # 记录被跳过的计划
-        for score, plan in scored_plans[1:]:
-            logger.info(f"跳过计划: {plan.name}, "
-                       f"时长: {plan.timeout_minutes or 60}分钟, "
-                       f"创建时间: {plan.created_at}")
-
-        return selected_plan
+        ordered = sorted(plans, key=score)
+        for position, plan in enumerate(ordered, 1):
+            logger.info(f"计划执行顺序 {position}: {plan.name}, "
+                        f"时长: {plan.timeout_minutes or 60}分钟, "
+                        f"创建时间: {plan.created_at}")
+        return ordered
 
-    def _execute_plan_and_handle_result(self, plan):
+    def _execute_plan_and_handle_result(self, plan, cases=None, deadline=None):
         """执行计划并处理结果
 
         Args:
             plan: 要执行的测试计划
+            cases: 按执行顺序排列的用例，为空时按计划配置选择
+            deadline: 截止时刻，预计无法在此之前完成的用例不再启动
         """
         # 执行计划
         try:
             self.is_running = True
-            result = self.executor.execute_test_plan(plan.id)
+            result = self.executor.execute_test_plan(plan.id, cases, deadline)
             logger.info(f"计划执行完成: {result}")
         except Exception as e:
             logger.error(f"计划执行失败: {str(e)}")
@@ -189,19 +207,45 @@ class TestScheduler:
 
     def _scan_changed_cases(self):
         """扫描变更的用例"""
+        from scan_jobs import scan_job_manager
+
+        # 通过扫描任务管理器执行，与手动触发的扫描共享去重与进度
+        job, _ = scan_job_manager.submit(self.app, 'incremental')
+        job.wait()
+
+        result = job.result
+        if result and (result.get('new_count') or result.get('changed_count')):
+            logger.info(f"Scanned cases: {result}")
+
+    def _refresh_priority_scores(self):
+        """刷新全部活跃用例的优先级分数"""
+        from priority import refresh_priority_scores
+
         with self.app.app_context():
-            from scanner import TestCaseScanner
-            scanner = TestCaseScanner()
-            result = scanner.scan_new_and_changed_cases()
+            updated = refresh_priority_scores()
+            if updated:
+                logger.info(f"Refreshed priority scores for {updated} cases")
 
-            if result['new_count'] > 0 or result['changed_count'] > 0:
-                logger.info(f"Scanned cases: {result}")
+    def _purge_result_cache(self):
+        """清除过期的结果缓存"""
+        from result_cache import purge_expired
+
+        with self.app.app_context():
+            deleted = purge_expired()
+            if deleted:
+                logger.info(f"Purged {deleted} expired result cache entries")
 
     def _check_running_plans(self):
-        """检查是否有运行超时的计划"""
+        """检查是否有运行超时或被中断的计划"""
         with self.app.app_context():
             running_plans = TestPlan.query.filter_by(status='running').all()
             for plan in running_plans:
+                # 执行进程已崩溃或重启的计划从检查点继续执行
+                if not plan.distributed and plan_checkpoint.is_orphaned(plan.id):
+                    logger.warning(f"Plan {plan.id} was interrupted, resuming from checkpoint")
+                    threading.Thread(target=self._resume_plan_thread, args=(plan.id,), daemon=True).start()
+                    continue
+
                 # 如果计划开始执行超过6小时，标记为失败
                 if plan.last_execution_time and (datetime.now() - plan.last_execution_time).seconds > 21600:
                     plan.status = 'failed'
@@ -302,6 +346,20 @@ class TestScheduler:
             db.session.commit()
             logger.error(f"执行计划失败: {str(e)}")
 
+    def _resume_plan_thread(self, plan_id):
+        """从检查点继续执行被中断的计划（与 /api/test-plans/<id>/execute 相同的执行路径，沿用计划的重试次数等配置）"""
+        with self.app.app_context():
+            plan = TestPlan.query.get(plan_id)
+            if plan:
+                self.execute_test_cases(
+                    plan_id=plan.id,
+                    case_ids=json.loads(plan.case_ids) if plan.case_ids else [],
+                    priorities=json.loads(plan.priorities) if plan.priorities else [],
+                    retry_count=plan.retry_count,
+                    timeout_minutes=plan.timeout_minutes,
+                    distributed=plan.distributed
+                )
+
     def _execute_plan_thread(self, plan_id):
         """执行计划的线程函数"""
         with self.app.app_context():
@@ -313,7 +371,16 @@ class TestScheduler:
                     self.executor.execute_test_plan(plan_id)
 
     def _execute_distributed_plan(self, plan):
-        """分布式执行测试计划"""
+        """分布式执行测试计划
+
+        按历史平均时长以 LPT 方式将用例分配到各机器（见 plan_sharding.lpt_shards），
+        每个用例的分配记录为一条 ExecutionTask。
+
+        Returns:
+            各机器分片的预计完成时间 [{'machine_id', 'case_count', 'total_duration', 'makespan'}]
+        """
+        from plan_sharding import lpt_shards
+
         # 获取可用机器
         machines = self.distributed_manager.get_available_machines()
 
@@ -321,37 +388,64 @@ class TestScheduler:
             logger.warning("No available machines for distributed execution")
             plan.status = 'failed'
             db.session.commit()
-            return
+            return []
 
         # 选择用例并分配给各机器
         include_paths = json.loads(plan.include_paths) if plan.include_paths else None
         exclude_paths = json.loads(plan.exclude_paths) if plan.exclude_paths else None
 
-        from .executor import TestCaseExecutor
-        executor = TestCaseExecutor()
-        cases = executor.select_cases_for_execution(
+        cases = self.executor.select_cases_for_execution(
             limit=1000,
             include_paths=include_paths,
             exclude_paths=exclude_paths
         )
 
-        # 分配用例给各机器
-        cases_per_machine = len(cases) // len(machines) + 1
+        shards = lpt_shards(cases, machines)
+
+        # 记录分配结果
+        tasks = [
+            {
+                'task_id': uuid.uuid4().hex,
+                'case_hash': case.case_hash,
+                'plan_id': plan.id,
+                'machine_id': shard['machine_id'],
+                'status': 'pending',
+                'predicted_duration': duration,
+                'predicted_finish': finish,
+                'created_at': datetime.now()
+            }
+            for shard in shards for case, duration, finish in shard['cases']
+        ]
+        for start in range(0, len(tasks), Config.SCAN_DB_BATCH_SIZE):
+            db.session.bulk_insert_mappings(ExecutionTask, tasks[start:start + Config.SCAN_DB_BATCH_SIZE])
+        db.session.commit()
 
-        for i, machine in enumerate(machines):
-            start_idx = i * cases_per_machine
-            end_idx = min((i + 1) * cases_per_machine, len(cases))
-            machine_cases = cases[start_idx:end_idx]
+        report = []
+        for shard in shards:
+            if not shard['cases']:
+                continue
 
-            # 准备任务数据
+            # 准备任务数据（用例按预计时长从长到短排列）
             task_data = {
                 'plan_id': plan.id,
-                'case_hashes': [case.case_hash for case in machine_cases],
-                'machine_id': machine.machine_id
+                'case_hashes': [case.case_hash for case, _, _ in shard['cases']],
+                'machine_id': shard['machine_id'],
+                'predicted_makespan': shard['makespan']
             }
 
             # 分配任务
-            self.distributed_manager.assign_task_to_machine(task_data)
+            self.distributed_manager.assign_task_to_machine(task_data, machine_id=shard['machine_id'])
+
+            report.append({
+                'machine_id': shard['machine_id'],
+                'case_count': len(shard['cases']),
+                'total_duration': round(shard['total_duration'], 1),
+                'makespan': round(shard['makespan'], 1)
+            })
+            logger.info(f"Plan {plan.id} shard on {shard['machine_id']}: {len(shard['cases'])} cases, "
+                        f"predicted makespan {shard['makespan'] / 60:.1f} min")
+
+        return report
 
     ''' 测试任务执行器 '''
     def execute_test_cases(self, plan_id, case_ids, priorities, retry_count, timeout_minutes, distributed):
@@ -364,84 +458,64 @@ class TestScheduler:
             return
 
         try:
-            # 获取要执行的用例
-            cases_to_execute = []
-
-            if case_ids:
-                # 如果指定了case_ids，直接使用
-                cases = TestCase.query.filter(
-                    TestCase.case_hash.in_(case_ids),
-                    TestCase.is_active == True
-                ).all()
-                cases_to_execute = cases
-            else:
+            def select_cases():
+                if case_ids:
+                    # 如果指定了case_ids，直接使用
+                    return TestCase.query.filter(
+                        TestCase.case_hash.in_(case_ids),
+                        TestCase.is_active == True
+                    ).all()
                 # 否则根据路径选择用例
                 include_paths = json.loads(plan.include_paths) if plan.include_paths else None
                 exclude_paths = json.loads(plan.exclude_paths) if plan.exclude_paths else None
-                cases_to_execute = self.executor.select_cases_for_execution(
+                return self.executor.select_cases_for_execution(
                     limit=1000,
                     include_paths=include_paths,
                     exclude_paths=exclude_paths
                 )
 
-            if not cases_to_execute:
-                logger.warning("No cases to execute")
-                plan.status = 'completed'
+            with plan_checkpoint.running(plan_id) as claimed:
+                if not claimed:
+                    logger.warning(f"Plan {plan_id} is already running")
+                    return
+
+                # 有检查点时（暂停后继续、进程崩溃后重新执行）只执行未完成的用例
+                progress, cases_to_execute = PlanProgress.open(plan, select_cases)
+
+                if not cases_to_execute:
+                    logger.warning("No cases to execute")
+                    plan.status = 'completed'
+                    db.session.commit()
+                    progress.close()
+                    return
+
+                # 更新计划统计（从检查点继续时继续累计）
+                plan.total_cases = progress.total
+                for key, value in progress.counters().items():
+                    setattr(plan, key, value)
                 db.session.commit()
-                return
 
-            # 更新计划统计
-            plan.total_cases = len(cases_to_execute)
-            plan.executed_cases = 0
-            plan.passed_cases = 0
-            plan.failed_cases = 0
-
-            # 执行用例
-            results = []
-            completed_count = 0
-
-            for case in cases_to_execute:
-                for attempt in range(retry_count + 1):
-                    try:
-                        status, duration, details = self.executor.execute_single_case(case, plan_id)
-
-                        # 更新统计
-                        completed_count += 1
-                        if status == 'passed':
-                            plan.passed_cases += 1
-                        elif status == 'failed':
-                            plan.failed_cases += 1
-
-                        plan.executed_cases = completed_count
-
-                        # 如果成功或已到最大重试次数，跳出重试循环
-                        if status == 'passed' or attempt == retry_count:
-                            results.append({
-                                'case_hash': case.case_hash,
-                                'name': case.name,
-                                'status': status,
-                                'duration': duration
-                            })
-                            break
-
-                    except Exception as e:
-                        logger.error(f"Error executing case {case.case_hash}: {str(e)}")
-                        if attempt == retry_count:
-                            # 最后一次重试也失败
-                            plan.failed_cases += 1
-                            plan.executed_cases += 1
-                            results.append({
-                                'case_hash': case.case_hash,
-                                'name': case.name,
-                                'status': 'failed',
-                                'error': str(e)
-                            })
-
-            # 更新计划状态
-            plan.status = 'completed'
-            db.session.commit()
+                write_mark = result_writer.mark(plan.id)
+                # 在测试台资源池上并行执行，未通过的用例在同一测试台上重试；
+                # 每个用例按最后一次尝试的结果记入检查点与计划统计（由写线程异步落库）
+                results = self.executor.run_cases(cases_to_execute, plan_id, retry_count=retry_count,
+                                                  on_result=progress.record)
+
+                # 计划结束前确保执行结果全部落库；有结果写入失败时计划记为失败（保留检查点，下次执行时补跑）
+                written = result_writer.flush(since=write_mark, plan_id=plan.id)
+                # 执行期间计划可能已被暂停或取消（/api/test-plans/<id>/pause、/cancel），暂停的计划保留检查点
+                db.session.refresh(plan)
+                if not written:
+                    logger.error(f"计划 {plan.id} 的执行结果写入失败: {result_writer.last_error}")
+                    plan.status = 'failed'
+                elif plan.status == 'running':
+                    plan.status = 'completed'
+                db.session.commit()
+                progress.close()
 
-            logger.info(f"Plan {plan_id} execution completed: {completed_count} cases executed")
+            idle_gap = self.executor.idle_gap_stats(results)
+            logger.info(f"Plan {plan_id} execution {plan.status}: {len(results)} cases executed, "
+                        f"rig idle gap avg {idle_gap['avg_ms']} ms, max {idle_gap['max_ms']} ms")
 
         except Exception as e:
             plan.status = 'failed'
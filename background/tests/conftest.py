@@ -0,0 +1,92 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+
+# 测试环境：两个测试台，用例、日志与租约文件都放在临时目录（需在导入执行器等模块前设置）
+TEST_DIR = tempfile.mkdtemp(prefix='testcase_manager_')
+Config.TEST_RIGS = [{'name': 'rig-1'}, {'name': 'rig-2'}]
+Config.MAX_CONCURRENT_TESTS = Config.PREFETCH_DEPTH = len(Config.TEST_RIGS)
+Config.TEST_CASE_ROOT = os.path.join(TEST_DIR, 'cases')
+Config.EXECUTION_LOG_DIR = os.path.join(TEST_DIR, 'logs')
+Config.HARDWARE_LEASE_PATH = os.path.join(TEST_DIR, 'hardware_leases.db')
+Config.SCAN_MANIFEST_PATH = os.path.join(TEST_DIR, 'scan_manifest.db')
+Config.CASE_RUNNERS = {'.py': [sys.executable, '{path}']}
+Config.RESULT_WRITE_INTERVAL = 0.1
+os.makedirs(Config.TEST_CASE_ROOT)
+
+from flask import Flask
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.schema import CreateTable, CreateIndex
+from extra.extensions import db
+import models  # noqa: F401  注册模型
+
+
+@pytest.fixture(scope='session')
+def app():
+    """使用 SQLite 的测试应用（result_writer 的写线程绑定首个应用，整个测试会话共用一个）
+
+    与 create_app 一样注册测试计划接口并挂上调度器（不启动定时任务）。
+    """
+    from api.test_plans import test_plans_bp
+    from scheduler import TestScheduler
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(TEST_DIR, 'test.db')
+    db.init_app(app)
+    app.register_blueprint(test_plans_bp)
+    app.scheduler = TestScheduler(app)
+
+    with app.app_context():
+        with db.engine.begin() as conn:
+            for table in db.metadata.sorted_tables:
+                conn.execute(CreateTable(table))
+        # 带前缀长度的索引（如 relative_path(128)）只适用于 MySQL，SQLite 上跳过
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    with db.engine.begin() as conn:
+                        conn.execute(CreateIndex(index))
+                except OperationalError:
+                    pass
+    return app
+
+
+@pytest.fixture
+def app_context(app):
+    """每个测试一个应用上下文，结束后等待结果写入并清空所有表"""
+    from result_writer import result_writer
+
+    with app.app_context():
+        yield app
+        result_writer.flush()
+        db.session.remove()
+        with db.engine.begin() as conn:
+            for table in reversed(db.metadata.sorted_tables):
+                conn.execute(table.delete())
+
+
+@pytest.fixture
+def make_case():
+    """在用例目录中写入用例文件并返回 TestCase 的字段"""
+    def make(name, body='', **fields):
+        path = os.path.join(Config.TEST_CASE_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(body)
+        values = {
+            'case_hash': name,
+            'name': os.path.splitext(name)[0],
+            'full_path': path,
+            'relative_path': name,
+            'is_active': True,
+            'status': 'not_executed'
+        }
+        values.update(fields)
+        return values
+    return make
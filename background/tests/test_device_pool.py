@@ -0,0 +1,69 @@
+import time
+import asyncio
+
+import pytest
+
+from device_pool import DevicePool, Rig
+from hardware_lease import HardwareLeaseStore
+
+
+@pytest.fixture
+def pool(tmp_path):
+    return DevicePool([Rig('rig-1')], HardwareLeaseStore(str(tmp_path / 'leases.db')))
+
+
+def slow(func, seconds=0.3):
+    def wrapper(*args):
+        time.sleep(seconds)
+        return func(*args)
+    return wrapper
+
+
+def cancel_while_claiming(coroutine_factory):
+    async def scenario():
+        task = asyncio.ensure_future(coroutine_factory())
+        await asyncio.sleep(0.1)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # 等线程中的租用完成并释放
+        await asyncio.sleep(0.5)
+    asyncio.run(scenario())
+
+
+def test_cancelled_try_acquire_releases_rig(pool, monkeypatch):
+    monkeypatch.setattr(pool.store, 'try_acquire', slow(pool.store.try_acquire))
+
+    cancel_while_claiming(lambda: pool.try_acquire_async())
+
+    assert pool.idle_count() == 1
+
+
+def test_cancelled_acquire_releases_rig_and_leaves_queue(pool, monkeypatch):
+    monkeypatch.setattr(pool.store, 'claim', slow(pool.store.claim))
+
+    cancel_while_claiming(lambda: pool.acquire_async())
+
+    leases, queue = pool.store.snapshot()
+    assert leases == {}
+    assert queue == []
+
+
+def test_snapshot_is_read_only(pool):
+    store = pool.store
+    assert store.try_acquire(['rig-1'], 'case') is not None
+    conn = store._connect()
+    # 心跳超时的租约：快照视为空闲但不删除，由下一次租用回收
+    conn.execute('UPDATE leases SET heartbeat_at = 0')
+
+    conn.execute('BEGIN IMMEDIATE')
+    start = time.monotonic()
+    leases, _ = store.snapshot()  # 其他连接持有写锁时也不等待
+    assert time.monotonic() - start < 1
+    conn.execute('COMMIT')
+
+    assert leases == {}
+    assert conn.execute('SELECT COUNT(*) FROM leases').fetchone()[0] == 1
+    conn.close()
+
+    assert store.try_acquire(['rig-1'], 'next') is not None
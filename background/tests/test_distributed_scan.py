@@ -0,0 +1,70 @@
+import json
+import time
+import queue
+import threading
+from collections import defaultdict
+from types import SimpleNamespace
+
+from config import Config
+from models import TestCase
+from scanner import TestCaseScanner
+from distributed_scan import DistributedScanCoordinator, ScanShardWorker
+
+
+class FakeManager:
+    """内存中的消息队列，代替 DistributedManager 的 Redis 队列"""
+
+    def __init__(self, machine_ids):
+        self.queues = defaultdict(queue.Queue)
+        self.machines = [SimpleNamespace(machine_id=machine_id) for machine_id in machine_ids]
+        self.redis_client = SimpleNamespace(set=lambda *args, **kwargs: None, exists=lambda key: False)
+
+    def push_message(self, queue_key, data, expire=None):
+        self.queues[queue_key].put(json.dumps(data))
+
+    def pop_message(self, queue_key, timeout=5):
+        try:
+            return json.loads(self.queues[queue_key].get(timeout=timeout))
+        except queue.Empty:
+            return None
+
+    def get_available_machines(self):
+        return self.machines
+
+
+def test_remote_results_are_drained_while_local_shard_is_scanned(app_context, tmp_path, monkeypatch):
+    for name in ('a', 'b'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / f'tc_{name}.py').write_text('pass\n')
+    monkeypatch.setattr(Config, 'TEST_CASE_ROOT', str(tmp_path))
+    manager = FakeManager([Config.MACHINE_ID, 'remote'])
+
+    def remote_worker():
+        worker = ScanShardWorker(app_context, manager)
+        with app_context.app_context():
+            worker.run_task(manager.pop_message('scan_tasks:remote'))
+
+    remote = threading.Thread(target=remote_worker)
+    remote.start()
+
+    scanner = TestCaseScanner(root_dir=tmp_path)
+    collect_case_infos = scanner.collect_case_infos
+    drained = []
+
+    def slow_local_shard(files):
+        # 本机分片结束前，远端分片的结果应已被接收线程取走
+        reply_queue = manager.queues[f'scan_results:{scanner.job.id}']
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and (remote.is_alive() or not reply_queue.empty()):
+            time.sleep(0.05)
+        drained.append(not remote.is_alive() and reply_queue.empty())
+        return collect_case_infos(files)
+
+    monkeypatch.setattr(scanner, 'collect_case_infos', slow_local_shard)
+    result = DistributedScanCoordinator(scanner, manager).run()
+    remote.join()
+
+    assert drained == [True]
+    assert result['fallback_shards'] == []
+    assert result['updated_count'] == 2
+    assert TestCase.query.count() == 2
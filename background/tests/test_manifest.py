@@ -0,0 +1,32 @@
+from types import SimpleNamespace
+
+from manifest import ScanManifest
+
+
+def make_stat(inode, size=10, mtime_ns=1_000_000_000):
+    return SimpleNamespace(st_size=size, st_mtime_ns=mtime_ns, st_ino=inode)
+
+
+def lookup(recorded_inode, current_inode):
+    manifest = ScanManifest('/cases')
+    manifest.record('tc_a.py', make_stat(recorded_inode), 'hash', 'md5-head')
+    return manifest.lookup('tc_a.py', make_stat(current_inode), 10 ** 12, 'md5-head')
+
+
+def test_lookup_ignores_unknown_inode():
+    # Windows 上 DirEntry.stat() 的 st_ino 为 0，Path.stat() 为真实文件索引
+    assert lookup(123, 0) == 'hash'
+    assert lookup(0, 123) == 'hash'
+
+
+def test_lookup_rejects_different_inode():
+    assert lookup(123, 123) == 'hash'
+    assert lookup(123, 456) is None
+
+
+def test_inode_not_recorded_on_windows(monkeypatch):
+    monkeypatch.setattr('manifest.RECORD_INODE', False)
+    manifest = ScanManifest('/cases')
+    manifest.record('tc_a.py', make_stat(123), 'hash', 'md5-head')
+
+    assert manifest.entries['tc_a.py'][2] == 0
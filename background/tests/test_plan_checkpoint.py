@@ -0,0 +1,126 @@
+import json
+import time
+import subprocess
+import sys
+
+from config import Config
+from extra.extensions import db
+from models import TestCase, TestPlan, TestExecution, PlanCheckpoint
+import plan_checkpoint
+
+CASE_BODY = 'import time\ntime.sleep(0.4)\n'
+
+
+def wait_for(predicate, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db.session.expire_all()
+        if predicate():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def create_plan(make_case, count, **fields):
+    cases = [make_case(f'case_{i}.py', CASE_BODY, status='passed') for i in range(count)]
+    db.session.bulk_insert_mappings(TestCase, cases)
+    plan = TestPlan(name='checkpoint', plan_type='custom',
+                    case_ids=json.dumps([case['case_hash'] for case in cases]), **fields)
+    db.session.add(plan)
+    db.session.commit()
+    return plan.id, [case['case_hash'] for case in cases]
+
+
+def passed_hashes(plan_id):
+    executions = TestExecution.query.filter_by(plan_id=plan_id, status='passed').all()
+    return sorted(execution.case_hash for execution in executions)
+
+
+def test_pause_then_resume_runs_only_unfinished_cases(app_context, make_case):
+    client = app_context.test_client()
+    plan_id, hashes = create_plan(make_case, 6)
+
+    assert client.post(f'/api/test-plans/{plan_id}/execute').status_code == 200
+    assert wait_for(lambda: (TestPlan.query.get(plan_id).executed_cases or 0) >= 2)
+    assert client.post(f'/api/test-plans/{plan_id}/pause').status_code == 200
+
+    # 执行中的用例结束后执行线程退出，进度保留在检查点中
+    assert wait_for(lambda: not plan_checkpoint.is_active(plan_id))
+    plan = TestPlan.query.get(plan_id)
+    checkpoint = PlanCheckpoint.query.filter_by(plan_id=plan_id).first()
+    completed = json.loads(checkpoint.completed)
+    assert plan.status == 'paused'
+    assert 2 <= len(completed) < len(hashes)
+    assert plan.executed_cases == len(completed)
+
+    assert client.post(f'/api/test-plans/{plan_id}/resume').status_code == 200
+    assert wait_for(lambda: TestPlan.query.get(plan_id).status == 'completed')
+
+    # 每个用例只执行一次：已完成的用例不再重跑
+    plan = TestPlan.query.get(plan_id)
+    assert passed_hashes(plan_id) == sorted(hashes)
+    assert (plan.executed_cases, plan.passed_cases, plan.total_cases) == (6, 6, 6)
+    assert PlanCheckpoint.query.filter_by(plan_id=plan_id).count() == 0
+
+
+def test_resume_rejects_plan_that_is_not_paused(app_context, make_case):
+    client = app_context.test_client()
+    plan_id, _ = create_plan(make_case, 1, status='completed')
+
+    assert client.post(f'/api/test-plans/{plan_id}/resume').status_code == 400
+
+
+def crash(plan_id, hashes, completed):
+    """模拟执行进程崩溃：检查点属于本机已退出的进程，completed 中的用例已完成"""
+    dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+    dead.wait()
+    db.session.add(PlanCheckpoint(plan_id=plan_id, case_hashes=json.dumps(hashes),
+                                  completed=json.dumps({case_hash: 'passed' for case_hash in completed}),
+                                  machine_id=Config.MACHINE_ID, pid=dead.pid))
+    db.session.commit()
+    assert plan_checkpoint.is_orphaned(plan_id)
+
+
+def test_interrupted_plan_resumes_from_checkpoint(app_context, make_case):
+    plan_id, hashes = create_plan(make_case, 4, status='running', executed_cases=2, passed_cases=2)
+
+    # 第三个用例留下预先创建的执行记录
+    db.session.add(TestExecution(case_hash=hashes[2], plan_id=plan_id, status='pending'))
+    crash(plan_id, hashes, hashes[:2])
+
+    app_context.scheduler._check_running_plans()
+    assert wait_for(lambda: TestPlan.query.get(plan_id).status == 'completed')
+
+    plan = TestPlan.query.get(plan_id)
+    assert passed_hashes(plan_id) == sorted(hashes[2:])
+    assert TestExecution.query.filter_by(plan_id=plan_id, status='cancelled').count() == 1
+    assert (plan.executed_cases, plan.passed_cases) == (4, 4)
+    assert PlanCheckpoint.query.filter_by(plan_id=plan_id).count() == 0
+
+
+def test_interrupted_plan_keeps_its_retry_count(app_context, make_case, tmp_path):
+    plan_id, hashes = create_plan(make_case, 2, status='running', retry_count=1, executed_cases=1, passed_cases=1)
+    # 第一次执行失败、重试时通过的用例
+    marker = tmp_path / 'attempted'
+    make_case(hashes[1], f'import os, sys\nif not os.path.exists({str(marker)!r}):\n'
+                         f'    open({str(marker)!r}, "w").close()\n    sys.exit(1)\n')
+    crash(plan_id, hashes, hashes[:1])
+
+    app_context.scheduler._check_running_plans()
+    assert wait_for(lambda: TestPlan.query.get(plan_id).status == 'completed')
+
+    assert marker.exists()
+    assert TestPlan.query.get(plan_id).passed_cases == 2
+
+
+def test_deactivated_cases_are_skipped_on_resume(app_context, make_case):
+    plan_id, hashes = create_plan(make_case, 3, status='running', executed_cases=1, passed_cases=1)
+    TestCase.query.filter_by(case_hash=hashes[2]).update({'is_active': False})
+    crash(plan_id, hashes, hashes[:1])
+
+    app_context.scheduler._check_running_plans()
+    assert wait_for(lambda: TestPlan.query.get(plan_id).status == 'completed')
+
+    plan = TestPlan.query.get(plan_id)
+    assert passed_hashes(plan_id) == [hashes[1]]
+    assert (plan.total_cases, plan.executed_cases, plan.passed_cases) == (3, 3, 2)
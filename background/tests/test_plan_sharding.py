@@ -0,0 +1,50 @@
+from types import SimpleNamespace
+
+from config import Config
+from plan_sharding import estimate_durations, lpt_shards
+
+
+def make_cases(durations):
+    return [SimpleNamespace(case_hash=f'case_{i}', avg_duration=duration) for i, duration in enumerate(durations)]
+
+
+def make_machines(*max_tasks):
+    return [SimpleNamespace(machine_id=f'machine-{i}', max_tasks=tasks) for i, tasks in enumerate(max_tasks)]
+
+
+def test_every_case_is_assigned_once():
+    cases = make_cases([30, 600, 45, 0, 120, 600, 10])
+    shards = lpt_shards(cases, make_machines(1, 2, 1))
+
+    assigned = [case.case_hash for shard in shards for case, _, _ in shard['cases']]
+    assert sorted(assigned) == sorted(case.case_hash for case in cases)
+
+
+def test_long_cases_are_spread_across_machines():
+    cases = make_cases([30] * 30 + [600] * 3)
+    shards = lpt_shards(cases, make_machines(1, 1, 1))
+
+    assert [sum(1 for _, duration, _ in shard['cases'] if duration == 600) for shard in shards] == [1, 1, 1]
+    assert max(shard['makespan'] for shard in shards) == 900
+
+
+def test_machines_with_more_slots_get_more_work():
+    shards = lpt_shards(make_cases([60] * 12), make_machines(1, 2))
+
+    assert [shard['total_duration'] for shard in shards] == [240, 480]
+    assert [shard['makespan'] for shard in shards] == [240, 240]
+
+
+def test_makespan_within_lpt_bound():
+    durations = [(i * 37) % 500 + 5 for i in range(200)]
+    shards = lpt_shards(make_cases(durations), make_machines(2, 3, 1))
+
+    slots = sum(shard['capacity'] for shard in shards)
+    assert max(shard['makespan'] for shard in shards) <= sum(durations) / slots + max(durations)
+    for shard in shards:
+        assert shard['makespan'] == max(finish for _, _, finish in shard['cases'])
+
+
+def test_unknown_durations_use_median_or_default():
+    assert estimate_durations(make_cases([10, None, 30, 0, 20])) == [10, 20, 30, 20, 20]
+    assert estimate_durations(make_cases([None, 0])) == [Config.SHARD_DEFAULT_CASE_DURATION] * 2
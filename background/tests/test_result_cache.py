@@ -0,0 +1,86 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import Config
+from extra.extensions import db
+from models import TestCase, TestPlan, TestExecution, ResultCacheEntry
+from executor import TestCaseExecutor
+from result_cache import invalidate, purge_expired
+from result_writer import result_writer
+
+
+@pytest.fixture
+def cache_enabled(monkeypatch):
+    monkeypatch.setattr(Config, 'RESULT_CACHE_ENABLED', True)
+
+
+def add_cases(make_case, bodies):
+    cases = [make_case(f'cache_{i}.py', body, content_hash=f'content_{i}') for i, body in enumerate(bodies)]
+    db.session.bulk_insert_mappings(TestCase, cases)
+    db.session.commit()
+    return [case['case_hash'] for case in cases]
+
+
+def run_plan(executor):
+    db.session.expire_all()
+    plan = TestPlan(name='cache', plan_type='custom')
+    db.session.add(plan)
+    db.session.commit()
+    result = executor.execute_test_plan(plan.id)
+    result_writer.flush()
+    return {item['case_hash']: item.get('cached', False) for item in result['results']}, result
+
+
+def test_passed_cases_hit_cache_on_next_run(app_context, make_case, cache_enabled):
+    hashes = add_cases(make_case, ['', '', 'raise SystemExit(1)'])
+    executor = TestCaseExecutor()
+
+    cached, result = run_plan(executor)
+    assert cached == dict.fromkeys(hashes, False)
+    assert ResultCacheEntry.query.count() == 2
+
+    # 通过的用例命中缓存，不占用测试台；失败的用例不写缓存，再次执行
+    cached, result = run_plan(executor)
+    assert cached == {hashes[0]: True, hashes[1]: True, hashes[2]: False}
+    assert result['passed_cases'] == 2
+    assert TestExecution.query.filter_by(executed_by='cache').count() == 2
+
+
+def test_changed_or_invalidated_cases_miss_cache(app_context, make_case, cache_enabled):
+    hashes = add_cases(make_case, ['', '', ''])
+    executor = TestCaseExecutor()
+    run_plan(executor)
+
+    # 内容哈希变化与手动清除的用例都重新执行
+    TestCase.query.filter_by(case_hash=hashes[0]).update({'content_hash': 'changed'})
+    db.session.commit()
+    assert invalidate([hashes[1]]) == 1
+
+    cached, _ = run_plan(executor)
+    assert cached == {hashes[0]: False, hashes[1]: False, hashes[2]: True}
+
+
+def test_expired_entries_miss_and_are_purged(app_context, make_case, cache_enabled):
+    hashes = add_cases(make_case, [''])
+    executor = TestCaseExecutor()
+    run_plan(executor)
+
+    ResultCacheEntry.query.update({'passed_at': datetime.now() - timedelta(hours=Config.RESULT_CACHE_TTL_HOURS + 1)})
+    db.session.commit()
+    db.session.expire_all()
+    assert executor.result_cache.lookup(TestCase.query.all()) == {}
+    assert purge_expired() == 1
+
+    cached, _ = run_plan(executor)
+    assert cached == {hashes[0]: False}
+
+
+def test_cache_disabled_runs_every_case(app_context, make_case):
+    hashes = add_cases(make_case, [''])
+    executor = TestCaseExecutor()
+    run_plan(executor)
+
+    cached, _ = run_plan(executor)
+    assert cached == {hashes[0]: False}
+    assert ResultCacheEntry.query.count() == 0
@@ -0,0 +1,36 @@
+import pytest
+
+from models import TestExecution, ResultCacheEntry
+from result_writer import ResultWriter
+
+
+@pytest.fixture
+def writer(app_context):
+    writer = ResultWriter(interval=0.05)
+    yield writer
+    writer.close()
+
+
+def test_bad_row_only_drops_itself_and_fails_its_plan(writer):
+    marks = {plan_id: writer.mark(plan_id) for plan_id in (1, 2)}
+
+    for i in range(5):
+        writer.insert(TestExecution, case_hash=f'case_{i}', status='passed', plan_id=1)
+    # 缺少必填字段的记录与计划 1 的记录落在同一批
+    writer.insert(ResultCacheEntry, for_plan=2, cache_key=None, case_hash='case_0')
+    writer.insert(TestExecution, case_hash='case_5', status='passed', plan_id=2)
+
+    assert writer.flush(since=marks[1], plan_id=1)
+    assert not writer.flush(since=marks[2], plan_id=2)
+    assert TestExecution.query.filter_by(plan_id=1).count() == 5
+    assert TestExecution.query.filter_by(plan_id=2).count() == 1
+    assert (writer.dropped, writer.dropped_by_plan) == (1, {2: 1})
+
+
+def test_update_of_missing_row_is_counted_for_each_plan(writer):
+    writer.update_row(TestExecution, 12345, for_plan=3, status='passed')
+    writer.update_row(TestExecution, 12345, for_plan=4, status='failed')
+
+    assert not writer.flush()
+    assert writer.dropped_by_plan == {3: 1, 4: 1}
+    assert writer.mark() == 1
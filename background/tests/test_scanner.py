@@ -0,0 +1,47 @@
+from models import TestCase
+from scanner import TestCaseScanner, FileChangeHandler
+
+
+def test_directory_and_file_in_one_batch_add_case_once(app_context, tmp_path):
+    # 新建目录后复制文件、移动目录时，同一批事件中既有目录又有其中的文件
+    (tmp_path / 'newdir').mkdir()
+    (tmp_path / 'newdir' / 'tc_a.py').write_text('pass\n')
+    scanner = TestCaseScanner(root_dir=tmp_path)
+
+    result = scanner.apply_path_changes([str(tmp_path / 'newdir'), str(tmp_path / 'newdir' / 'tc_a.py')])
+
+    assert result['new_count'] == 1
+    assert TestCase.query.filter_by(relative_path='newdir/tc_a.py').count() == 1
+
+
+class FailingScanner:
+    def __init__(self):
+        self.calls = 0
+
+    def _is_test_case(self, path):
+        return True
+
+    def apply_path_changes(self, paths):
+        self.calls += 1
+        raise RuntimeError('database unavailable')
+
+
+def test_failed_changes_back_off_and_are_dropped(monkeypatch):
+    monkeypatch.setattr('scanner.Config.WATCHDOG_MAX_RETRIES', 2)
+    scanner = FailingScanner()
+    handler = FileChangeHandler(scanner, debounce=60, max_delay=60)
+
+    handler._enqueue('/cases/tc_a.py')
+    handler.flush()
+    first_retry = handler.retry_after
+    assert handler.pending_paths == {'/cases/tc_a.py'}
+
+    handler.flush()
+    assert handler.retry_after > first_retry
+    assert handler.pending_paths == {'/cases/tc_a.py'}
+
+    # 超过重试次数后放弃，交给定时扫描
+    handler.flush()
+    assert scanner.calls == 3
+    assert handler.pending_paths == set()
+    assert handler.failures == 0
@@ -0,0 +1,18 @@
+from config import Config
+from scheduler import TestScheduler
+
+
+def test_start_registers_jobs(app_context, monkeypatch):
+    monkeypatch.setattr(Config, 'RESULT_CACHE_ENABLED', True)
+    monkeypatch.setattr('scheduler.atexit.register', lambda func: None)
+
+    scheduler = TestScheduler(app_context)
+    scheduler.start()
+    try:
+        assert scheduler.scheduler.running
+        assert sorted(job.id for job in scheduler.scheduler.get_jobs()) == [
+            'check_plans_job', 'daily_test_schedule', 'purge_result_cache_job',
+            'refresh_priority_job', 'scan_cases_job'
+        ]
+    finally:
+        scheduler.scheduler.shutdown()
@@ -0,0 +1,75 @@
+from datetime import datetime, time, timedelta
+
+from config import Config
+from extra.extensions import db
+from models import TestCase, TestPlan
+from executor import TestCaseExecutor
+from window_planner import WindowPlanner, next_window
+
+
+def test_next_window_crosses_midnight():
+    evening = datetime(2026, 10, 18, 23, 30)
+    assert next_window(evening) == (evening, datetime(2026, 10, 19, 8, 0))
+
+    early = datetime(2026, 10, 19, 7, 0)
+    assert next_window(early) == (early, datetime(2026, 10, 19, 8, 0))
+
+    for now in (datetime(2026, 10, 19, 8, 30), datetime(2026, 10, 19, 12, 0)):
+        assert next_window(now) == (datetime(2026, 10, 19, 23, 0), datetime(2026, 10, 20, 8, 0))
+
+
+def test_next_window_within_one_day(monkeypatch):
+    monkeypatch.setattr(Config, 'SCHEDULE_START_TIME', time(9, 0))
+    monkeypatch.setattr(Config, 'SCHEDULE_END_TIME', time(17, 0))
+
+    assert next_window(datetime(2026, 10, 19, 8, 0)) == (datetime(2026, 10, 19, 9, 0), datetime(2026, 10, 19, 17, 0))
+    noon = datetime(2026, 10, 19, 12, 0)
+    assert next_window(noon) == (noon, datetime(2026, 10, 19, 17, 0))
+    assert next_window(datetime(2026, 10, 19, 18, 0)) == (datetime(2026, 10, 20, 9, 0), datetime(2026, 10, 20, 17, 0))
+
+
+def add_cases(make_case, count, prefix='', avg_duration=600):
+    cases = [make_case(f'{prefix}case_{i}.py', status='passed', avg_duration=avg_duration,
+                       priority_score=float(count - i)) for i in range(count)]
+    db.session.bulk_insert_mappings(TestCase, cases)
+    db.session.commit()
+    return [case['case_hash'] for case in cases]
+
+
+def test_plan_fits_before_deadline(app_context, make_case):
+    hashes = add_cases(make_case, 20)
+    planner = WindowPlanner(TestCaseExecutor())
+
+    # 07:00 开始时只剩 45 分钟（08:00 减去 15 分钟余量）：两个测试台各装 4 个 10 分钟的用例
+    schedule = planner.plan([], datetime(2026, 10, 19, 7, 0))
+    assert schedule['deadline'] == datetime(2026, 10, 19, 7, 45)
+    assert schedule['predicted_finish'] <= schedule['deadline']
+    assert schedule['predicted_finish'] == datetime(2026, 10, 19, 7, 40)
+    assert schedule['excluded_cases'] == 12
+
+    # 优先级分数最高的用例优先装入
+    scheduled = schedule['plans'][0]['cases']
+    assert sorted(case.case_hash for case in scheduled) == sorted(hashes[:8])
+
+    # 窗口开始时全部用例都能在截止时刻前完成
+    schedule = planner.plan([], datetime(2026, 10, 18, 23, 0))
+    assert schedule['excluded_cases'] == 0
+    assert schedule['predicted_finish'] == datetime(2026, 10, 19, 0, 40)
+
+
+def test_plans_run_one_after_another(app_context, make_case):
+    add_cases(make_case, 4, prefix='a/')
+    add_cases(make_case, 4, prefix='b/')
+    plans = [TestPlan(name=name, plan_type='scheduled', include_paths=f'["{name}/"]') for name in 'ab']
+    db.session.add_all(plans)
+    db.session.commit()
+
+    schedule = WindowPlanner(TestCaseExecutor()).plan(plans, datetime(2026, 10, 18, 23, 0))
+    first, second = schedule['plans']
+    assert [first['plan'], second['plan']] == plans
+    assert first['predicted_finish'] == datetime(2026, 10, 18, 23, 20)
+    assert second['predicted_start'] == first['predicted_finish']
+    assert schedule['predicted_finish'] == second['predicted_finish'] == datetime(2026, 10, 18, 23, 40)
+
+    data = WindowPlanner.to_dict(schedule)
+    assert [item['case_count'] for item in data['plans']] == [4, 4]
@@ -0,0 +1,108 @@
+import os
+import time
+import queue
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+
+class CaseTreeWalker:
+    """单次并行遍历用例目录树
+
+    使用 os.scandir 一次性遍历整棵目录树，同时完成用例识别规则的匹配，
+    子目录会被分发到线程池中并行遍历，匹配到的文件以 (path, stat) 元组流式产出。
+    """
+
+    def __init__(self, root_dir, matcher, relative_root='', max_workers=None):
+        """
+        Args:
+            root_dir: 遍历的根目录
+            matcher: 用例匹配函数，签名为 func(relative_path: str) -> bool，如 CaseRuleSet.matches
+            relative_root: root_dir 相对于用例根目录的路径，只遍历子树时用于拼出完整的相对路径
+            max_workers: 并行遍历线程数，默认读取 Config.SCAN_WALK_WORKERS
+        """
+        self.root_dir = Path(root_dir)
+        self.matcher = matcher
+        self.relative_root = '' if relative_root == '.' else relative_root
+        self.max_workers = max_workers or Config.SCAN_WALK_WORKERS
+        self.dir_states = None
+
+    def walk(self, dir_states=None):
+        """遍历目录树，流式产出 (Path, os.stat_result)
+
+        Args:
+            dir_states: 上次遍历记录的目录状态 {相对目录: (mtime_ns, 子项数)}。
+                目录自身 mtime 与子项数都未变化时，不再 stat 其中的文件，产出 (Path, None)。
+                目录 mtime 只反映子项的增删与重命名，原地修改的文件需要依赖定期完整遍历或文件监控发现。
+
+        遍历完成后，本次观察到的目录状态保存在 self.dir_states 中。
+        """
+        results = queue.Queue()
+        pending = [0]
+        pending_lock = threading.Lock()
+        stopped = threading.Event()
+        done = object()
+        observed = {}
+        skew_ns = Config.SCAN_MTIME_SKEW_SECONDS * 1_000_000_000
+        walk_time_ns = time.time_ns()
+
+        def submit(pool, dir_path, relative_dir, dir_stat):
+            with pending_lock:
+                pending[0] += 1
+            pool.submit(scan_dir, pool, dir_path, relative_dir, dir_stat)
+
+        def scan_dir(pool, dir_path, relative_dir, dir_stat):
+            try:
+                if stopped.is_set():
+                    return
+                entries = self._scan(dir_path)
+                if entries is None:
+                    return
+
+                state = (dir_stat.st_mtime_ns, len(entries))
+                observed[relative_dir] = state
+                unchanged = (dir_states is not None and dir_states.get(relative_dir) == state and
+                             walk_time_ns - dir_stat.st_mtime_ns >= skew_ns)
+
+                for entry in entries:
+                    if stopped.is_set():
+                        return
+                    try:
+                        child_path = os.path.join(relative_dir, entry.name) if relative_dir else entry.name
+                        if entry.is_dir(follow_symlinks=False):
+                            submit(pool, entry.path, child_path, entry.stat(follow_symlinks=False))
+                        elif entry.is_file() and self.matcher(child_path):
+                            results.put((Path(entry.path), None if unchanged else entry.stat()))
+                    except OSError as e:
+                        print(f"Error processing {entry.path}: {e}")
+            finally:
+                with pending_lock:
+                    pending[0] -= 1
+                    finished = pending[0] == 0
+                if finished:
+                    results.put(done)
+
+        self.dir_states = None
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='case-walker') as pool:
+            submit(pool, str(self.root_dir), self.relative_root, os.stat(self.root_dir))
+            try:
+                while True:
+                    item = results.get()
+                    if item is done:
+                        break
+                    yield item
+            finally:
+                # 调用方提前结束迭代时通知工作线程尽快退出
+                stopped.set()
+
+        self.dir_states = observed
+
+    def _scan(self, dir_path):
+        """列出目录项，目录不可访问时返回 None"""
+        try:
+            with os.scandir(dir_path) as it:
+                return list(it)
+        except OSError as e:
+            print(f"Error scanning {dir_path}: {e}")
+            return None
@@ -0,0 +1,118 @@
+"""预热解释器进程（由 runner.WarmRunner 启动，只依赖标准库）
+
+启动时预先导入常用模块，之后每收到一个执行请求就 fork 出子进程，
+在子进程中以 runpy 按 `python 用例文件` 的方式执行用例，并把子进程的 pid 与退出码返回给父进程。
+用例在 fork 出的子进程中执行，不会影响预热解释器自身的状态。
+
+用法: python warm_zygote.py <socket fd> [预导入模块 ...]
+"""
+import os
+import sys
+import json
+import runpy
+import socket
+import atexit
+import importlib
+import traceback
+
+
+def preload(names):
+    """导入模块，返回已加载模块文件的修改时间 {路径: mtime}（父进程据此判断模块是否已更新）"""
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            print(f"warm interpreter: failed to preload {name}: {e}", file=sys.stderr)
+
+    modules = {}
+    for module in list(sys.modules.values()):
+        path = getattr(module, '__file__', None)
+        if path and os.path.isfile(path):
+            modules[path] = os.path.getmtime(path)
+    return modules
+
+
+def send(sock, message):
+    sock.sendall(json.dumps(message).encode() + b'\n')
+
+
+def receive(sock):
+    """接收一个执行请求（一行 JSON，附带 stdout/stderr 管道写端），父进程关闭连接时返回 None"""
+    data, fds, _, _ = socket.recv_fds(sock, 65536, 2)
+    while data and not data.endswith(b'\n'):
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        data += chunk
+    if not data:
+        return None, fds
+    return json.loads(data), fds
+
+
+def run_case(sock, request, stdout_fd, stderr_fd):
+    """子进程：按 `python 用例文件` 的语义执行用例后退出"""
+    sock.close()
+    atexit._clear()
+
+    stdin_fd = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(stdin_fd, 0)
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    for fd in (stdin_fd, stdout_fd, stderr_fd):
+        os.close(fd)
+
+    path = request['path']
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    sys.argv = [path]
+    sys.path[0] = os.path.dirname(os.path.abspath(path))
+
+    code = 0
+    try:
+        runpy.run_path(path, run_name='__main__')
+    except SystemExit as e:
+        if e.code is None:
+            code = 0
+        elif isinstance(e.code, int):
+            code = e.code
+        else:
+            print(e.code, file=sys.stderr)
+            code = 1
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+
+    try:
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code & 0xFF)
+
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    send(sock, {'ready': True, 'modules': preload(sys.argv[2:])})
+
+    while True:
+        request, fds = receive(sock)
+        if request is None:
+            break
+        stdout_fd, stderr_fd = fds
+
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            run_case(sock, request, stdout_fd, stderr_fd)
+
+        os.close(stdout_fd)
+        os.close(stderr_fd)
+        send(sock, {'pid': pid})
+        _, status = os.waitpid(pid, 0)
+        send(sock, {'returncode': os.waitstatus_to_exitcode(status)})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta
+from config import Config
+from plan_sharding import estimate_durations
+
+
+def next_window(now=None):
+    """当前（或下一个）定时执行窗口
+
+    Returns:
+        (开始, 结束)：已在窗口内时开始为 now，SCHEDULE_START_TIME > SCHEDULE_END_TIME 时窗口跨天
+    """
+    now = now or datetime.now()
+    start_time, end_time = Config.SCHEDULE_START_TIME, Config.SCHEDULE_END_TIME
+    today = now.date()
+
+    if start_time > end_time:
+        # 跨天窗口，如 23:00-次日08:00
+        if now.time() <= end_time:
+            return now, datetime.combine(today, end_time)
+        start = max(now, datetime.combine(today, start_time))
+        return start, datetime.combine(today + timedelta(days=1), end_time)
+
+    if now.time() <= end_time:
+        return max(now, datetime.combine(today, start_time)), datetime.combine(today, end_time)
+    tomorrow = today + timedelta(days=1)
+    return datetime.combine(tomorrow, start_time), datetime.combine(tomorrow, end_time)
+
+
+class WindowPlanner:
+    """把待执行的定时计划装进执行窗口
+
+    各计划按顺序执行（一个计划的用例全部结束后才开始下一个计划），计划内的用例按传入顺序
+    分配到最早空闲的、具备所需能力的测试台（与 TestCaseExecutor.run_cases 的调度方式相同）。
+    用例按单位机时的优先级分数（priority_score / 预计分钟数）从高到低依次尝试加入，
+    加入后所有计划的预计完成时间不超过截止时刻才保留，窗口尽量排满但不会超出 SCHEDULE_END_TIME。
+    预计时长来自用例的历史平均时长（见 plan_sharding.estimate_durations）。
+    """
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.rigs = executor.device_pool.rigs
+
+    def plan(self, plans, now=None):
+        """为计划列表生成窗口内的执行安排（不修改数据库）
+
+        Args:
+            plans: 按执行顺序排列的 TestPlan 列表；为空时按默认每日计划的方式选择用例（plan 为 None）
+
+        Returns:
+            {'window_start', 'window_end', 'deadline', 'predicted_finish', 'utilization', 'excluded_cases',
+             'plans': [{'plan', 'cases', 'durations', 'predicted_start', 'predicted_finish'}]}，
+            plans 中只包含有用例装入窗口的计划，cases 为按执行顺序排列的用例
+        """
+        window_start, window_end = next_window(now)
+        deadline = window_end - timedelta(minutes=Config.SCHEDULE_SAFETY_MARGIN_MINUTES)
+        budget = max(0.0, (deadline - window_start).total_seconds())
+
+        groups = self._candidate_groups(plans)
+        candidates = [(index, case) for index, (_, cases) in enumerate(groups) for case in cases]
+        durations = estimate_durations([case for _, case in candidates])
+
+        # 每个计划一组执行槽：测试台名称 -> 相对该计划开始的空闲时刻
+        slots = [{rig.name: 0.0 for rig in self.rigs} for _ in groups]
+        makespans = [0.0] * len(groups)
+        selected = [[] for _ in groups]
+        excluded = 0
+
+        def density(i):
+            score = max(candidates[i][1].priority_score or 0.0, 0.0)
+            return score / (durations[i] / 60), -durations[i]
+
+        for i in sorted(range(len(candidates)), key=density, reverse=True):
+            index, case = candidates[i]
+            requirements = self.executor.rules.capabilities_for(case.relative_path)
+            eligible = [rig.name for rig in self.rigs if rig.satisfies(requirements)]
+            if not eligible:
+                excluded += 1
+                continue
+
+            rig_name = min(eligible, key=lambda name: slots[index][name])
+            finish = slots[index][rig_name] + durations[i]
+            makespan = max(makespans[index], finish)
+            if sum(makespans) - makespans[index] + makespan > budget:
+                excluded += 1
+                continue
+
+            slots[index][rig_name] = finish
+            makespans[index] = makespan
+            selected[index].append((case, durations[i]))
+
+        scheduled = []
+        offset = 0.0
+        for (plan, _), cases, makespan in zip(groups, selected, makespans):
+            if not cases:
+                continue
+            scheduled.append({
+                'plan': plan,
+                'cases': [case for case, _ in cases],
+                'durations': [duration for _, duration in cases],
+                'predicted_start': window_start + timedelta(seconds=offset),
+                'predicted_finish': window_start + timedelta(seconds=offset + makespan)
+            })
+            offset += makespan
+
+        busy = sum(duration for item in scheduled for duration in item['durations'])
+        return {
+            'window_start': window_start,
+            'window_end': window_end,
+            'deadline': deadline,
+            'predicted_finish': window_start + timedelta(seconds=offset),
+            'utilization': round(busy / (budget * len(self.rigs)), 4) if budget and self.rigs else 0.0,
+            'excluded_cases': excluded,
+            'plans': scheduled
+        }
+
+    def _candidate_groups(self, plans):
+        """各计划的候选用例（同一用例只归入排在最前的计划）"""
+        if not plans:
+            return [(None, self.executor.select_cases_for_execution(limit=1000))]
+
+        seen = set()
+        groups = []
+        for plan in plans:
+            cases = self.executor.select_cases_for_execution(
+                limit=plan.total_cases if plan.total_cases else 1000,
+                include_paths=plan.include_paths,
+                exclude_paths=plan.exclude_paths
+            )
+            groups.append((plan, [case for case in cases if case.id not in seen]))
+            seen.update(case.id for case in cases)
+        return groups
+
+    @staticmethod
+    def to_dict(schedule):
+        """执行安排的 JSON 表示（用于 API 与日志）"""
+        return {
+            'window_start': schedule['window_start'].isoformat(),
+            'window_end': schedule['window_end'].isoformat(),
+            'deadline': schedule['deadline'].isoformat(),
+            'predicted_finish': schedule['predicted_finish'].isoformat(),
+            'utilization': schedule['utilization'],
+            'excluded_cases': schedule['excluded_cases'],
+            'plans': [{
+                'plan_id': item['plan'].id if item['plan'] else None,
+                'name': item['plan'].name if item['plan'] else 'Daily Schedule',
+                'case_count': len(item['cases']),
+                'estimated_seconds': round(sum(item['durations']), 1),
+                'predicted_start': item['predicted_start'].isoformat(),
+                'predicted_finish': item['predicted_finish'].isoformat()
+            } for item in schedule['plans']]
+        }